@@ -0,0 +1,856 @@
+#!/usr/bin/env python
+#####################################################################################################
+##  Usage:
+##  benchmark.py (--d <data directory>) (--generate) (--files <files>) (--claims <claims per file>)
+##               (--claim-size <bytes>) (--depth <nesting depth>) (--spread <shared identifiers>)
+##               (--icns <searched ICN>) (--seed <seed>) (--b <benchmarks>) (--lookups <single lookups>)
+##               (--batch <identifiers per batch>) (--j <processes>) (--o <results file>)
+##               (--compare <earlier results file>)
+##
+##  File ID:      benchmark.py
+##
+##  Description:  Generates synthetic claim files and ICN lists, and times getIndentedClm.py,
+##                lookupMissingICN.py and watchdir.py on them. Each benchmark runs in its own process so
+##                its peak memory can be measured. The same --seed and sizes always give the same data,
+##                so runs can be compared.
+##
+##                Benchmarks (--b, comma separated, default all):
+##                scan        - stream every claim of every file
+##                single      - look up one ICN at a time, scanning and through the claim index
+##                batch       - look up --batch ICN at once, with and without --prefilter
+##                reconcile   - lookupMissingICN.py in memory, sorted on disk, and against the claim files
+##                watch       - inotify event handling and directory rescans of watchdir.py
+##
+##  Outputs:      <data directory>/claims/clm<n>.xml - synthetic claim files
+##                <data directory>/searched.txt     - searched ICN list
+##                <data directory>/returned.txt     - returned ICN list, with missing, unexpected and
+##                                                    duplicated ICN
+##                <data directory>/parameters.json  - parameters the data was generated with
+##                benchmark.<date>.json (or --o)    - parameters and results of the run
+##                Throughput (MB/s, claims/s), peak RSS (MB) and latency percentiles (ms) are also
+##                output to STDOUT, with the change from --compare when given.
+##
+##  Notes:        The data is only generated with --generate, or if the data directory has no data
+##                generated with the same --files, --claims, --claim-size, --depth, --spread, --icns
+##                and --seed yet. Peak RSS includes the worker processes of a benchmark.
+##
+#####################################################################################################
+##
+##                        Modification Log
+##
+##  Author              Version     Date           Comments
+##
+#####################################################################################################
+
+#####################################################################################################
+# Set up (Import libraries and set defaults for variables
+#####################################################################################################
+import contextlib
+import json
+import multiprocessing
+import os
+import platform
+import queue
+import random
+import resource
+import select
+import shutil
+import tempfile
+import time
+import traceback
+from optparse import OptionParser
+import getIndentedClm
+import lookupMissingICN
+import watchdir
+data_dir = os.path.join(tempfile.gettempdir(), 'clmbenchmark')
+benchmarks = ['scan', 'single', 'batch', 'reconcile', 'watch']
+parameters = {'files': 4, 'claims': 10000, 'claim_size': 1000, 'depth': 3, 'spread': 1000, 'icns': 100000,
+              'seed': 1, 'lookups': 20, 'batch': 1000, 'processes': os.cpu_count() or 1, 'events': 200}
+data_parameters = ['files', 'claims', 'claim_size', 'depth', 'spread', 'icns', 'seed']
+missing_fraction = 0.01
+unexpected_fraction = 0.005
+duplicated_fraction = 0.005
+iSuccess = 0
+iFailure = 1
+############################## end of set up ########################################################
+#####################################################################################################
+
+
+#####################################################################################################
+#
+# Function Name:    main()
+#
+# Description:      This is the main function that controls the processing. It generates the data if
+#                   needed, runs every benchmark asked for and saves the results.
+#
+# Arguments:        input - string data_dir        - directory for the synthetic data
+#                   input - string[] benchmarks    - names of the benchmarks to run
+#                   input - dict parameters        - sizes of the data and of the benchmarks
+#                   input - bool generate          - Generate the data even if it exists with the same
+#                                                    parameters (Default = False)
+#                   input - string results_filename - file to save the results to (Default = None,
+#                                                    benchmark.<date>.json)
+#                   input - string compare_filename - earlier results file to compare with (Default = None)
+#
+# Return Codes:     0 - iSuccess - The function executed successfully.
+#                   1 - iFailure - The function did not execute successfully, or a benchmark failed.
+#
+# Notes:            A benchmark that fails is reported and saved under 'failed', and the other
+#                   benchmarks still run.
+#
+#####################################################################################################
+def main(data_dir, benchmarks, parameters, generate=False, results_filename=None, compare_filename=None):
+#####################################################################################################
+# Initialize Return Code.
+# Generate claim files and ICN lists if there are none with the same parameters
+# Run each benchmark in its own process
+# Save and print results
+# Return iRc.
+#####################################################################################################
+  iRc = iFailure
+  unknown = [name for name in benchmarks if name not in benchmark_functions]
+  if unknown:
+    printUnknownBenchmarkMsg(unknown)
+  else:
+    generated = readDataParameters(data_dir)
+    if generate or generated != dict((name, parameters[name]) for name in data_parameters):
+      printGeneratingMsg(data_dir, parameters, generated)
+      generateData(data_dir, parameters)
+    run = {'started': time.strftime('%Y-%m-%dT%H:%M:%S'), 'host': platform.node(),
+           'python': platform.python_version(), 'cpus': os.cpu_count(), 'parameters': parameters,
+           'data_bytes': sum(os.path.getsize(filepathname) for filepathname in claimFiles(data_dir)),
+           'results': {}, 'failed': {}}
+    for name in benchmarks:
+      printRunningMsg(name)
+      results, error = runIsolated(benchmark_functions[name], data_dir, parameters)
+      run['results'].update(results)
+      for result_name in sorted(results):
+        printBenchmarkResult(result_name, results[result_name])
+      if error is not None:
+        run['failed'][name] = error
+        printBenchmarkFailedMsg(name, error)
+    if results_filename is None:
+      results_filename = 'benchmark.' + time.strftime('%Y%m%d%H%M%S') + '.json'
+    with open(results_filename, 'w') as results_file:
+      json.dump(run, results_file, indent=2, sort_keys=True)
+    print('Results saved to ' + results_filename)
+    if compare_filename:
+      with open(compare_filename) as compare_file:
+        printComparison(json.load(compare_file), run)
+    if not run['failed']:
+      iRc = iSuccess
+#####################################################################################################
+# Return code of the function
+#####################################################################################################
+  return iRc
+############################## end of main() function ###############################################
+#####################################################################################################
+
+
+#####################################################################################################
+#
+# Function Definitions
+#
+#####################################################################################################
+#####################################################################################################
+#
+# Function Name:    init()
+#
+# Description:      Create and use parser to fetch command argument options.
+#
+# Arguments:        N/A
+#
+# Returned Data:    output - options - data directory, data sizes, benchmarks, results and compare files
+#
+# Notes:            None.
+#
+#####################################################################################################
+def init():
+#####################################################################################################
+# Setup parser for command line arugments
+# Fetch and return data from parser
+#####################################################################################################
+  parser = OptionParser()
+  parser.add_option('--d', '--data-dir',              dest='data_dir',
+                    help='set directory for the synthetic data. default: ' + data_dir)
+  parser.add_option('--generate',                     dest='generate', action='store_true',
+                    help='generate the data again even if the data directory has claim files')
+  parser.add_option('--files',                        dest='files', type='int',
+                    help='set number of claim files to generate. default: 4')
+  parser.add_option('--claims',                       dest='claims', type='int',
+                    help='set number of claims per file. default: 10000')
+  parser.add_option('--claim-size',                   dest='claim_size', type='int',
+                    help='set approximate bytes per claim. default: 1000')
+  parser.add_option('--depth',                        dest='depth', type='int',
+                    help='set nesting depth of the elements in a claim. default: 3')
+  parser.add_option('--spread',                       dest='spread', type='int',
+                    help='set number of different member identifiers shared between claims. default: 1000')
+  parser.add_option('--icns',                         dest='icns', type='int',
+                    help='set number of ICN in the searched list. default: 100000')
+  parser.add_option('--seed',                         dest='seed', type='int',
+                    help='set random seed of the data and lookups. default: 1')
+  parser.add_option('--b', '--benchmarks',            dest='benchmarks',
+                    help='run only these benchmarks, comma separated: ' + ','.join(benchmarks))
+  parser.add_option('--lookups',                      dest='lookups', type='int',
+                    help='set number of single lookups to time. default: 20')
+  parser.add_option('--batch',                        dest='batch', type='int',
+                    help='set number of ICN in the batch lookup. default: 1000')
+  parser.add_option('--j', '--processes',             dest='processes', type='int',
+                    help='set number of files to scan at the same time. default: number of cpus')
+  parser.add_option('--events',                       dest='events', type='int',
+                    help='set number of files created for the watch benchmark. default: 200')
+  parser.add_option('--o', '--output',                dest='results_filename',
+                    help='save results to this file. default: benchmark.<date>.json')
+  parser.add_option('--compare',                      dest='compare_filename',
+                    help='print the change of every result from this earlier results file')
+  # get and set command line arugments into local variables using parser
+  options, args = parser.parse_args()
+#####################################################################################################
+# Return variable from function
+#####################################################################################################
+  return options
+############################## end of init() function ###############################################
+#####################################################################################################
+
+
+#####################################################################################################
+#
+# Function Name:    icnFor()
+#
+# Description:      Gives the ICN of a claim in the synthetic data.
+#
+# Arguments:        input - int file_number  - number of the claim file
+#                   input - int claim_number - number of the claim in the file
+#
+# Return Variable:  output - string icn - ICN of the claim
+#
+# Notes:            ICN are made from the position of the claim, so no list of them has to be kept.
+#
+#####################################################################################################
+def icnFor(file_number, claim_number):
+  return 'IC%03d%010d' % (file_number, claim_number)
+############################## end of icnFor() function #############################################
+#####################################################################################################
+
+
+#####################################################################################################
+#
+# Function Name:    claimFiles()
+#
+# Description:      Lists the synthetic claim files of the data directory in order.
+#
+# Arguments:        input - string data_dir - directory of the synthetic data
+#
+# Return Variable:  output - string[] filepathnames - claim files
+#
+# Notes:            None.
+#
+#####################################################################################################
+def claimFiles(data_dir):
+  claims_dir = os.path.join(data_dir, 'claims')
+  files = getIndentedClm.readFilesFromSearchPath(claims_dir)
+  filenames = getIndentedClm.lookForFiles(files if files != '' else [], '.xml', claims_dir)
+#####################################################################################################
+# Return variable
+#####################################################################################################
+  return [os.path.join(claims_dir, filename) for filename in filenames]
+############################## end of claimFiles() function #########################################
+#####################################################################################################
+
+
+#####################################################################################################
+#
+# Function Name:    generateData()
+#
+# Description:      Writes the synthetic claim files and the searched and returned ICN lists.
+#
+# Arguments:        input - string data_dir   - directory for the synthetic data
+#                   input - dict parameters   - 'files', 'claims', 'claim_size', 'depth', 'spread',
+#                                               'icns' and 'seed'
+#
+# Return Variable:  N/A
+#
+# Notes:            Every claim has a unique ICN attribute and a member identifier drawn from 'spread'
+#                   different values, nested 'depth' elements deep, and is padded with text to about
+#                   'claim_size' bytes. The claims are written on one line, like the raw files.
+#
+#####################################################################################################
+def generateData(data_dir, parameters):
+#####################################################################################################
+# Write claim files
+# Write searched list, and returned list with missing, unexpected and duplicated ICN
+# Write parameters of the data last, so data that was not finished is generated again
+#####################################################################################################
+  generator = random.Random(parameters['seed'])
+  claims_dir = os.path.join(data_dir, 'claims')
+  parameters_filename = os.path.join(data_dir, 'parameters.json')
+  if os.path.exists(parameters_filename):
+    os.remove(parameters_filename)
+  if os.path.isdir(claims_dir):
+    shutil.rmtree(claims_dir)
+  os.makedirs(claims_dir)
+  for file_number in range(parameters['files']):
+    with open(os.path.join(claims_dir, 'clm%03d.xml' % file_number), 'w') as claim_file:
+      claim_file.write('<?xml version="1.0" encoding="UTF-8"?><Claims>')
+      for claim_number in range(parameters['claims']):
+        claim_file.write(generateClaim(generator, icnFor(file_number, claim_number), parameters))
+      claim_file.write('</Claims>\n')
+
+  total = parameters['files'] * parameters['claims']
+  searched = [icnFor(*divmod(generator.randrange(total), parameters['claims'])) for unused in range(parameters['icns'])]
+  returned = [icn for icn in searched if generator.random() >= missing_fraction]
+  returned += ['XX%012d' % generator.randrange(10 ** 12) for unused in range(int(len(searched) * unexpected_fraction))]
+  returned += generator.sample(returned, int(len(returned) * duplicated_fraction))
+  generator.shuffle(returned)
+  with open(os.path.join(data_dir, 'searched.txt'), 'w') as searched_file:
+    searched_file.write('\n'.join(searched) + '\n')
+  with open(os.path.join(data_dir, 'returned.txt'), 'w') as returned_file:
+    returned_file.write('\n'.join(returned) + '\n')
+  with open(os.path.join(data_dir, 'parameters.json'), 'w') as parameters_file:
+    json.dump(dict((name, parameters[name]) for name in data_parameters), parameters_file, indent=2, sort_keys=True)
+############################## end of generateData() function #######################################
+#####################################################################################################
+
+
+#####################################################################################################
+#
+# Function Name:    readDataParameters()
+#
+# Description:      Reads the parameters the data of the data directory was generated with.
+#
+# Arguments:        input - string data_dir - directory of the synthetic data
+#
+# Return Variable:  output - dict generated - the data_parameters of the data, or None if there is no
+#                            finished data
+#
+# Notes:            None.
+#
+#####################################################################################################
+def readDataParameters(data_dir):
+#####################################################################################################
+# Read parameters.json of the data directory
+#####################################################################################################
+  generated = None
+  try:
+    with open(os.path.join(data_dir, 'parameters.json')) as parameters_file:
+      generated = json.load(parameters_file)
+  except (OSError, ValueError):
+    generated = None
+#####################################################################################################
+# Return variable
+#####################################################################################################
+  return generated
+############################## end of readDataParameters() function #################################
+#####################################################################################################
+
+
+#####################################################################################################
+#
+# Function Name:    generateClaim()
+#
+# Description:      Builds the xml of one synthetic claim.
+#
+# Arguments:        input - Random generator  - random number generator of the data
+#                   input - string icn        - ICN of the claim
+#                   input - dict parameters   - 'claim_size', 'depth' and 'spread'
+#
+# Return Variable:  output - string claim - xml of the claim
+#
+# Notes:            None.
+#
+#####################################################################################################
+def generateClaim(generator, icn, parameters):
+#####################################################################################################
+# Nest service lines to the depth asked for and pad the claim to its size
+#####################################################################################################
+  member = 'M%08d' % generator.randrange(parameters['spread'])
+  parts = ['<Claim icn="', icn, '"><Member>', member, '</Member>']
+  depth = max(parameters['depth'] - 2, 0)
+  parts += ['<Line>'] * depth
+  parts += ['<Amount>', str(generator.randrange(100000)), '</Amount><Note>']
+  size = sum(len(part) for part in parts) + len('</Line>') * depth + len('</Note></Claim>')
+  parts.append('x' * max(parameters['claim_size'] - size, 0))
+  parts.append('</Note>')
+  parts += ['</Line>'] * depth
+  parts.append('</Claim>')
+#####################################################################################################
+# Return variable
+#####################################################################################################
+  return ''.join(parts)
+############################## end of generateClaim() function ######################################
+#####################################################################################################
+
+
+#####################################################################################################
+#
+# Function Name:    runIsolated()
+#
+# Description:      Runs one benchmark in a new process, so the peak memory of each benchmark is
+#                   measured on its own.
+#
+# Arguments:        input - function benchmark - benchmark function taking (data_dir, parameters)
+#                   input - string data_dir    - directory of the synthetic data
+#                   input - dict parameters    - sizes of the data and of the benchmarks
+#
+# Return Variable:  output - (dict results, string error) - results of the benchmark, each with its
+#                            'peak_rss_mb', and the error the benchmark failed with, or None
+#
+# Notes:            Output of the code being timed is discarded. A benchmark process that exits without
+#                   putting anything on the queue, e.g. killed, fails with its exit code.
+#
+#####################################################################################################
+def runIsolated(benchmark, data_dir, parameters):
+#####################################################################################################
+# Start benchmark process and wait for its results while it is running
+#####################################################################################################
+  result_queue = multiprocessing.Queue()
+  process = multiprocessing.Process(target=benchmarkProcess, args=(benchmark, data_dir, parameters, result_queue))
+  process.start()
+  results = {}
+  error = None
+  reply = None
+  while reply is None:
+    try:
+      reply = result_queue.get(timeout=1)
+    except queue.Empty:
+      if not process.is_alive():
+        try:
+          reply = result_queue.get(timeout=1)
+        except queue.Empty:
+          reply = ('error', 'Benchmark process exited with code ' + str(process.exitcode))
+  process.join()
+  if reply[0] == 'results':
+    results = reply[1]
+  else:
+    error = reply[1]
+#####################################################################################################
+# Return variable
+#####################################################################################################
+  return results, error
+############################## end of runIsolated() function ########################################
+#####################################################################################################
+
+
+#####################################################################################################
+#
+# Function Name:    benchmarkProcess()
+#
+# Description:      Body of the benchmark process. Runs the benchmark with its output discarded and
+#                   adds the peak memory of the process and of its workers to every result.
+#
+# Arguments:        input - function benchmark   - benchmark function taking (data_dir, parameters)
+#                   input - string data_dir      - directory of the synthetic data
+#                   input - dict parameters      - sizes of the data and of the benchmarks
+#                   input - Queue result_queue   - queue to put ('results', results) on, or ('error',
+#                                                  traceback) if the benchmark raised
+#
+# Return Variable:  N/A
+#
+# Notes:            A process runs a single benchmark, so the peak is the peak of that benchmark.
+#
+#####################################################################################################
+def benchmarkProcess(benchmark, data_dir, parameters, result_queue):
+#####################################################################################################
+# Run benchmark in a scratch directory with output discarded
+# Add peak RSS of this process and its children
+# Put the results, or the error, on the queue
+#####################################################################################################
+  work_dir = tempfile.mkdtemp(prefix='clmbenchmark.')
+  try:
+    try:
+      os.chdir(work_dir)
+      with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        results = benchmark(data_dir, parameters)
+    finally:
+      os.chdir(data_dir)
+      shutil.rmtree(work_dir, ignore_errors=True)
+    peak_kb = max(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+                  resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss)
+    for result in results.values():
+      result['peak_rss_mb'] = round(peak_kb / 1024.0, 1)
+    result_queue.put(('results', results))
+  except Exception:
+    result_queue.put(('error', traceback.format_exc()))
+############################## end of benchmarkProcess() function ###################################
+#####################################################################################################
+
+
+#####################################################################################################
+#
+# Function Name:    latencies()
+#
+# Description:      Summarizes timings as latency percentiles.
+#
+# Arguments:        input - float[] timings - seconds taken by each operation
+#
+# Return Variable:  output - dict latency - 'p50_ms', 'p90_ms', 'p99_ms' and 'max_ms', and operations
+#                            per second
+#
+# Notes:            Percentiles use the nearest rank.
+#
+#####################################################################################################
+def latencies(timings):
+#####################################################################################################
+# Sort timings and pick the percentiles
+#####################################################################################################
+  timings = sorted(timings)
+  latency = {}
+  for name, percent in [('p50_ms', 50), ('p90_ms', 90), ('p99_ms', 99)]:
+    rank = max(int(round(percent / 100.0 * len(timings))) - 1, 0)
+    latency[name] = round(timings[rank] * 1000, 3)
+  latency['max_ms'] = round(timings[-1] * 1000, 3)
+  latency['per_s'] = round(len(timings) / sum(timings), 1) if sum(timings) else None
+#####################################################################################################
+# Return variable
+#####################################################################################################
+  return latency
+############################## end of latencies() function ##########################################
+#####################################################################################################
+
+
+#####################################################################################################
+#
+# Function Name:    throughput()
+#
+# Description:      Summarizes the time taken to go through claim data as throughput.
+#
+# Arguments:        input - int data_bytes  - bytes of claim files read
+#                   input - int claims      - claims read
+#                   input - float seconds   - time taken
+#
+# Return Variable:  output - dict result - 'seconds', 'mb_per_s' and 'claims_per_s'
+#
+# Notes:            None.
+#
+#####################################################################################################
+def throughput(data_bytes, claims, seconds):
+  return {'seconds': round(seconds, 3), 'mb_per_s': round(data_bytes / 1048576.0 / seconds, 2),
+          'claims_per_s': round(claims / seconds, 1)}
+############################## end of throughput() function #########################################
+#####################################################################################################
+
+
+#####################################################################################################
+#
+# Function Name:    benchScan()
+#
+# Description:      Times streaming every claim of every claim file, the cost every scan starts from.
+#
+# Arguments:        input - string data_dir   - directory of the synthetic data
+#                   input - dict parameters   - sizes of the data and of the benchmarks
+#
+# Return Variable:  output - dict results - 'scan' throughput
+#
+# Notes:            None.
+#
+#####################################################################################################
+def benchScan(data_dir, parameters):
+#####################################################################################################
+# Stream all claims and time it
+#####################################################################################################
+  filepathnames = claimFiles(data_dir)
+  claims = 0
+  start = time.perf_counter()
+  for filepathname in filepathnames:
+    for claim in getIndentedClm.iterClaims(filepathname, 'Claim'):
+      claims += 1
+  seconds = time.perf_counter() - start
+#####################################################################################################
+# Return variable
+#####################################################################################################
+  return {'scan': throughput(sum(map(os.path.getsize, filepathnames)), claims, seconds)}
+############################## end of benchScan() function ##########################################
+#####################################################################################################
+
+
+#####################################################################################################
+#
+# Function Name:    benchSingle()
+#
+# Description:      Times single ICN lookups the way getIndentedClm.py --id --a does them, first by
+#                   scanning the files and then through the claim index, which is also timed being built.
+#
+# Arguments:        input - string data_dir   - directory of the synthetic data
+#                   input - dict parameters   - sizes of the data and of the benchmarks
+#
+# Return Variable:  output - dict results - 'single_scan' and 'single_index' latencies, 'index_build'
+#                            throughput
+#
+# Notes:            The scan stops after the file with the ICN, the same as the command line.
+#
+#####################################################################################################
+def benchSingle(data_dir, parameters):
+#####################################################################################################
+# Time scanned lookups of random ICN
+# Time building the index, then indexed lookups of the same ICN
+#####################################################################################################
+  generator = random.Random(parameters['seed'] + 1)
+  filepathnames = claimFiles(data_dir)
+  total = parameters['files'] * parameters['claims']
+  icns = [icnFor(*divmod(generator.randrange(total), parameters['claims'])) for unused in range(parameters['lookups'])]
+  results = {}
+  timings = []
+  for icn in icns:
+    start = time.perf_counter()
+    getIndentedClm.searchFiles({icn}, filepathnames, 'INDENT.single', 'Claim', parameters['processes'])
+    timings.append(time.perf_counter() - start)
+  results['single_scan'] = latencies(timings)
+
+  index_path = os.path.join(os.getcwd(), 'clmindex.db')
+  start = time.perf_counter()
+  getIndentedClm.buildIndex(filepathnames, index_path, 'Claim')
+  results['index_build'] = throughput(sum(map(os.path.getsize, filepathnames)), total, time.perf_counter() - start)
+  timings = []
+  for icn in icns:
+    start = time.perf_counter()
+    getIndentedClm.extractIndexedClaims({icn}, filepathnames, index_path, 'INDENT.single', 'Claim')
+    timings.append(time.perf_counter() - start)
+  results['single_index'] = latencies(timings)
+#####################################################################################################
+# Return variable
+#####################################################################################################
+  return results
+############################## end of benchSingle() function ########################################
+#####################################################################################################
+
+
+#####################################################################################################
+#
+# Function Name:    benchBatch()
+#
+# Description:      Times one batch lookup of many ICN across every file the way getIndentedClm.py
+#                   --ids-file --a does it, with and without --prefilter.
+#
+# Arguments:        input - string data_dir   - directory of the synthetic data
+#                   input - dict parameters   - sizes of the data and of the benchmarks
+#
+# Return Variable:  output - dict results - 'batch_scan' and 'batch_prefilter' throughput
+#
+# Notes:            None.
+#
+#####################################################################################################
+def benchBatch(data_dir, parameters):
+#####################################################################################################
+# Pick ICN spread over all files and time the batch lookups
+#####################################################################################################
+  generator = random.Random(parameters['seed'] + 2)
+  filepathnames = claimFiles(data_dir)
+  data_bytes = sum(map(os.path.getsize, filepathnames))
+  total = parameters['files'] * parameters['claims']
+  icns = set(icnFor(*divmod(generator.randrange(total), parameters['claims'])) for unused in range(parameters['batch']))
+  results = {}
+  for name, prefilter in [('batch_scan', False), ('batch_prefilter', True)]:
+    start = time.perf_counter()
+    getIndentedClm.searchFiles(icns, filepathnames, 'INDENT.batch', 'Claim', parameters['processes'], prefilter)
+    results[name] = throughput(data_bytes, total, time.perf_counter() - start)
+    results[name]['identifiers'] = len(icns)
+#####################################################################################################
+# Return variable
+#####################################################################################################
+  return results
+############################## end of benchBatch() function #########################################
+#####################################################################################################
+
+
+#####################################################################################################
+#
+# Function Name:    benchReconcile()
+#
+# Description:      Times lookupMissingICN.py reconciling the searched and returned lists in memory and
+#                   sorted on disk, and reconciling the searched list against the claim files.
+#
+# Arguments:        input - string data_dir   - directory of the synthetic data
+#                   input - dict parameters   - sizes of the data and of the benchmarks
+#
+# Return Variable:  output - dict results - 'reconcile_memory', 'reconcile_sorted' and 'reconcile_claims'
+#                            times and ICN per second
+#
+# Notes:            The sorted run size is a tenth of the list, so every list is sorted in several runs.
+#
+#####################################################################################################
+def benchReconcile(data_dir, parameters):
+#####################################################################################################
+# Time reconciliation in memory, then forced onto disk
+# Time reconciliation against the claim files
+#####################################################################################################
+  searched_filename = os.path.join(data_dir, 'searched.txt')
+  returned_filename = os.path.join(data_dir, 'returned.txt')
+  icns = sum(1 for unused in open(searched_filename)) + sum(1 for unused in open(returned_filename))
+  results = {}
+  for name, max_in_memory in [('reconcile_memory', lookupMissingICN.max_in_memory),
+                              ('reconcile_sorted', max(parameters['icns'] // 10, 1))]:
+    lookupMissingICN.max_in_memory = max_in_memory
+    start = time.perf_counter()
+    lookupMissingICN.main(searched_filename, returned_filename, name, quiet=True)
+    seconds = time.perf_counter() - start
+    results[name] = {'seconds': round(seconds, 3), 'icns_per_s': round(icns / seconds, 1)}
+  filepathnames = claimFiles(data_dir)
+  start = time.perf_counter()
+  lookupMissingICN.mainClaimFiles(searched_filename, os.path.dirname(filepathnames[0]), 'reconcile_claims', '.xml',
+                                  'Claim', False, parameters['processes'], quiet=True)
+  results['reconcile_claims'] = throughput(sum(map(os.path.getsize, filepathnames)),
+                                           parameters['files'] * parameters['claims'], time.perf_counter() - start)
+#####################################################################################################
+# Return variable
+#####################################################################################################
+  return results
+############################## end of benchReconcile() function #####################################
+#####################################################################################################
+
+
+#####################################################################################################
+#
+# Function Name:    benchWatch()
+#
+# Description:      Times how long watchdir.py takes to see and handle a new file with inotify, and to
+#                   rescan a directory of files when polling.
+#
+# Arguments:        input - string data_dir   - directory of the synthetic data
+#                   input - dict parameters   - sizes of the data and of the benchmarks
+#
+# Return Variable:  output - dict results - 'watch_event' latencies from creating a file to it being
+#                            reported, and 'watch_rescan' latencies of rescanning the directory
+#
+# Notes:            The settle time watchdir.py waits for the directory to be quiet is not included.
+#                   'watch_event' is left out where inotify is not available.
+#
+#####################################################################################################
+def benchWatch(data_dir, parameters):
+#####################################################################################################
+# Create files one by one and time each until its event is read and its entry updated
+# Time rescans of the directory full of files
+#####################################################################################################
+  monitor_dir = os.path.join(os.getcwd(), 'watched')
+  os.makedirs(monitor_dir)
+  state = {'entries': {}, 'dirty': False, 'saved': 0}
+  results = {}
+  inotify_fd = watchdir.openInotify(monitor_dir)
+  if inotify_fd is not None:
+    timings = []
+    try:
+      for event_number in range(parameters['events']):
+        name = 'clm%06d.xml' % event_number
+        start = time.perf_counter()
+        with open(os.path.join(monitor_dir, name), 'w') as claim_file:
+          claim_file.write('<Claims/>')
+        added = []
+        while name not in added:
+          select.select([inotify_fd], [], [])
+          names, overflow, gone = watchdir.readInotifyEvents(inotify_fd)
+          current = {}
+          for event_name in names:
+            entry = watchdir.statEntry(monitor_dir, event_name)
+            if entry is not None:
+              current[event_name] = entry
+          added += watchdir.updateEntries(state, names, current)[0]
+        timings.append(time.perf_counter() - start)
+    finally:
+      os.close(inotify_fd)
+    results['watch_event'] = latencies(timings)
+  else:
+    for event_number in range(parameters['events']):
+      with open(os.path.join(monitor_dir, 'clm%06d.xml' % event_number), 'w') as claim_file:
+        claim_file.write('<Claims/>')
+  timings = []
+  for unused in range(20):
+    start = time.perf_counter()
+    watchdir.rescanDirectory(monitor_dir, state, None)
+    timings.append(time.perf_counter() - start)
+  results['watch_rescan'] = latencies(timings)
+  results['watch_rescan']['files'] = parameters['events']
+#####################################################################################################
+# Return variable
+#####################################################################################################
+  return results
+############################## end of benchWatch() function #########################################
+#####################################################################################################
+
+
+benchmark_functions = {'scan': benchScan, 'single': benchSingle, 'batch': benchBatch, 'reconcile': benchReconcile,
+                       'watch': benchWatch}
+
+
+#####################################################################################################
+#
+# Print Functions
+#
+#####################################################################################################
+def printResult(return_code):
+  if return_code == iSuccess:
+    print('Done!')
+  else:
+    print('Program failed!')
+
+def printGeneratingMsg(data_dir, parameters, generated):
+  generatingMsg = ['Generating ', str(parameters['files']), ' claim files of ', str(parameters['claims']),
+                   ' claims and ', str(parameters['icns']), ' ICN lists in ', data_dir, '...']
+  if generated:
+    changed = [name for name in data_parameters if generated.get(name) != parameters[name]]
+    if changed:
+      generatingMsg += ['\n(data was generated with other ', ', '.join(changed), ')']
+  generatingMsg = ''.join(generatingMsg)
+  print(generatingMsg, flush=True)
+
+def printRunningMsg(name):
+  print('Running ' + name + ' benchmark...', flush=True)
+
+def printBenchmarkResult(name, result):
+  benchmarkResult = ['  ', name.ljust(18)]
+  for key in sorted(result):
+    benchmarkResult += [' ', key, '=', str(result[key])]
+  benchmarkResult = ''.join(benchmarkResult)
+  print(benchmarkResult, flush=True)
+
+def printComparison(old_run, new_run):
+  comparison = ['Change from ', old_run.get('started', '?'), ':']
+  for name in sorted(new_run['results']):
+    old_result = old_run.get('results', {}).get(name, {})
+    for key in sorted(new_run['results'][name]):
+      old_value = old_result.get(key)
+      new_value = new_run['results'][name][key]
+      if isinstance(old_value, (int, float)) and isinstance(new_value, (int, float)) and old_value:
+        change = (new_value - old_value) * 100.0 / old_value
+        comparison += ['\n  ', name.ljust(18), ' ', key.ljust(14), ' ', str(old_value), ' -> ', str(new_value),
+                       ' (', '%+.1f' % change, '%)']
+  comparison = ''.join(comparison)
+  print(comparison)
+
+def printBenchmarkFailedMsg(name, error):
+  benchmarkFailedMsg = ['Error occured\n',
+                        'The ', name, ' benchmark failed:\n', error.rstrip()]
+  benchmarkFailedMsg = ''.join(benchmarkFailedMsg)
+  print(benchmarkFailedMsg, flush=True)
+
+def printUnknownBenchmarkMsg(unknown):
+  unknownBenchmarkMsg = ['Error occured\n',
+                         'Unknown benchmarks: ', ', '.join(unknown), '\n',
+                         'Please choose from: ', ', '.join(sorted(benchmark_functions))]
+  unknownBenchmarkMsg = ''.join(unknownBenchmarkMsg)
+  print(unknownBenchmarkMsg)
+############################## end of print messages ################################################
+#####################################################################################################
+
+
+#####################################################################################################
+# Execute only if program was called as a script, not if it was imported
+#####################################################################################################
+# Initialize program by getting data directory, sizes and benchmarks
+# Fetches options from init() function
+# Execute main()
+#####################################################################################################
+if __name__ == '__main__':
+  options = init()
+  if options.data_dir:
+    data_dir = options.data_dir
+  if options.benchmarks:
+    benchmarks = [name.strip() for name in options.benchmarks.split(',') if name.strip()]
+  for name in parameters:
+    if getattr(options, name, None):
+      parameters[name] = getattr(options, name)
+
+  ret = main(os.path.abspath(data_dir), benchmarks, parameters, options.generate, options.results_filename,
+             options.compare_filename)
+  printResult(ret)
+#####################################################################################################
+############################## end of benchmark.py program ##########################################
+#####################################################################################################
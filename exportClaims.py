@@ -0,0 +1,754 @@
+#!/usr/bin/env python
+#####################################################################################################
+##  Usage:
+##  exportClaims.py --o <output file .csv, .npy or .parquet> --fields <name=path(:type),...>
+##                  (--p <claim file directory>) (--x <extension>) (--t <claim element name>) (--r)
+##                  (--j <processes>) (--id <unique_identifier>) (--ids-file <identifiers file>)
+##                  (--select <selector>) (--b <rows per batch>) (--w <text width>)
+##
+##  File ID:      exportClaims.py
+##
+##  Description:  Streams chosen fields of every claim in the claim files of a directory into one
+##                columnar file for bulk analysis, e.g.
+##                  --fields 'icn=@icn,member=Member,date=//ServiceDate:str10,amount=Line/Amount:float'
+##                Each field is a name, a path from the claim element as used by getIndentedClm.py
+##                --select, and optionally a type: str (default), str<width>, int or float. Every row
+##                also has the source_file of the claim and the byte_offset of the claim in it.
+##                Claims may be limited to unique identifiers (--id, --ids-file) and a selector
+##                (--select) the same way as getIndentedClm.py.
+##
+##  Outputs:      The --o file, by its extension:
+##                .csv     - header line of column names, then one line per claim
+##                .npy     - NumPy structured array, text as fixed width unicode (--w characters,
+##                           default 32, longer values are cut), missing int as 0 and float as nan
+##                .parquet - Parquet file, needs pyarrow installed, missing values as null
+##
+##  Notes:        No claim tree is built. The fields are captured from the parser events while the
+##                files are streamed, in parallel across files, and rows are written in batches of
+##                --b rows, so memory does not grow with the number of claims. Rows are in the order
+##                of the files and of the claims in each file, the same for any --j.
+##                A field keeps the first non-empty value found for it in the claim.
+##                The output is written under a hidden temporary name in the same directory and renamed
+##                to the --o file when the export is done, so a failed export leaves no partial file.
+##
+#####################################################################################################
+##
+##                        Modification Log
+##
+##  Author              Version     Date           Comments
+##
+#####################################################################################################
+
+#####################################################################################################
+# Set up (Import libraries and set defaults for variables
+#####################################################################################################
+import csv
+import lzma
+import multiprocessing
+import os
+import queue
+import re
+import struct
+from optparse import OptionParser
+from xml.parsers import expat
+import getIndentedClm
+try:
+  import pyarrow
+  import pyarrow.parquet
+except ImportError:
+  pyarrow = None
+search_path = getIndentedClm.search_path
+extension = '.xml'
+claim_tag = None
+processes = os.cpu_count() or 1
+batch_size = 50000
+text_width = 32
+export_formats = ['.csv', '.npy', '.parquet']
+iSuccess = 0
+iFailure = 1
+############################## end of set up ########################################################
+#####################################################################################################
+
+
+#####################################################################################################
+#
+# Function Name:    main()
+#
+# Description:      This is the main function that controls the processing. It streams the fields of
+#                   the claims in every claim file found into the output file and prints the number of
+#                   rows written.
+#
+# Arguments:        input - string output_name  - file to write, .csv, .npy or .parquet
+#                   input - string fields_text  - fields to export, see parseFields()
+#                   input - string extension    - Filetype extension of the claim files
+#                   input - string search_path  - directory of claim files to export
+#                   input - string claim_tag    - Element name of a claim (Default = None)
+#                   input - bool recursive      - Also export files in subdirectories (Default = False)
+#                   input - int processes       - Number of files to stream at the same time (Default = 1)
+#                   input - set identifiers     - Only export claims containing one of these (Default = None)
+#                   input - string selector_text - Only export claims matching this selector (Default = None)
+#                   input - int batch_size      - Rows to write at a time (Default = 50000)
+#
+# Return Codes:     0 - iSuccess - The function executed successfully.
+#                   1 - iFailure - The function did not execute successfully.
+#
+# Notes:            Files that fail to parse are printed, and the rows read before the error are kept.
+#
+#####################################################################################################
+def main(output_name, fields_text, extension, search_path, claim_tag=None, recursive=False, processes=1,
+         identifiers=None, selector_text=None, batch_size=50000):
+#####################################################################################################
+# Initialize Return Code.
+# Check output format, fields and selector
+# Find claim files
+# Stream batches of rows from the files into the output file
+# Return iRc.
+#####################################################################################################
+  iRc = iFailure
+  export_format = os.path.splitext(output_name)[1].lower()
+  fields = None
+  if export_format not in export_formats:
+    printInvalidFormatMsg(output_name)
+  elif export_format == '.parquet' and pyarrow is None:
+    printNoPyarrowMsg()
+  else:
+    try:
+      fields = parseFields(fields_text)
+      selector = getIndentedClm.parseSelector(selector_text) if selector_text else None
+    except ValueError as error:
+      fields = None
+      printInvalidFieldsMsg(error)
+  if fields is not None:
+    filepathnames = getIndentedClm.findFilesToSearch(extension, search_path, True, recursive)
+    if filepathnames:
+      msg = 'Exporting ' + str(len(fields['names'])) + ' fields from ' + str(len(filepathnames)) + ' files to ' + output_name + '...'
+      print(msg)
+      errors = []
+      rows = 0
+      completed = False
+      writer = openExport(output_name, export_format, fields, filepathnames)
+      try:
+        for batch in iterExportBatches(fields, filepathnames, claim_tag, identifiers, selector, processes, errors,
+                                       batch_size):
+          writeBatch(writer, batch)
+          rows += len(batch)
+        completed = True
+      finally:
+        closeExport(writer, rows, completed)
+      for filepathname, error in errors:
+        getIndentedClm.printParseErrorMsg(filepathname, error)
+      printExportSummaryMsg(rows, output_name)
+      iRc = iSuccess
+#####################################################################################################
+# Return code of the function
+#####################################################################################################
+  return iRc
+############################## end of main() function ###############################################
+#####################################################################################################
+
+
+#####################################################################################################
+#
+# Function Definitions
+#
+#####################################################################################################
+#####################################################################################################
+#
+# Function Name:    init()
+#
+# Description:      Create and use parser to fetch command argument options.
+#
+# Arguments:        N/A
+#
+# Returned Data:    output - string options.output_name  - file to write, .csv, .npy or .parquet
+#                   output - string options.fields_text  - fields to export
+#                   output - string options.search_path  - directory of claim files to export
+#                   output - string options.extension    - Filetype extension of the claim files
+#                   output - string options.claim_tag    - Element name of a claim
+#                   output - bool options.recursive      - Also export files in subdirectories
+#                   output - int options.processes       - Number of files to stream at the same time
+#                   output - string options.identifier   - Only export claims containing this identifier
+#                   output - string options.ids_file     - Only export claims containing an identifier in this file
+#                   output - string options.selector     - Only export claims matching this selector
+#                   output - int options.batch_size      - Rows to write at a time
+#                   output - int options.text_width      - Characters kept of text fields in .npy files
+#
+# Notes:            None.
+#
+#####################################################################################################
+def init():
+#####################################################################################################
+# Setup parser for command line arugments
+# Fetch and return data from parser
+#####################################################################################################
+  parser = OptionParser()
+  parser.add_option('--o', '--output',                dest='output_name',
+                    help='file to write the rows to. the extension sets the format: .csv, .npy or .parquet (needs pyarrow)')
+  parser.add_option('--fields',                       dest='fields_text',
+                    help='comma separated name=path(:type) fields to export, e.g. "icn=@icn,amount=Line/Amount:float". types: str, str<width>, int, float')
+  parser.add_option('--p', '--path',                  dest='search_path',
+                    help='set directory of the claim files to export. does not export subdirectories unless --r is used.')
+  parser.add_option('--x', '--ext', '--extension',    dest='extension',
+                    help='set extension of the claim files. default: .xml')
+  parser.add_option('--t', '--tag',                   dest='claim_tag',
+                    help='set element name of a claim. default: every child of the root element')
+  parser.add_option('--r', '--recursive',             dest='recursive', action='store_true',
+                    help='also export claim files in subdirectories of the search path')
+  parser.add_option('--j', '--processes',             dest='processes', type='int',
+                    help='set number of files to stream at the same time. default: number of cpus')
+  parser.add_option('--id', '--identifier',           dest='identifier',
+                    help='only export claims containing this unique identifier')
+  parser.add_option('--ids-file',                     dest='ids_file',
+                    help='only export claims containing one of the unique identifiers in this file, one per line')
+  parser.add_option('--select',                       dest='selector',
+                    help='only export claims matching this getIndentedClm.py selector')
+  parser.add_option('--b', '--batch',                 dest='batch_size', type='int',
+                    help='set number of rows written at a time. default: 50000')
+  parser.add_option('--w', '--width',                 dest='text_width', type='int',
+                    help='set characters kept of str fields without a width in .npy files. default: 32')
+  # get and set command line arugments into local variables using parser
+  options, args = parser.parse_args()
+#####################################################################################################
+# Return variable from function
+#####################################################################################################
+  return options
+############################## end of init() function ###############################################
+#####################################################################################################
+
+
+#####################################################################################################
+#
+# Function Name:    parseFields()
+#
+# Description:      Parses the fields to export, comma separated name=path(:type), into the columns of
+#                   the output and the field paths to capture while streaming.
+#
+# Arguments:        input - string fields_text - fields to export
+#
+# Return Variable:  output - dict fields - 'names' and 'types' of the fields, as ('str', width),
+#                            ('int', None) or ('float', None), 'columns' of the output as (name, type),
+#                            starting with source_file and byte_offset, and the compiled 'atoms' and
+#                            'paths' cache for getIndentedClm.captureFieldElement()
+#
+# Notes:            A ValueError is raised if a field is not valid or a name is used twice.
+#
+#####################################################################################################
+def parseFields(fields_text):
+#####################################################################################################
+# Split fields and their types
+# Compile each path with getIndentedClm.compileSelectorPath()
+#####################################################################################################
+  fields = {'names': [], 'types': [], 'atoms': [], 'paths': {}}
+  for field in fields_text.split(','):
+    field = field.strip()
+    if not field:
+      continue
+    name, separator, path = field.partition('=')
+    name = name.strip()
+    path = path.strip()
+    field_type = ('str', None)
+    type_match = re.match(r'^(.*):(str|int|float)(\d*)$', path)
+    if type_match is not None and (type_match.group(2) == 'str' or not type_match.group(3)):
+      path = type_match.group(1)
+      field_type = (type_match.group(2), int(type_match.group(3)) if type_match.group(3) else None)
+    if not separator or not re.match(r'^[A-Za-z_][A-Za-z0-9_]*$', name):
+      raise ValueError('invalid field ' + repr(field) + ', expected name=path(:type)')
+    if name in fields['names'] or name in ('source_file', 'byte_offset'):
+      raise ValueError('field name ' + repr(name) + ' is used more than once')
+    try:
+      pattern, attribute = getIndentedClm.compileSelectorPath(path)
+    except ValueError as error:
+      raise ValueError(str(error) + ' in field ' + repr(field))
+    fields['names'].append(name)
+    fields['types'].append(field_type)
+    fields['atoms'].append({'path': path, 'pattern': pattern, 'attribute': attribute})
+  if not fields['names']:
+    raise ValueError('no fields to export')
+  fields['columns'] = [('source_file', ('str', None)), ('byte_offset', ('int', None))]
+  fields['columns'] += list(zip(fields['names'], fields['types']))
+#####################################################################################################
+# Return variable
+#####################################################################################################
+  return fields
+############################## end of parseFields() function ########################################
+#####################################################################################################
+
+
+#####################################################################################################
+#
+# Function Name:    iterFileBatches()
+#
+# Description:      Streams one claim file and yields the rows of its claims in batches. This is the
+#                   unit of work of each process started by iterExportBatches().
+#
+# Arguments:        input - dict fields         - fields from parseFields()
+#                   input - string filepathname - filepath and name for raw xml file to export
+#                   input - string claim_tag    - Element name of a claim (Default = None)
+#                   input - set identifiers     - Only export claims containing one of these (Default = None)
+#                   input - dict selector       - Only export claims matching this selector (Default = None)
+#                   input - int batch_size      - Rows per batch (Default = 50000)
+#
+# Return Variable:  output - (string kind, payload) - ('batch', list rows) for every batch_size rows and
+#                            the rows left at the end, or ('error', string message) if the file fails
+#                            to parse, after the rows read before the error
+#
+# Notes:            Each row is a tuple of the source file, the byte offset of the claim and the field
+#                   values converted to their type. A value that cannot be converted is None.
+#
+#####################################################################################################
+def iterFileBatches(fields, filepathname, claim_tag=None, identifiers=None, selector=None, batch_size=50000):
+#####################################################################################################
+# Stream field values of each claim from the file
+# Convert values and collect them into batches
+# Yield each full batch, then the rest and any error
+#####################################################################################################
+  batch = []
+  error = None
+  try:
+    for row, values, start, end in getIndentedClm.iterClaims(filepathname, claim_tag, selector=selector,
+                                                              fields=fields):
+      if identifiers and identifiers.isdisjoint(values):
+        continue
+      converted = [filepathname, start]
+      for value, field_type in zip(row, fields['types']):
+        if value is not None and field_type[0] != 'str':
+          try:
+            value = int(value) if field_type[0] == 'int' else float(value)
+          except ValueError:
+            value = None
+        converted.append(value)
+      batch.append(tuple(converted))
+      if len(batch) >= batch_size:
+        yield 'batch', batch
+        batch = []
+  except (expat.ExpatError, OSError, EOFError, lzma.LZMAError) as parse_error:
+    error = str(parse_error)
+  if batch:
+    yield 'batch', batch
+  if error is not None:
+    yield 'error', error
+############################## end of iterFileBatches() function ####################################
+#####################################################################################################
+
+
+#####################################################################################################
+#
+# Function Name:    exportWorker()
+#
+# Description:      Process target of iterExportBatches(). Exports its share of the files in order and
+#                   puts the batches of each file on its own result queue.
+#
+# Arguments:        input - string[] filepathnames - filepaths and names for raw xml files to export
+#                   input - Queue results       - (kind, filepathname, payload) for each batch or error,
+#                                                 then ('end', filepathname, None) for each file
+#                   input - dict fields         - fields from parseFields()
+#                   input - string claim_tag    - Element name of a claim
+#                   input - set identifiers     - Only export claims containing one of these
+#                   input - dict selector       - Only export claims matching this selector
+#                   input - int batch_size      - Rows per batch
+#
+# Return Variable:  N/A
+#
+# Notes:            The result queue is bounded, so a worker waits while the parent writes instead of
+#                   reading ahead of it. Any error is put on the queue as the error of the file, so the
+#                   parent always gets the end of every file.
+#
+#####################################################################################################
+def exportWorker(filepathnames, results, fields, claim_tag, identifiers, selector, batch_size):
+#####################################################################################################
+# Export each file, then mark its end
+#####################################################################################################
+  for filepathname in filepathnames:
+    try:
+      for kind, payload in iterFileBatches(fields, filepathname, claim_tag, identifiers, selector, batch_size):
+        results.put((kind, filepathname, payload))
+    except Exception as error:
+      results.put(('error', filepathname, type(error).__name__ + ': ' + str(error)))
+    results.put(('end', filepathname, None))
+############################## end of exportWorker() function #######################################
+#####################################################################################################
+
+
+#####################################################################################################
+#
+# Function Name:    nextWorkerResult()
+#
+# Description:      Waits for the next result of an export worker, checking that the worker is still
+#                   running while it waits.
+#
+# Arguments:        input - Process worker  - worker process
+#                   input - Queue results   - result queue of the worker
+#
+# Return Variable:  output - (string kind, payload) - ('batch', rows), ('error', message) or ('end', None)
+#                            from the worker, or ('lost', message) if the worker exited without them
+#
+# Notes:            None.
+#
+#####################################################################################################
+def nextWorkerResult(worker, results):
+#####################################################################################################
+# Wait for a result, then once more after the worker is seen to have exited
+#####################################################################################################
+  result = None
+  while result is None:
+    try:
+      kind, filepathname, payload = results.get(timeout=1)
+      result = (kind, payload)
+    except queue.Empty:
+      if not worker.is_alive():
+        try:
+          kind, filepathname, payload = results.get(timeout=1)
+          result = (kind, payload)
+        except queue.Empty:
+          result = ('lost', 'Export worker exited with code ' + str(worker.exitcode))
+#####################################################################################################
+# Return variable
+#####################################################################################################
+  return result
+############################## end of nextWorkerResult() function ###################################
+#####################################################################################################
+
+
+#####################################################################################################
+#
+# Function Name:    iterExportBatches()
+#
+# Description:      Streams the claim files with a process per file at the same time and yields the
+#                   batches of rows in the order of the files.
+#
+# Arguments:        input - dict fields            - fields from parseFields()
+#                   input - string[] filepathnames - filepaths and names for raw xml files to export
+#                   input - string claim_tag       - Element name of a claim (Default = None)
+#                   input - set identifiers        - Only export claims containing one of these (Default = None)
+#                   input - dict selector          - Only export claims matching this selector (Default = None)
+#                   input - int processes          - Number of files to stream at the same time (Default = 1)
+#                   input - list errors            - (filepathname, parse error message) is appended for
+#                                                    each file that failed (Default = None, not kept)
+#                   input - int batch_size         - Rows per batch (Default = 50000)
+#
+# Return Variable:  output - list batch - rows of at most batch_size claims, see iterFileBatches()
+#
+# Notes:            The files are dealt out to the workers in turn, and each worker has its own result
+#                   queue of at most two batches. Reading the queues in the order of the files gives the
+#                   same rows in the same order as a single process, without holding back the batches of
+#                   later files. A worker that exits part way fails its remaining files.
+#
+#####################################################################################################
+def iterExportBatches(fields, filepathnames, claim_tag=None, identifiers=None, selector=None, processes=1,
+                      errors=None, batch_size=50000):
+#####################################################################################################
+# Stream files in this process for a single process or file
+# Otherwise start workers on their share of the files and yield their batches file by file
+# Stop workers if the caller stops early
+#####################################################################################################
+  if errors is None:
+    errors = []
+  if processes <= 1 or len(filepathnames) <= 1:
+    for filepathname in filepathnames:
+      for kind, payload in iterFileBatches(fields, filepathname, claim_tag, identifiers, selector, batch_size):
+        if kind == 'batch':
+          yield payload
+        else:
+          errors.append((filepathname, payload))
+  else:
+    workers = []
+    worker_count = min(processes, len(filepathnames))
+    results = [multiprocessing.Queue(2) for worker in range(worker_count)]
+    try:
+      for worker in range(worker_count):
+        workers.append(multiprocessing.Process(target=exportWorker,
+                                               args=(filepathnames[worker::worker_count], results[worker], fields,
+                                                     claim_tag, identifiers, selector, batch_size)))
+        workers[-1].start()
+      for order, filepathname in enumerate(filepathnames):
+        worker = order % worker_count
+        kind = None
+        while kind not in ('end', 'lost'):
+          kind, payload = nextWorkerResult(workers[worker], results[worker])
+          if kind == 'batch':
+            yield payload
+          elif kind in ('error', 'lost'):
+            errors.append((filepathname, payload))
+    finally:
+      for worker in workers:
+        if worker.is_alive():
+          worker.terminate()
+        worker.join()
+############################## end of iterExportBatches() function ##################################
+#####################################################################################################
+
+
+#####################################################################################################
+#
+# Function Name:    npyHeader()
+#
+# Description:      Builds the header of a .npy file holding a structured array, padded to a fixed
+#                   size so it can be rewritten with the final number of rows.
+#
+# Arguments:        input - list descr       - (name, dtype) of each column, e.g. ('amount', '<f8')
+#                   input - int rows         - number of rows in the array
+#                   input - int header_size  - size of the header in bytes (Default = None, smallest size
+#                                              that fits any number of rows)
+#
+# Return Variable:  output - bytes header - magic, version 1.0, header length and padded header dict
+#
+# Notes:            The format is described in numpy.lib.format. The header ends in a newline and the
+#                   data starts at a multiple of 64 bytes.
+#
+#####################################################################################################
+def npyHeader(descr, rows, header_size=None):
+#####################################################################################################
+# Build header dict text
+# Pad it with spaces to the header size
+#####################################################################################################
+  header_text = "{'descr': " + repr(descr) + ", 'fortran_order': False, 'shape': (" + str(rows) + ",), }"
+  if header_size is None:
+    longest = len(header_text) - len(str(rows)) + 20
+    header_size = (10 + longest + 1 + 63) // 64 * 64
+  header_text = header_text.ljust(header_size - 10 - 1) + '\n'
+  header = b'\x93NUMPY\x01\x00' + struct.pack('<H', len(header_text)) + header_text.encode('latin1')
+#####################################################################################################
+# Return variable
+#####################################################################################################
+  return header
+############################## end of npyHeader() function ##########################################
+#####################################################################################################
+
+
+#####################################################################################################
+#
+# Function Name:    openExport()
+#
+# Description:      Opens a temporary file for the output and writes its header.
+#
+# Arguments:        input - string output_name   - file to write
+#                   input - string export_format - '.csv', '.npy' or '.parquet'
+#                   input - dict fields          - fields from parseFields()
+#                   input - string[] filepathnames - files exported, for the width of source_file
+#
+# Return Variable:  output - dict writer - 'format', 'output_name', 'temp_name' and 'file' of the
+#                            output, and the 'csv' writer,
+#                            the 'struct' of a .npy row with its 'descr', 'header_size', text 'widths'
+#                            and values written for 'missing' numbers, or the 'parquet' writer with its
+#                            'schema'
+#
+# Notes:            None.
+#
+#####################################################################################################
+def openExport(output_name, export_format, fields, filepathnames):
+#####################################################################################################
+# Open output file in the format asked for
+# Write header line, .npy header or parquet schema
+#####################################################################################################
+  writer = {'format': export_format, 'output_name': output_name, 'file': None,
+            'temp_name': getIndentedClm.tempOutputName(output_name)}
+  if export_format == '.csv':
+    writer['file'] = open(writer['temp_name'], 'x', newline='')
+    writer['csv'] = csv.writer(writer['file'])
+    writer['csv'].writerow([name for name, field_type in fields['columns']])
+  elif export_format == '.npy':
+    descr = []
+    missing = []
+    row_format = '<'
+    for name, (type_name, width) in fields['columns']:
+      if name == 'source_file':
+        width = max(len(filepathname) for filepathname in filepathnames)
+      if type_name == 'str':
+        width = width or text_width
+        descr.append((name, '<U' + str(width)))
+        row_format += str(width * 4) + 's'
+        missing.append('')
+      elif type_name == 'int':
+        descr.append((name, '<i8'))
+        row_format += 'q'
+        missing.append(0)
+      else:
+        descr.append((name, '<f8'))
+        row_format += 'd'
+        missing.append(float('nan'))
+    writer['descr'] = descr
+    writer['missing'] = missing
+    writer['struct'] = struct.Struct(row_format)
+    writer['widths'] = [int(dtype[2:]) if dtype.startswith('<U') else None for name, dtype in descr]
+    header = npyHeader(descr, 0)
+    writer['header_size'] = len(header)
+    writer['file'] = open(writer['temp_name'], 'xb')
+    writer['file'].write(header)
+  else:
+    arrow_types = {'str': pyarrow.string(), 'int': pyarrow.int64(), 'float': pyarrow.float64()}
+    writer['schema'] = pyarrow.schema([(name, arrow_types[type_name]) for name, (type_name, width) in fields['columns']])
+    writer['parquet'] = pyarrow.parquet.ParquetWriter(writer['temp_name'], writer['schema'])
+#####################################################################################################
+# Return variable
+#####################################################################################################
+  return writer
+############################## end of openExport() function #########################################
+#####################################################################################################
+
+
+#####################################################################################################
+#
+# Function Name:    writeBatch()
+#
+# Description:      Writes one batch of rows to the output file.
+#
+# Arguments:        input - dict writer - writer from openExport()
+#                   input - list batch  - rows from iterFileBatches()
+#
+# Return Variable:  N/A
+#
+# Notes:            In .npy files text is cut to the width of its column, a missing int is written as 0
+#                   and a missing float as nan.
+#
+#####################################################################################################
+def writeBatch(writer, batch):
+#####################################################################################################
+# Write rows as csv lines, packed .npy records or a parquet row group
+#####################################################################################################
+  if writer['format'] == '.csv':
+    writer['csv'].writerows(batch)
+  elif writer['format'] == '.npy':
+    records = []
+    for row in batch:
+      packed = []
+      for value, width, missing in zip(row, writer['widths'], writer['missing']):
+        if value is None:
+          value = missing
+        if width is not None:
+          value = value[:width].encode('utf-32-le')
+        packed.append(value)
+      records.append(writer['struct'].pack(*packed))
+    writer['file'].write(b''.join(records))
+  else:
+    columns = list(zip(*batch))
+    arrays = [pyarrow.array(column, type=writer['schema'].field(index).type) for index, column in enumerate(columns)]
+    writer['parquet'].write_table(pyarrow.Table.from_arrays(arrays, schema=writer['schema']))
+############################## end of writeBatch() function #########################################
+#####################################################################################################
+
+
+#####################################################################################################
+#
+# Function Name:    closeExport()
+#
+# Description:      Finishes and closes the output file, and renames it to the output name.
+#
+# Arguments:        input - dict writer - writer from openExport()
+#                   input - int rows    - number of rows written
+#                   input - bool keep   - Rename the file into place (Default = True), or remove it when
+#                                         the export did not finish
+#
+# Return Variable:  N/A
+#
+# Notes:            The .npy header is rewritten with the number of rows written.
+#
+#####################################################################################################
+def closeExport(writer, rows, keep=True):
+#####################################################################################################
+# Rewrite .npy header with the final shape
+# Close output file
+# Rename or remove temporary file
+#####################################################################################################
+  try:
+    if writer['format'] == '.npy':
+      writer['file'].seek(0)
+      writer['file'].write(npyHeader(writer['descr'], rows, writer['header_size']))
+    if writer['format'] == '.parquet':
+      writer['parquet'].close()
+    else:
+      writer['file'].close()
+    if keep:
+      os.replace(writer['temp_name'], writer['output_name'])
+  finally:
+    if os.path.exists(writer['temp_name']):
+      os.remove(writer['temp_name'])
+############################## end of closeExport() function ########################################
+#####################################################################################################
+
+
+#####################################################################################################
+#
+# Print Messages
+#
+#####################################################################################################
+def printResult(return_code):
+  if return_code == iSuccess:
+    print('Done!')
+  else:
+    print('Program failed!')
+
+def printNoFieldsMsg():
+  noFieldsMsg = ['Error occured\n',
+                 'No output file and fields included to export.\n',
+                 'Please use --o <output file> --fields <name=path(:type),...>.']
+  noFieldsMsg = ''.join(noFieldsMsg)
+  print(noFieldsMsg)
+
+def printInvalidFieldsMsg(error):
+  invalidFieldsMsg = ['Error occured\n',
+                      'Invalid fields or selector: ', str(error), '\n',
+                      'Please verify --fields, e.g. "icn=@icn,date=//ServiceDate:str10,amount=Line/Amount:float".']
+  invalidFieldsMsg = ''.join(invalidFieldsMsg)
+  print(invalidFieldsMsg)
+
+def printInvalidFormatMsg(output_name):
+  invalidFormatMsg = ['Error occured\n',
+                      'Unknown format of output file ', output_name, '\n',
+                      'Please use a file ending in ', ', '.join(export_formats), '.']
+  invalidFormatMsg = ''.join(invalidFormatMsg)
+  print(invalidFormatMsg)
+
+def printNoPyarrowMsg():
+  noPyarrowMsg = ['Error occured\n',
+                  'Writing .parquet files needs pyarrow, which is not installed.\n',
+                  'Please install pyarrow, or export to .csv or .npy instead.']
+  noPyarrowMsg = ''.join(noPyarrowMsg)
+  print(noPyarrowMsg)
+
+def printExportSummaryMsg(rows, output_name):
+  exportSummaryMsg = ['Exported ', str(rows), ' claims to ', output_name]
+  exportSummaryMsg = ''.join(exportSummaryMsg)
+  print(exportSummaryMsg)
+############################## end of print messages ################################################
+#####################################################################################################
+
+
+#####################################################################################################
+# Execute only if program was called as a script, not if it was imported
+#####################################################################################################
+# Initialize program by getting output file, fields and search_path
+# Fetches options from init() function
+# Read identifiers file if one is provided by the user
+# Execute main() if an output file and fields are provided by the user
+#####################################################################################################
+if __name__ == '__main__':
+  options = init()
+  if options.search_path:
+    search_path = options.search_path
+  if options.extension:
+    extension = options.extension
+  if options.claim_tag:
+    claim_tag = options.claim_tag
+  if options.processes:
+    processes = options.processes
+  if options.batch_size:
+    batch_size = options.batch_size
+  if options.text_width:
+    text_width = options.text_width
+  identifiers = set()
+  if options.ids_file:
+    identifiers = getIndentedClm.readIdentifiersFile(options.ids_file)
+  if options.identifier and identifiers != '':
+    identifiers.add(options.identifier)
+
+  if identifiers == '':
+    printResult(iFailure)
+  elif options.output_name and options.fields_text:
+    ret = main(options.output_name, options.fields_text, extension, search_path, claim_tag, options.recursive,
+               processes, identifiers, options.selector, batch_size)
+    printResult(ret)
+  else:
+    printNoFieldsMsg()
+#####################################################################################################
+############################## end of exportClaims.py program ######################################
+#####################################################################################################
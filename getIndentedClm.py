@@ -2,6 +2,18 @@
 #####################################################################################################
 ##  Usage: 
 ##  getFormattedClm.py --id <unique_identifier> (--x <extension>) (--p <folder path>) (--f <subdirectory name>)
+##                     (--t <claim element name>)
+##  getFormattedClm.py --ids-file <identifiers file> (--o <combined output file>) (--x ...) (--p ...) (--f ...)
+##  getFormattedClm.py --build-index (--index <index file>) (--x ...) (--p ...) (--f ...) (--t ...)
+##  Any use of the index may add (--index-fields <identifier paths>) to choose the values indexed
+##  Any lookup may add (--a) to search every file, (--r) to include subdirectories and (--j <processes>)
+##  and (--prefilter) to only parse files and claims containing the identifier bytes
+##  Any lookup may add (--server <host:port>) to ask a running getIndentedClmServer.py instead
+##  Any run may add (--stats), (--stats-file <report file>) and (--profile <profile file>)
+##  Any lookup may add (--o <output file>) or (--stdout) to write every claim to one file or to standard output
+##  Any scan may add (--resume) to continue from the checkpoint (--checkpoint <checkpoint file>)
+##  getFormattedClm.py --select "<selector>" (--o <output file>) (--x ...) (--p ...) (--f ...) (--t ...)
+##  --select may also be added to an --id or --ids-file lookup to only keep the claims matching it
 ##
 ##  File ID:      getFormattedClm.py
 ##  
@@ -10,9 +22,17 @@
 ##                specify the full path for the search.
 ##                Additionally, the --f / --folder flag may be used to specify a subdirectory 
 ##                to search from within the default search path.
+##                The file is read once as a stream and only the claims containing the unique
+##                identifier are formatted and written out.
 ## 
 ##  Outputs:      INDENT.<unique_identifier>
 ##                - file with formatted claims containing the unique identifier
+##                  (with --ids-file, one file per identifier found, or the --o combined file)
+##                INDENT.select
+##                - file with formatted claims matching the --select selector, or the --o file
+##                Each output file is written under a hidden temporary name in the same directory and
+##                renamed into place when all of its claims were written, replacing an earlier output.
+##                With --stdout the claims are written to standard output and messages to standard error.
 ## 
 ##  Notes:        If --folder and --search_path options are used together, the --search_path option
 ##                will be ignored and the --folder subdirectory will be searched instead.
@@ -28,14 +48,58 @@
 #####################################################################################################
 
 #####################################################################################################
-# Set up (Import libraries, clear terminal and set defaults for variables 
+# Set up (Import libraries and set defaults for variables 
 #####################################################################################################
+import bz2
+import cProfile
+import fcntl
+import functools
+import gzip
+import hashlib
+import itertools
+import json
+import lzma
+import mmap
+import multiprocessing
 import os
-import subprocess
+import re
+import shutil
+import sqlite3
+import sys
+import time
+import urllib.error
+import urllib.request
+import xml.etree.ElementTree as ET
 from optparse import OptionParser
-os.system('cls' if os.name == 'nt' else 'clear')
+from xml.parsers import expat
+from xml.sax.saxutils import quoteattr
+try:
+  import zstandard
+except ImportError:
+  zstandard = None
+try:
+  import resource
+except ImportError:
+  resource = None
 search_path = '/export/home/dcu9126/test'
 extension = '.xml'
+identifier = ''
+claim_tag = None
+chunk_size = 1024 * 1024
+prefilter_limit = 64
+compression_magics = [('gzip', b'\x1f\x8b'), ('bz2', b'BZh'), ('xz', b'\xfd7zXZ\x00'), ('zstd', b'\x28\xb5\x2f\xfd')]
+processes = os.cpu_count() or 1
+index_timeout = 300
+checkpoint_interval = 10
+server_timeout = 300
+output_buffer = 1024 * 1024
+max_open_outputs = 64
+output_counter = itertools.count(1)
+claim_stdout = None
+run_stats = None
+index_path = os.path.join(os.path.expanduser('~'), 'develop', 'data', 'clmindex.db')
+index_fields = '@icn,//ICN'
+checkpoint_path = os.path.join(os.path.expanduser('~'), 'develop', 'data', 'clmcheckpoint.db')
 iSuccess = 0
 iFailure = 1
 ############################## end of set up ########################################################
@@ -46,67 +110,73 @@ iFailure = 1
 #
 # Function Name:    main()
 #
-# Description:      This is the main function that controls the processing. It will create an indented
-#                   XML output file from the XML file found in the search path directory.
-#                   The program will also create an indented XML output file containing only the claim 
-#                   with the unique identifier provided as an input argument by the user.
+# Description:      This is the main function that controls the processing. It will stream the XML file
+#                   found in the search path directory and create an indented XML output file containing
+#                   only the claim with the unique identifier provided as an input argument by the user.
 #
 # Arguments:        input - string identifier   - Unique identifier to search for to find claim
 #                   input - string extension    - Filetype extension to search for (Default = '.xml')
 #                   input - string search_path  - Full path to directory that is to be searched for file
+#                   input - string claim_tag    - Element name of a claim (Default = None, every child
+#                                                 of the root element is a claim)
+#                   input - string index_path   - Claim index to look the identifier up in (Default = None,
+#                                                 stream the whole file)
+#                   input - bool search_all     - Search every file with the extension, not only the first
+#                   input - bool recursive      - Also search files in subdirectories of search_path
+#                   input - int processes       - Number of files to search at the same time (Default = 1)
+#                   input - bool prefilter      - Only parse files and claims containing the identifier bytes
+#                   input - string server       - host:port of a lookup server to ask instead (Default = None)
+#                   input - dict selector       - Only write claims matching this selector (Default = None)
+#                   input - string checkpoint_path - Checkpoint to resume the scan from and save progress to
+#                                                 (Default = None)
+#                   input - string outputname   - filename to write the claims to, or '-' for standard
+#                                                 output (Default = None, INDENT.<identifier>)
 #
 # Return Codes:     0 - iSuccess - The function executed successfully.
 #                   1 - iFailure - The function did not execute successfully.
 #
-# Notes:            None.
+# Notes:            The selector is checked locally, so it is not used with a server.
 #
 #####################################################################################################
-def main(identifier, extension, search_path):
+def main(identifier, extension, search_path, claim_tag=None, index_path=None, search_all=False,
+         recursive=False, processes=1, prefilter=False, server=None, selector=None, checkpoint_path=None,
+         outputname=None):
 #####################################################################################################
 # Initialize Return Code.
-# Read files from search path
-# Get filepath to 'getCmlXml.pl' file
-# Look for file with specified extension type
-# Execute xmllint on located file to write to indented output file INDENT.filename
-# Execute getClmXml.pl on indented output file to retreive claim with unique identifier.
+# Look for file(s) with specified extension type in search path
+# Stream located file(s) and write claims with unique identifier to indented output file INDENT.identifier
 # Return iRc. 
 #####################################################################################################
   iRc = iFailure
-  files = readFilesFromSearchPath(search_path)
-  getClmXmlFilePath = getFilepathToGetClmXml()
-  if files != '' and getClmXmlFilePath != '':
-    # Search path provided is valid and getClmXml.pl found in $PERLPATH
-    msg = 'Looking for ' + extension + ' file in ' + search_path
+  indented_clm_outputname = outputname or 'INDENT.' + identifier
+  if server:
+    matches = extractFromServer({identifier}, server, extension, search_path, claim_tag, indented_clm_outputname,
+                                search_all, recursive)
+    if matches:
+      iRc = iSuccess
+    elif matches is not None:
+      printIdentifierNotFoundMsg(identifier, search_path)
+    filepathnames = []
+  else:
+    filepathnames = findFilesToSearch(extension, search_path, search_all, recursive)
+  if filepathnames:
+    # Streams file(s) and writes claims with the identifier to new, indented file
+    msg = 'Attempting to extract claim with unique identifier ' + identifier + ' from file...'
     print(msg)
-    filename = lookForFile(files, extension, search_path)
-
-    if filename != '':
-      # File with proper extension found in directory
-      filepathname = os.path.join(search_path, filename)
-      indented_xml_outputname = 'INDENT.' + filename
-      indented_clm_outputname = 'INDENT.' + identifier
-  
-      # Runs bash xmlllint command to format original file into new file
-      msg = extension + ' file ' + filename + ' found!\nFormatting file...\n'
-      print(msg)
-      executeXmlLint(indented_xml_outputname, filepathname)
-  
-    
-      # Runs getClmXml.pl script to get claim from new, indented file
-      msg = 'File formatted. Attempting to extract claim with unique identifier ' + identifier + ' from file...'
-      print(msg)
-      executeGetClmXml(indented_clm_outputname, indented_xml_outputname, identifier, getClmXmlFilePath)
-  
-      if os.stat(indented_clm_outputname).st_size > 0:
-        os.remove(indented_xml_outputname)
+    try:
+      matches = extractFromFiles({identifier}, filepathnames, indented_clm_outputname, claim_tag,
+                                 index_path, processes, prefilter, selector, checkpoint_path)
+      if matches:
         iRc = iSuccess
       else:
-        os.remove(indented_clm_outputname)
-        msg = 'Identifier ' + identifier + ' not found in search path ' + search_path
-        print(msg)
-    else:
-      # Else file not found in directory
-      printFileNotFoundMsg(extension, search_path)
+        printIdentifierNotFoundMsg(identifier, search_path)
+    except (expat.ExpatError, OSError, EOFError, lzma.LZMAError) as error:
+      printParseErrorMsg(search_path, error)
+    except sqlite3.Error as error:
+      if index_path:
+        printIndexErrorMsg(index_path, error)
+      else:
+        printCheckpointErrorMsg(checkpoint_path, error)
   
 #####################################################################################################
 # Return code of the function
@@ -114,6 +184,197 @@ def main(identifier, extension, search_path):
   return iRc  
 ############################## end of main() function ###############################################
 #####################################################################################################
+
+
+#####################################################################################################
+#
+# Function Name:    mainBatch()
+#
+# Description:      Batch version of main(). It will stream the XML file(s) found in the search path
+#                   directory once and create an indented XML output file for every unique identifier
+#                   found, or a single combined output file, then report the identifiers not found.
+#
+# Arguments:        input - set identifiers         - Unique identifiers to search for to find claims
+#                   input - string extension        - Filetype extension to search for (Default = '.xml')
+#                   input - string search_path      - Full path to directory that is to be searched for file
+#                   input - string claim_tag        - Element name of a claim (Default = None)
+#                   input - string combined_outputname - filename to write all claims to (Default = None)
+#                   input - string index_path       - Claim index to look identifiers up in (Default = None)
+#                   input - bool search_all         - Search every file with the extension, not only the first
+#                   input - bool recursive          - Also search files in subdirectories of search_path
+#                   input - int processes           - Number of files to search at the same time (Default = 1)
+#                   input - bool prefilter          - Only parse files and claims containing the identifier bytes
+#                   input - string server           - host:port of a lookup server to ask instead (Default = None)
+#                   input - dict selector           - Only write claims matching this selector (Default = None)
+#                   input - string checkpoint_path  - Checkpoint to resume the scan from and save progress to
+#                                                     (Default = None)
+#
+# Return Codes:     0 - iSuccess - Every identifier was found.
+#                   1 - iFailure - The function did not execute successfully, or identifiers were missing.
+#
+# Notes:            The selector is checked locally, so it is not used with a server.
+#
+#####################################################################################################
+def mainBatch(identifiers, extension, search_path, claim_tag=None, combined_outputname=None, index_path=None,
+              search_all=False, recursive=False, processes=1, prefilter=False, server=None, selector=None,
+              checkpoint_path=None):
+#####################################################################################################
+# Initialize Return Code.
+# Look for file(s) with specified extension type in search path
+# Stream located file(s) once and write claims for every identifier
+# Print summary of identifiers not found
+# Return iRc. 
+#####################################################################################################
+  iRc = iFailure
+  if server:
+    matches = extractFromServer(identifiers, server, extension, search_path, claim_tag, combined_outputname,
+                                search_all, recursive)
+    if matches is not None:
+      missing = sorted(identifiers.difference(matches))
+      printBatchSummaryMsg(len(identifiers), missing)
+      if not missing:
+        iRc = iSuccess
+    filepathnames = []
+  else:
+    filepathnames = findFilesToSearch(extension, search_path, search_all, recursive)
+  if filepathnames:
+    msg = 'Attempting to extract claims for ' + str(len(identifiers)) + ' unique identifiers from file...'
+    print(msg)
+    try:
+      matches = extractFromFiles(identifiers, filepathnames, combined_outputname, claim_tag,
+                                 index_path, processes, prefilter, selector, checkpoint_path)
+      missing = sorted(identifiers.difference(matches))
+      printBatchSummaryMsg(len(identifiers), missing)
+      if not missing:
+        iRc = iSuccess
+    except (expat.ExpatError, OSError, EOFError, lzma.LZMAError) as error:
+      printParseErrorMsg(search_path, error)
+    except sqlite3.Error as error:
+      if index_path:
+        printIndexErrorMsg(index_path, error)
+      else:
+        printCheckpointErrorMsg(checkpoint_path, error)
+  
+#####################################################################################################
+# Return code of the function
+#####################################################################################################
+  return iRc  
+############################## end of mainBatch() function ##########################################
+#####################################################################################################
+
+
+#####################################################################################################
+#
+# Function Name:    mainSelect()
+#
+# Description:      Streams the XML file(s) found in the search path directory and writes every claim
+#                   matching the selector to a single indented output file.
+#
+# Arguments:        input - dict selector           - Selector from parseSelector() the claims must match
+#                   input - string extension        - Filetype extension to search for (Default = '.xml')
+#                   input - string search_path      - Full path to directory that is to be searched for file
+#                   input - string claim_tag        - Element name of a claim (Default = None)
+#                   input - string combined_outputname - filename to write the claims to
+#                   input - bool search_all         - Search every file with the extension, not only the first
+#                   input - bool recursive          - Also search files in subdirectories of search_path
+#                   input - int processes           - Number of files to search at the same time (Default = 1)
+#                   input - string checkpoint_path  - Checkpoint to resume the scan from and save progress to
+#                                                     (Default = None)
+#
+# Return Codes:     0 - iSuccess - At least one claim matched the selector.
+#                   1 - iFailure - The function did not execute successfully, or no claim matched.
+#
+# Notes:            Claims not matching the selector are never built or formatted.
+#
+#####################################################################################################
+def mainSelect(selector, extension, search_path, claim_tag, combined_outputname, search_all=False,
+               recursive=False, processes=1, checkpoint_path=None):
+#####################################################################################################
+# Initialize Return Code.
+# Look for file(s) with specified extension type in search path
+# Stream located file(s) and write claims matching the selector to the output file
+# Return iRc. 
+#####################################################################################################
+  iRc = iFailure
+  filepathnames = findFilesToSearch(extension, search_path, search_all, recursive)
+  if filepathnames:
+    msg = 'Attempting to extract claims matching ' + selector['text'] + ' from file...'
+    print(msg)
+    try:
+      search_start = time.perf_counter()
+      errors = []
+      claims = iterScannedClaims(set(), filepathnames, claim_tag, processes, False, errors, selector,
+                                 checkpoint_path)
+      # Every claim is counted under the selector text and written once to the output file
+      matches = writeClaims(((filepathname, [selector['text']], claim_text)
+                             for filepathname, found, claim_text in claims), combined_outputname)
+      selected = matches.get(selector['text'], 0)
+      timeStat('search', time.perf_counter() - search_start)
+      for filepathname, error in errors:
+        printParseErrorMsg(filepathname, error)
+      printSelectSummaryMsg(selected, combined_outputname)
+      if selected:
+        iRc = iSuccess
+    except OSError as error:
+      printParseErrorMsg(search_path, error)
+    except sqlite3.Error as error:
+      printCheckpointErrorMsg(checkpoint_path, error)
+  
+#####################################################################################################
+# Return code of the function
+#####################################################################################################
+  return iRc  
+############################## end of mainSelect() function #########################################
+#####################################################################################################
+
+
+#####################################################################################################
+#
+# Function Name:    mainBuildIndex()
+#
+# Description:      Builds or refreshes the claim index for every file with the extension in the
+#                   search path directory, so later lookups with --index only read the claims found.
+#
+# Arguments:        input - string extension    - Filetype extension to search for (Default = '.xml')
+#                   input - string search_path  - Full path to directory that is to be searched for files
+#                   input - string claim_tag    - Element name of a claim (Default = None)
+#                   input - string index_path   - filepath and name of the index database
+#                   input - bool recursive      - Also index files in subdirectories of search_path
+#
+# Return Codes:     0 - iSuccess - The function executed successfully.
+#                   1 - iFailure - The function did not execute successfully.
+#
+# Notes:            Files already in the index with the same size and modification time are skipped.
+#
+#####################################################################################################
+def mainBuildIndex(extension, search_path, claim_tag, index_path, recursive=False):
+#####################################################################################################
+# Initialize Return Code.
+# Look for all files with specified extension type in search path
+# Refresh index for the files found
+# Return iRc. 
+#####################################################################################################
+  iRc = iFailure
+  filepathnames = findFilesToSearch(extension, search_path, True, recursive)
+  if filepathnames:
+    msg = 'Indexing ' + str(len(filepathnames)) + ' ' + extension + ' files in ' + search_path + ' into ' + index_path + '...'
+    print(msg)
+    try:
+      indexed = buildIndex(filepathnames, index_path, claim_tag)
+      msg = str(indexed) + ' files indexed, ' + str(len(filepathnames) - indexed) + ' files up to date or not indexed.'
+      print(msg)
+      iRc = iSuccess
+    except (expat.ExpatError, OSError, EOFError, lzma.LZMAError) as error:
+      printParseErrorMsg(search_path, error)
+    except sqlite3.Error as error:
+      printIndexErrorMsg(index_path, error)
+
+#####################################################################################################
+# Return code of the function
+#####################################################################################################
+  return iRc  
+############################## end of mainBuildIndex() function #####################################
+#####################################################################################################
   
 
 #####################################################################################################
@@ -133,6 +394,20 @@ def main(identifier, extension, search_path):
 #                   output - string options.extension   - Filetype extension to search for (Default = '.xml')
 #                   output - string options.folder      - Subdirectory in default search directory to search
 #                   output - string options.search_path - Full path to directory that is to be searched for file
+#                   output - string options.claim_tag   - Element name of a claim in the file
+#                   output - string options.ids_file    - File with one unique identifier per line
+#                   output - string options.outputname  - Combined output file for --ids-file claims
+#                   output - string options.index_path  - Claim index to look identifiers up in
+#                   output - bool options.build_index   - Build the claim index for the search path and exit
+#                   output - string options.index_fields - Paths of the identifier values to index
+#                   output - bool options.search_all    - Search every file with the extension in the search path
+#                   output - bool options.recursive     - Also search subdirectories of the search path
+#                   output - int options.processes      - Number of files to search at the same time
+#                   output - bool options.prefilter     - Only parse files and claims containing the identifier bytes
+#                   output - string options.selector    - Only write claims matching this selector
+#                   output - string options.checkpoint_path - Checkpoint file to save scan progress to
+#                   output - bool options.resume        - Continue from the checkpoint instead of starting over
+#                   output - bool options.stdout        - Write the claims to standard output instead of files
 #
 # Notes:            If --folder and --search_path options are used together, the --folder option
 #                   will be ignored and the --search_path directory will be used for the search.
@@ -149,9 +424,45 @@ def init():
   parser.add_option('--x', '--ext', '--extension',    dest='extension', 
                     help='set extension of file to search for. default: .xml')
   parser.add_option('--p', '--path',                  dest='search_path', 
-                    help='set full path to search in for raw claim file. does not search subdirectories.')
+                    help='set full path to search in for raw claim file. does not search subdirectories unless --r is used.')
   parser.add_option('--f', '--folder',                dest='folder', 
                     help='set subdirectory to search from within default directory. do not include /')
+  parser.add_option('--t', '--tag',                   dest='claim_tag', 
+                    help='set element name of a claim. default: every child of the root element')
+  parser.add_option('--ids-file',                     dest='ids_file', 
+                    help='input file with one unique identifier per line to find and get claims in one pass')
+  parser.add_option('--o', '--output',                dest='outputname', 
+                    help='write all claims found to this file instead of INDENT.<identifier>, or claims found with --select instead of INDENT.select')
+  parser.add_option('--stdout',                       dest='stdout', action='store_true', 
+                    help='write all claims found to standard output instead of files, and messages to standard error')
+  parser.add_option('--index',                        dest='index_path', 
+                    help='look identifiers up in this claim index, indexing new or changed files first. only the --index-fields values are found')
+  parser.add_option('--build-index',                  dest='build_index', action='store_true', 
+                    help='index all files with the extension in the search path and exit. default index: ' + index_path)
+  parser.add_option('--index-fields',                 dest='index_fields', 
+                    help='comma separated paths of the identifier values to index, written as --select paths. default: ' + index_fields)
+  parser.add_option('--a', '--all',                   dest='search_all', action='store_true', 
+                    help='search every file with the extension in the search path, not only the first one')
+  parser.add_option('--r', '--recursive',             dest='recursive', action='store_true', 
+                    help='also search files in subdirectories of the search path. implies --a')
+  parser.add_option('--j', '--processes',             dest='processes', type='int', 
+                    help='set number of files to search at the same time. default: number of cpus')
+  parser.add_option('--prefilter',                    dest='prefilter', action='store_true', 
+                    help='skip files without the identifier and only parse the claims around it. needs --t for the claim parsing')
+  parser.add_option('--select',                       dest='selector', 
+                    help='only write claims matching this selector, e.g. "Provider/@npi = 1234567890 AND //ServiceDate in 2024-01-01..2024-03-31". the files are always read directly, not through --server')
+  parser.add_option('--checkpoint',                   dest='checkpoint_path', 
+                    help='save the progress of the scan to this file every ' + str(checkpoint_interval) + ' seconds, starting over unless --resume is used. default with --resume: ' + checkpoint_path)
+  parser.add_option('--resume',                       dest='resume', action='store_true', 
+                    help='continue from the checkpoint of the last scan with the same identifiers, skipping files that did not change since')
+  parser.add_option('--server',                       dest='server', 
+                    help='ask the getIndentedClmServer.py running on host:port instead of reading the files, e.g. localhost:8765')
+  parser.add_option('--stats',                        dest='stats', action='store_true', 
+                    help='print time spent in each stage, files, bytes, claims, index hits and misses and peak memory')
+  parser.add_option('--stats-file',                   dest='stats_filename', 
+                    help='write the stats as json to this file, or append them as one line if it ends in .ndjson or .jsonl')
+  parser.add_option('--profile',                      dest='profile_filename', 
+                    help='profile the run with cProfile and save the profile to this file. use --j 1 to include the scan')
   # get and set command line arugments into local variables using parser
   options, args = parser.parse_args()
 #####################################################################################################
@@ -170,13 +481,14 @@ def init():
 #                   If search_path is not found, '' is returned
 #
 # Arguments:        input - string search_path - Full path to directory that is to be searched for file
+#                   input - bool recursive     - Also return files in subdirectories (Default = False)
 #
 # Return Codes:     ['filename0', 'filename1', ...] - array containing string of all files in the search directory
 #
-# Notes:            None.
+# Notes:            With recursive, filenames are paths relative to search_path, e.g. 'batch1/claims.xml'.
 #
 #####################################################################################################
-def readFilesFromSearchPath(search_path):
+def readFilesFromSearchPath(search_path, recursive=False):
 #####################################################################################################
 # Checks if search path is a valid directory in the system
 # Return the files in the directory if valid, otherwise return '' and print and error message
@@ -184,7 +496,14 @@ def readFilesFromSearchPath(search_path):
   # Verify search path exists in system
   files = ''
   if os.path.exists(search_path):
-    files = os.listdir(search_path)
+    if recursive:
+      files = []
+      for dirpath, dirnames, filenames in os.walk(search_path):
+        dirnames.sort()
+        for filename in filenames:
+          files.append(os.path.relpath(os.path.join(dirpath, filename), search_path))
+    else:
+      files = os.listdir(search_path)
   else:
     printInvalidSearchPathMsg(search_path)
   return files
@@ -229,229 +548,2905 @@ def lookForFile(files, extension, search_path):
 
 #####################################################################################################
 #
-# Function Name:    executeXmlLint()
+# Function Name:    lookForFiles()
 #
-# Description:      Execute xmllint bash command on file found in search_path directory. The output of 
-#                   xmllint is written to new file with filename = indented_xml_outputname
+# Description:      Searches for every file with the given extension in the given search_path directory.
 #
-# Arguments:        input - string indented_xml_outputname - name of indented xml file to create and write to
-#                   input - string filepathname            - filepath and name for raw xml file to format
+# Arguments:        input - string[] files      - Array of filenames in search directory
+#                   input - string extension    - Filetype extension to search for (Default = '.xml') 
+#                   input - string search_path  - Full path to directory that is to be searched for file
 #
-# Return Codes:     0 - iSuccess - The function executed successfully.
-#                   1 - iFailure - The function did not execute successfully.
+# Return Variable:  output - string[] filenames - sorted names of all files found
 #
-# Notes:            None.
+# Notes:            Files with the INDENT. prefix are ignored, the same as lookForFile().
 #
 #####################################################################################################
-def executeXmlLint(indented_xml_outputname, filepathname):
+def lookForFiles(files, extension, search_path):
 #####################################################################################################
-# Creates file and command for indenting input file
-# Calls xmllint bash command
-# Print debugging output
-# Return iRc
+# Collect every regular file with specified extension in search path directory
+# Returns sorted filenames, or [] if no file is found
 #####################################################################################################
-  iRc = iFailure
-  indented_xml_file = open(indented_xml_outputname, "a")
-  bash_cmd = 'xmllint --format --recover ' + filepathname
-  ret = subprocess.call(bash_cmd.split(), stdout=indented_xml_file)
-  indented_xml_file.close()
-  if ret == 0:
-    iRc = iSuccess
-  printXmllintRc(ret)
+  filenames = []
+  for file in files:
+    basename = os.path.basename(file)
+    if ('INDENT.' not in basename) and (extension in basename) and os.path.isfile(os.path.join(search_path, file)):
+      filenames.append(file)
 #####################################################################################################
-# Return code
+# Return variable
 #####################################################################################################
-  return iRc
-############################## end of executeXmlLint() function #####################################
+  return sorted(filenames)
+############################## end of lookForFiles() function #######################################
 #####################################################################################################
 
 
 #####################################################################################################
 #
-# Function Name:    getFilepathToGetClmXml()
+# Function Name:    findFilesToSearch()
 #
-# Description:      Attempts to search the directory located at the $PERLPATH environment variable
-#                   and locate the getClmXml.pl file. The filepath to getClmXml.pl to returned as a string.
+# Description:      Finds the file, or every file, with the given extension in the search path directory
+#                   and prints what was found.
 #
-# Arguments:        N/A
+# Arguments:        input - string extension    - Filetype extension to search for (Default = '.xml')
+#                   input - string search_path  - Full path to directory that is to be searched for file
+#                   input - bool search_all     - Return every file with the extension, not only the first
+#                   input - bool recursive      - Also search subdirectories (implies search_all)
 #
-# Return Variable:  string getClmXmlFilePath - filepath to getClmXml.pl
+# Return Variable:  output - string[] filepathnames - filepaths and names of the files to search, or []
 #
 # Notes:            None.
 #
 #####################################################################################################
-def getFilepathToGetClmXml():
+def findFilesToSearch(extension, search_path, search_all=False, recursive=False):
 #####################################################################################################
-# Retrieves path to perl script from environment variable $PERLPATH
-# If perl path directory is found in system, checks for getClmXml.pl
-# Returns perlpath/getClmXml.pl if found, otherwise returns '' and prints an error message
+# Read files from search path
+# Look for the first file, or all files, with specified extension type
+# Return filepaths of files found
 #####################################################################################################
-  # Try to get $PERLPATH environment variable to locate getClmXml.pl
-  getClmXmlFilePath = ''
-  try:
-    perlpath = os.environ['PERLPATH']
-    if os.path.exists(perlpath):
-      plFiles = os.listdir(perlpath)
-      for file in plFiles:
-        if 'getClmXml.pl' in file:
-          getClmXmlFilePath = os.path.join(perlpath, file)
-          break
-    if getClmXmlFilePath == '':
-      printInvalidPerlPathMsg(perlpath)
-  except KeyError:
-    printKeyErrorExceptionMsg()
-  except:
-    printUnknownExceptionMsg()
+  filepathnames = []
+  list_start = time.perf_counter()
+  files = readFilesFromSearchPath(search_path, recursive)
+  if files != '':
+    # Search path provided is valid
+    msg = 'Looking for ' + extension + ' file in ' + search_path
+    print(msg)
+    if search_all or recursive:
+      filenames = lookForFiles(files, extension, search_path)
+      if filenames:
+        msg = str(len(filenames)) + ' ' + extension + ' files found!'
+        print(msg)
+    else:
+      filename = lookForFile(files, extension, search_path)
+      filenames = [filename] if filename != '' else []
+      if filenames:
+        msg = extension + ' file ' + filename + ' found!'
+        print(msg)
+    if not filenames:
+      # Else file not found in directory
+      printFileNotFoundMsg(extension, search_path)
+    filepathnames = [os.path.join(search_path, filename) for filename in filenames]
+  timeStat('list', time.perf_counter() - list_start)
+  countStat('files_found', len(filepathnames))
 #####################################################################################################
 # Return variable
 #####################################################################################################
-  return getClmXmlFilePath
-############################## end of getFilepathToGetClmXml() function #############################
+  return filepathnames
+############################## end of findFilesToSearch() function ##################################
 #####################################################################################################
 
 
 #####################################################################################################
 #
-# Function Name:    executeGetCmlXml()
+# Function Name:    registerNamespace()
 #
-# Description:      Execute getClmXml.pl script to retrieve the claim with the specified identifier
-#                   from the indented xml created from the file found in the search_path directory. 
-#                   The output of getClmXml.pl is written to a new file with filename = indented_clm_outputname
-#                   
+# Description:      Registers a namespace prefix read from a raw xml file so that claims are written
+#                   with the same prefix instead of ns0, ns1, ...
 #
-# Arguments:        input - string indented_clm_outputname - filename of new indented claim file
-#                   input - string indented_xml_outputname - filename of whole indented xlm file
-#                   input - string identifier              - Unique identifier to search for to find claim
-#                   input - string getClmXmlFilePath       - filepath for getClmXml.pl
+# Arguments:        input - string prefix - namespace prefix, '' for the default namespace
+#                   input - string uri    - namespace uri
 #
-# Return Codes:     0 - iSuccess - The function executed successfully.
-#                   1 - iFailure - The function did not execute successfully.
+# Return Variable:  N/A
 #
-# Notes:            None.
+# Notes:            Reserved ns0, ns1, ... prefixes are left to ElementTree.
 #
 #####################################################################################################
-def executeGetClmXml(indented_clm_outputname, indented_xml_outputname, identifier, getClmXmlFilePath):
+def registerNamespace(prefix, uri):
 #####################################################################################################
-# Creates file for intented claim output
-# Creates bash script for calling getClmXml.pl
-# Calls getClmXml.pl bash command
+# Register prefix with ElementTree, ignoring reserved prefixes
 #####################################################################################################
-  iRc = iFailure
-  indented_clm_file = open(indented_clm_outputname, "a")
-  subprocess.call([getClmXmlFilePath, indented_xml_outputname, identifier], stdout=indented_clm_file)
-  indented_clm_file.close()
-  if os.stat(indented_xml_outputname).st_size != 0:
-    iRc = iSuccess
+  try:
+    ET.register_namespace(prefix, uri)
+  except ValueError:
+    pass
+############################## end of registerNamespace() function ##################################
+#####################################################################################################
+
+
+#####################################################################################################
+#
+# Function Name:    detectCompression()
+#
+# Description:      Checks the first bytes of a file for the gzip, bz2, xz or zstd magic number.
+#
+# Arguments:        input - string filepathname - filepath and name for raw xml file
+#
+# Return Variable:  output - string compression - 'gzip', 'bz2', 'xz' or 'zstd', or None for a plain file
+#
+# Notes:            The file name is not used, so archives are found whatever they are named.
+#
+#####################################################################################################
+def detectCompression(filepathname):
+#####################################################################################################
+# Read magic number and look it up
 #####################################################################################################
-# Return code
+  compression = None
+  with open(filepathname, 'rb') as raw_file:
+    magic = raw_file.read(6)
+  for compression_name, compression_magic in compression_magics:
+    if magic.startswith(compression_magic):
+      compression = compression_name
+      break
+#####################################################################################################
+# Return variable
 #####################################################################################################
-  return iRc
-############################## end of executeGetClmXml() function ###################################
+  return compression
+############################## end of detectCompression() function ##################################
 #####################################################################################################
 
 
 #####################################################################################################
 #
-# Print Functions 
+# Function Name:    openClaimFile()
+#
+# Description:      Opens a raw xml file for reading as bytes. Compressed files are decompressed as
+#                   they are read, so an uncompressed copy is never written and only one chunk is
+#                   decompressed in memory at a time.
+#
+# Arguments:        input - string filepathname - filepath and name for raw xml file
+#
+# Return Variable:  output - file claim_file - open binary file of the uncompressed xml
+#
+# Notes:            Offsets in the returned file are offsets in the uncompressed xml. Seeking forward in a
+#                   compressed file decompresses up to the new position.
+#                   zstd files need the zstandard library, otherwise an OSError is raised.
 #
 #####################################################################################################
-def printResult(return_code):
-  if return_code == iSuccess:
-    print('Done!')
+def openClaimFile(filepathname):
+#####################################################################################################
+# Detect compression and open file with matching decompressor
+#####################################################################################################
+  compression = detectCompression(filepathname)
+  if compression == 'gzip':
+    claim_file = gzip.open(filepathname, 'rb')
+  elif compression == 'bz2':
+    claim_file = bz2.open(filepathname, 'rb')
+  elif compression == 'xz':
+    claim_file = lzma.open(filepathname, 'rb')
+  elif compression == 'zstd':
+    if zstandard is None:
+      raise OSError('zstd compressed file, but the zstandard library is not installed')
+    claim_file = zstandard.ZstdDecompressor().stream_reader(open(filepathname, 'rb'), closefd=True)
   else:
-    print('Program failed!')
+    claim_file = open(filepathname, 'rb')
+#####################################################################################################
+# Return variable
+#####################################################################################################
+  return claim_file
+############################## end of openClaimFile() function ######################################
+#####################################################################################################
 
-def printXmllintRc(return_code):
-  switcher = {
-    0: 'Successfully performed xmllint on file',
-    1: 'Unclassified error',
-    2: 'Error in DTD',
-    3: 'Validation error',
-    4: 'Validation error',
-    5: 'Error in schema compilation',
-    6: 'Error writing output',
-    7: 'Error in pattern',
-    9: 'Out of memory error'
-  }
-  print(switcher.get(return_code, 'Unclassified error'))
-
-def printGetClmXmlError(return_code):
-  switcher = {
-    0: 'Successfully performed xmllint on file',
-    1: 'Unclassified error',
-    2: 'Error in DTD',
-    3: 'Validation error',
-    4: 'Validation error',
-    5: 'Error in schema compilation',
-    6: 'Error writing output',
-    7: 'Error in pattern',
-    9: 'Out of memory error'
-  }
-  pass
-  
-def printNoIdentifierMsg():
-  noIdentifierMsg = ['Error occured\n',
-                     'No unique identifier included to search claim for.']
-  noIdentifierMsg = ''.join(noIdentifierMsg)
-  print(noIdentifierMsg)
 
-def printFileNotFoundMsg(extension, search_path):
-  fileNotFoundMsg = ['Error occured\n',
-                     extension, ' file not found in ', search_path]
-  fileNotFoundMsg = ''.join(fileNotFoundMsg)
-  print(fileNotFoundMsg)
+#####################################################################################################
+#
+# Function Name:    iterClaims()
+#
+# Description:      Streams the raw xml file through an expat parser in chunks and yields each claim
+#                   element as soon as its end tag is read. Only the claim currently being read is held
+#                   in memory. Each claim is released after the caller is done with it, so memory is
+#                   bounded by the size of the largest claim rather than the size of the file.
+#                   gzip, bz2, xz and zstd files are decompressed in chunks as they are read.
+#
+# Arguments:        input - string filepathname - filepath and name for raw xml file to search
+#                   input - string claim_tag    - Element name of a claim (Default = None, every child
+#                                                 of the root element is a claim)
+#                   input - dict file_info      - Optional dict filled in with the 'encoding' of the file
+#                                                 and the 'namespaces' declared in it, as prefix: uri
+#                   input - dict selector       - Only yield claims matching this selector from
+#                                                 parseSelector() (Default = None, every claim)
+#                   input - dict fields         - Yield the values of these fields instead of the claim
+#                                                 element, see captureFieldElement() (Default = None)
+#                   input - tuple resume        - (prologue_end, offset) to continue an earlier scan from the
+#                                                 end of a claim at offset (Default = None, start of the file)
+#
+# Return Variable:  output - (Element claim, set values, int start, int end) - claim element, set of
+#                            all non-empty attribute values and element text in the claim, and the byte
+#                            offsets of the claim start tag and the end of the claim end tag in the
+#                            uncompressed file. With fields, the list of field values (None for a field
+#                            not found) is yielded instead of the claim element.
+#
+# Notes:            Element names are compared without their namespace. Namespace prefixes read from
+#                   the file are registered so that the claim is written with the original prefixes.
+#                   With a selector, no tree is built while streaming a claim. Only the path and
+#                   attributes of the open elements are kept to check the selector conditions, and the
+#                   bytes of the claim are kept so that a matching claim can be parsed on its own.
+#                   With fields, claims are never built or parsed at all.
+#                   file_info also gets the 'prologue_end', the start offset of the first claim since the
+#                   last element outside of the claims started or ended. The bytes before it put the
+#                   parser in the same place as the end of any later claim, so a scan can be resumed by
+#                   parsing only those bytes and then skipping to the end of the last claim handled.
+#
+#####################################################################################################
+def iterClaims(filepathname, claim_tag=None, file_info=None, selector=None, fields=None, resume=None):
+#####################################################################################################
+# Create expat parser and set handlers that build a tree only while inside of a claim,
+# or check the selector conditions and capture the fields instead if either is given
+# Read raw file in chunks and feed each chunk to the parser, skipping from the prologue end to
+# the resume offset if resuming
+# Yield every claim completed by the chunk, then drop it
+#####################################################################################################
+  claims = []
+  text_stack = []
+  element_stack = []
+  state = {'depth': 0, 'claim_depth': 0, 'inside': False, 'builder': None, 'values': None, 'matched': None,
+           'row': None, 'start': 0, 'window': b'', 'window_start': 0, 'shift': 0, 'moved': True}
+  if file_info is None:
+    file_info = {}
+  file_info['encoding'] = None
+  file_info['namespaces'] = {}
+  parser = expat.ParserCreate(namespace_separator='}')
+  parser.buffer_text = True
+  parser.buffer_size = chunk_size
 
-def printInvalidSearchPathMsg(search_path):
-  invalidSearchPathMsg = ['Error occured\n',
-                          'Search path ', search_path, ' for file does not exist.\n',
-                          'Please verify search path.']
-  invalidSearchPathMsg = ''.join(invalidSearchPathMsg)
-  print(invalidSearchPathMsg)
+  def qualifyName(name):
+    # expat reports 'uri}name', ElementTree expects '{uri}name'
+    if '}' in name:
+      return '{' + name
+    return name
 
-def printInvalidPerlPathMsg(perlpath):
-  invalidPerlPathMsg = ['Error occured\n',
-                        'getClmXml.pl not found in ', perlpath, '. '
-                        'Please verify path to getClmXml.pl file']
-  invalidPerlPathMsg = ''.join(invalidPerlPathMsg)
-  print(invalidPerlPathMsg)
-
-def printKeyErrorExceptionMsg():
-  keyErrorExceptionMsg = ['KeyError exception occured.\n'
-                          'Please define environment variable $PERLPATH in your .profile file or hardcode directory into program\n',
-                          'For example: Add line in .profile: export PERLPATH=/export/home/dcxXXXX/develop/perl']
-  keyErrorExceptionMsg = ''.join(keyErrorExceptionMsg)
-  print(keyErrorExceptionMsg)
- 
-def printUnknownExceptionMsg():
-  unknownExceptionMsg = 'Unknown exception occured.'
-  print(unknownExceptionMsg)
-############################## end of print messages ################################################
+  def xmlDecl(version, encoding, standalone):
+    file_info['encoding'] = encoding
+
+  def startNamespace(prefix, uri):
+    file_info['namespaces'].setdefault(prefix or '', uri)
+    registerNamespace(prefix or '', uri)
+
+  def startElement(name, attrs):
+    state['depth'] += 1
+    if not state['inside']:
+      if claim_tag is None:
+        is_claim = state['depth'] == 2
+      else:
+        is_claim = name.rsplit('}', 1)[-1] == claim_tag
+      if not is_claim:
+        state['moved'] = True
+        return
+      if state['moved']:
+        file_info['prologue_end'] = parser.CurrentByteIndex + state['shift']
+        state['moved'] = False
+      state['inside'] = True
+      if selector is None and fields is None:
+        state['builder'] = ET.TreeBuilder()
+      else:
+        state['matched'] = set()
+        state['row'] = [None] * len(fields['atoms']) if fields is not None else None
+      state['values'] = set()
+      state['claim_depth'] = state['depth']
+      state['start'] = parser.CurrentByteIndex
+    if state['builder'] is not None:
+      state['builder'].start(qualifyName(name), {qualifyName(key): value for key, value in attrs.items()})
+    elif state['depth'] == state['claim_depth']:
+      element_stack.append(('', attrs))
+    else:
+      parent = element_stack[-1][0]
+      local_name = name.rsplit('}', 1)[-1]
+      element_stack.append((parent + '/' + local_name if parent else local_name, attrs))
+    for value in attrs.values():
+      value = value.strip()
+      if value:
+        state['values'].add(value)
+    text_stack.append([])
+
+  def characterData(data):
+    if state['inside']:
+      if state['builder'] is not None:
+        state['builder'].data(data)
+      text_stack[-1].append(data)
+
+  def endElement(name):
+    if state['inside']:
+      value = ''.join(text_stack.pop()).strip()
+      if value:
+        state['values'].add(value)
+      if state['builder'] is not None:
+        state['builder'].end(qualifyName(name))
+      else:
+        path, attrs = element_stack.pop()
+        if selector is not None:
+          matchSelectorElement(selector, path, attrs, value, state['matched'])
+        if fields is not None:
+          captureFieldElement(fields, path, attrs, value, state['row'])
+      if state['depth'] == state['claim_depth']:
+        # End tag ends at the first '>' following the position expat reports for it
+        window = state['window']
+        window_start = state['window_start']
+        end = window_start + window.index(b'>', parser.CurrentByteIndex - window_start) + 1
+        # Offsets in the file are further on than in the parser after skipping to a resume offset
+        shift = state['shift']
+        if state['builder'] is not None:
+          claims.append((state['builder'].close(), state['values'], state['start'] + shift, end + shift))
+        elif selector is None or evaluateSelector(selector['expression'], state['matched']):
+          if fields is not None:
+            claims.append((state['row'], state['values'], state['start'] + shift, end + shift))
+          else:
+            # Only a matching claim is parsed, from its bytes kept in the window
+            claim = parseClaimSlice(window[state['start'] - window_start:end - window_start], file_info)
+            claims.append((claim, state['values'], state['start'] + shift, end + shift))
+        state['inside'] = False
+        state['builder'] = None
+        state['values'] = None
+    else:
+      state['moved'] = True
+    state['depth'] -= 1
+
+  parser.XmlDeclHandler = xmlDecl
+  parser.StartNamespaceDeclHandler = startNamespace
+  parser.StartElementHandler = startElement
+  parser.CharacterDataHandler = characterData
+  parser.EndElementHandler = endElement
+
+  with openClaimFile(filepathname) as raw_file:
+    offset = 0
+    previous = b''
+    skip = resume
+    chunk = raw_file.read(chunk_size if skip is None else min(chunk_size, skip[0]))
+    while True:
+      # Keep the tail of the previous chunk in case an end tag is split between two chunks
+      state['window'] = previous + chunk
+      state['window_start'] = offset - len(previous)
+      try:
+        # An empty chunk is the end of the file
+        parser.Parse(chunk, not chunk)
+      except expat.ExpatError:
+        # Claims completed before the error are still returned
+        if skip is None:
+          for claim in claims:
+            yield claim
+        raise
+      offset += len(chunk)
+      if selector is not None and fields is None and state['inside']:
+        # Keep the bytes of the open claim to parse it if it matches the selector
+        previous = state['window'][state['start'] - state['window_start']:]
+      else:
+        previous = chunk[-4096:]
+      if skip is not None:
+        # Claims in the prologue were already handled by the scan being resumed
+        del claims[:]
+        if offset == skip[0]:
+          raw_file.seek(skip[1])
+          state['shift'] = skip[1] - skip[0]
+          state['moved'] = False
+          file_info['prologue_end'] = skip[0]
+          skip = None
+      completed = claims[:]
+      del claims[:]
+      for claim in completed:
+        yield claim
+      if not chunk:
+        break
+      chunk = raw_file.read(chunk_size if skip is None else min(chunk_size, skip[0] - offset))
+############################## end of iterClaims() function #########################################
 #####################################################################################################
 
 
 #####################################################################################################
-# Execute only if program was called as a script, not if it was imported
+#
+# Function Name:    formatClaim()
+#
+# Description:      Indents the claim element and returns it as text, ending with a newline.
+#
+# Arguments:        input - Element claim - claim element to indent
+#
+# Return Variable:  output - string claim_text - indented claim
+#
+# Notes:            Claim is indented in place with two spaces per level, the same as xmllint --format.
+#
 #####################################################################################################
-# Initialize program by getting identifier, extension and search_path
-# Fetches options from init() function
-# Execute main() if identifier is provided by the user
+def formatClaim(claim):
 #####################################################################################################
-if __name__ == '__main__':
-  options = init()
-  if options.identifier:
-    identifier = options.identifier
-  if options.extension:
-    extension = options.extension
-  if options.folder:
-    search_path = os.path.join(search_path, options.folder)
-  elif options.search_path:
-    search_path = options.search_path
-  
-  if identifier:
-    ret = main(identifier, extension, search_path)
-    printResult(ret)
-  else:
-    printNoIdentifierMsg()
+# Indent claim element and serialize it
+#####################################################################################################
+  ET.indent(claim, space='  ')
+  claim_text = ET.tostring(claim, encoding='unicode') + '\n'
+#####################################################################################################
+# Return variable
+#####################################################################################################
+  return claim_text
+############################## end of formatClaim() function ########################################
+#####################################################################################################
+
+
+#####################################################################################################
+#
+# Function Name:    compileSelectorPath()
+#
+# Description:      Compiles a selector or field path into a regular expression over the element path
+#                   of each element of a claim, and the attribute it names.
+#
+# Arguments:        input - string path - path such as 'Provider/@npi', '//ServiceDate' or '@icn'
+#
+# Return Variable:  output - (Pattern pattern, string attribute) - regular expression matching the
+#                            '/' separated element names from the claim element, '' for the claim
+#                            element itself, and the attribute name (None for the element text)
+#
+# Notes:            '*' matches any element and '//' any number of elements. A ValueError is raised
+#                   if the path names no element or attribute.
+#
+#####################################################################################################
+def compileSelectorPath(path):
+#####################################################################################################
+# Split off attribute
+# Translate each step, remembering '//' for the step after it
+#####################################################################################################
+  steps = path.split('/')
+  attribute = None
+  if steps[-1].startswith('@'):
+    attribute = steps.pop()[1:]
+  parts = []
+  descend = False
+  for step in steps:
+    if step in ('', '.'):
+      descend = descend or step == ''
+      continue
+    name = '[^/]+' if step == '*' else re.escape(step)
+    parts.append(('(?:[^/]+/)*' if descend else '') + name)
+    descend = False
+  pattern = '/'.join(parts)
+  if descend:
+    pattern = pattern + '(?:/[^/]+)*' if parts else '.*'
+  if attribute == '' or (not parts and not attribute and not descend):
+    raise ValueError('invalid path ' + repr(path))
+#####################################################################################################
+# Return variable
+#####################################################################################################
+  return re.compile(pattern), attribute
+############################## end of compileSelectorPath() function ################################
+#####################################################################################################
+
+
+#####################################################################################################
+#
+# Function Name:    parseSelector()
+#
+# Description:      Parses a claim selector such as
+#                     Provider/@npi = 1234567890 AND //ServiceDate in 2024-01-01..2024-03-31
+#                   into the conditions to check while a claim is streamed and the expression that
+#                   combines them.
+#
+# Arguments:        input - string selector_text - selector to parse
+#
+# Return Variable:  output - dict selector - 'text' of the selector, 'atoms' list with the compiled
+#                            'pattern', 'attribute', 'op' and 'value' of each condition, 'expression'
+#                            tree of ('atom', index), ('not', expression), ('and', [...]) and
+#                            ('or', [...]), and a 'paths' cache of the conditions for each element path
+#
+# Notes:            Paths start at the claim element and use '/' between element names, '*' for any
+#                   element and '//' for any number of elements. A path may end in '@attribute', and
+#                   '@attribute' alone is an attribute of the claim element. A condition without an
+#                   operator only checks that the element or attribute exists. See compileSelectorPath().
+#                   Operators are = != < <= > >= and 'in low..high'. Values are compared as numbers if
+#                   both sides are numbers, otherwise as text, so ISO dates compare in date order.
+#                   Values with spaces or operator characters must be quoted.
+#                   Conditions are combined with NOT, AND and OR (in that order of precedence) and
+#                   parentheses. Keywords are not case sensitive.
+#                   A ValueError is raised if the selector is not valid.
+#
+#####################################################################################################
+def parseSelector(selector_text):
+#####################################################################################################
+# Split selector into tokens
+# Parse OR of ANDs of NOTs of conditions or parenthesized expressions
+# Compile the path of each condition with compileSelectorPath()
+#####################################################################################################
+  tokens = []
+  atoms = []
+  position = [0]
+  for match in re.finditer(r'\s*(?:(\()|(\))|(<=|>=|!=|=|<|>)|"([^"]*)"|\'([^\']*)\'|([^\s()<>=!"\']+))|\s*(\S)',
+                           selector_text):
+    if match.group(7) is not None:
+      raise ValueError('unexpected ' + repr(match.group(7)) + ' in selector ' + repr(selector_text))
+    elif match.group(1) is not None:
+      tokens.append(('(', '('))
+    elif match.group(2) is not None:
+      tokens.append((')', ')'))
+    elif match.group(3) is not None:
+      tokens.append(('op', match.group(3)))
+    elif match.group(4) is not None or match.group(5) is not None:
+      tokens.append(('value', match.group(4) if match.group(4) is not None else match.group(5)))
+    elif match.group(6) is not None:
+      tokens.append(('word', match.group(6)))
+
+  def peek(keyword=None):
+    if position[0] < len(tokens):
+      kind, text = tokens[position[0]]
+      if keyword is None or (kind == 'word' and text.upper() == keyword):
+        return tokens[position[0]]
+    return None
+
+  def take(expected):
+    token = peek()
+    if token is None or token[0] not in expected:
+      found = 'end of selector' if token is None else repr(token[1])
+      raise ValueError('expected ' + ' or '.join(expected) + ' but found ' + found + ' in selector ' +
+                       repr(selector_text))
+    position[0] += 1
+    return token[1]
+
+  def parseCondition():
+    path = take(['word'])
+    try:
+      pattern, attribute = compileSelectorPath(path)
+    except ValueError as error:
+      raise ValueError(str(error) + ' in selector ' + repr(selector_text))
+    atom = {'path': path, 'pattern': pattern, 'attribute': attribute, 'op': 'exists', 'value': None}
+    if peek() is not None and peek()[0] == 'op':
+      atom['op'] = take(['op'])
+      atom['value'] = take(['value', 'word'])
+    elif peek('IN') is not None:
+      position[0] += 1
+      # The range may be one word, low..high, or split around quoted values, "low".."high"
+      low = take(['value', 'word'])
+      high = ''
+      if '..' in low:
+        low, high = low.split('..', 1)
+      elif peek() is not None and peek()[0] == 'word' and peek()[1].startswith('..'):
+        high = take(['word'])[2:]
+      else:
+        raise ValueError('expected low..high after in but found ' + repr(low) + ' in selector ' +
+                         repr(selector_text))
+      if high == '':
+        high = take(['value', 'word'])
+      atom['op'] = 'in'
+      atom['value'] = (low, high)
+    atoms.append(atom)
+    return ('atom', len(atoms) - 1)
+
+  def parsePrimary():
+    if peek() is not None and peek()[0] == '(':
+      position[0] += 1
+      expression = parseOr()
+      take([')'])
+      return expression
+    if peek('NOT') is not None:
+      position[0] += 1
+      return ('not', parsePrimary())
+    return parseCondition()
+
+  def parseAnd():
+    terms = [parsePrimary()]
+    while peek('AND') is not None:
+      position[0] += 1
+      terms.append(parsePrimary())
+    return terms[0] if len(terms) == 1 else ('and', terms)
+
+  def parseOr():
+    terms = [parseAnd()]
+    while peek('OR') is not None:
+      position[0] += 1
+      terms.append(parseAnd())
+    return terms[0] if len(terms) == 1 else ('or', terms)
+
+  expression = parseOr()
+  if position[0] < len(tokens):
+    raise ValueError('unexpected ' + repr(tokens[position[0]][1]) + ' in selector ' + repr(selector_text))
+  selector = {'text': selector_text, 'atoms': atoms, 'expression': expression, 'paths': {}}
+#####################################################################################################
+# Return variable
+#####################################################################################################
+  return selector
+############################## end of parseSelector() function ######################################
+#####################################################################################################
+
+
+#####################################################################################################
+#
+# Function Name:    compareSelectorValue()
+#
+# Description:      Checks one attribute value or element text against the operator and value of a
+#                   selector condition.
+#
+# Arguments:        input - string actual - attribute value or element text found in the claim
+#                   input - dict atom     - selector condition from parseSelector()
+#
+# Return Variable:  output - bool satisfied - True if the value satisfies the condition
+#
+# Notes:            Values are compared as numbers if both sides are numbers, otherwise as text.
+#
+#####################################################################################################
+def compareSelectorValue(actual, atom):
+#####################################################################################################
+# Compare numbers if both values are numbers, otherwise text
+# Check range as low <= value <= high
+#####################################################################################################
+  def compare(op, expected):
+    left, right = actual, expected
+    try:
+      left, right = float(actual), float(expected)
+    except ValueError:
+      pass
+    if op == '=':
+      return left == right
+    elif op == '!=':
+      return left != right
+    elif op == '<':
+      return left < right
+    elif op == '<=':
+      return left <= right
+    elif op == '>':
+      return left > right
+    return left >= right
+
+  if atom['op'] == 'exists':
+    satisfied = True
+  elif atom['op'] == 'in':
+    satisfied = compare('>=', atom['value'][0]) and compare('<=', atom['value'][1])
+  else:
+    satisfied = compare(atom['op'], atom['value'])
+#####################################################################################################
+# Return variable
+#####################################################################################################
+  return satisfied
+############################## end of compareSelectorValue() function ###############################
+#####################################################################################################
+
+
+#####################################################################################################
+#
+# Function Name:    selectorPathAtoms()
+#
+# Description:      Returns the indexes of the conditions or fields whose path matches an element path.
+#
+# Arguments:        input - dict selector - selector from parseSelector(), or fields with the same
+#                                           'atoms' and 'paths' keys
+#                   input - string path   - element path from the claim element, '' for the claim
+#
+# Return Variable:  output - int[] indexes - indexes into selector['atoms']
+#
+# Notes:            The indexes for each element path are looked up once and cached in the selector,
+#                   as the same paths repeat in every claim.
+#
+#####################################################################################################
+def selectorPathAtoms(selector, path):
+#####################################################################################################
+# Look up cached indexes, or match every path pattern once
+#####################################################################################################
+  indexes = selector['paths'].get(path)
+  if indexes is None:
+    indexes = selector['paths'][path] = [index for index, atom in enumerate(selector['atoms'])
+                                         if atom['pattern'].fullmatch(path)]
+#####################################################################################################
+# Return variable
+#####################################################################################################
+  return indexes
+############################## end of selectorPathAtoms() function ##################################
+#####################################################################################################
+
+
+#####################################################################################################
+#
+# Function Name:    matchSelectorElement()
+#
+# Description:      Checks the selector conditions whose path matches one element of a claim and adds
+#                   the conditions it satisfies to the set of satisfied conditions of the claim.
+#
+# Arguments:        input - dict selector   - selector from parseSelector()
+#                   input - string path     - element path from the claim element, '' for the claim
+#                   input - dict attributes - attributes of the element, with or without namespace
+#                   input - string text     - stripped text directly inside of the element
+#                   input - set matched     - indexes of the conditions satisfied so far in the claim
+#
+# Return Variable:  N/A
+#
+# Notes:            None.
+#
+#####################################################################################################
+def matchSelectorElement(selector, path, attributes, text, matched):
+#####################################################################################################
+# Look up conditions for the element path
+# Check attribute conditions against the attribute and the other conditions against the text
+#####################################################################################################
+  for index in selectorPathAtoms(selector, path):
+    if index in matched:
+      continue
+    atom = selector['atoms'][index]
+    if atom['attribute'] is None:
+      if compareSelectorValue(text, atom):
+        matched.add(index)
+    else:
+      for key, value in attributes.items():
+        if key.rsplit('}', 1)[-1] == atom['attribute'] and compareSelectorValue(value.strip(), atom):
+          matched.add(index)
+############################## end of matchSelectorElement() function ###############################
+#####################################################################################################
+
+
+#####################################################################################################
+#
+# Function Name:    captureFieldElement()
+#
+# Description:      Fills in the row of a claim with the attribute value or text of one element for
+#                   every field whose path matches the element.
+#
+# Arguments:        input - dict fields     - 'atoms' with the compiled 'pattern' and 'attribute' of each
+#                                             field, and a 'paths' cache, see selectorPathAtoms()
+#                   input - string path     - element path from the claim element, '' for the claim
+#                   input - dict attributes - attributes of the element, with or without namespace
+#                   input - string text     - stripped text directly inside of the element
+#                   input - list row        - value of each field so far in the claim, None if not found
+#
+# Return Variable:  N/A
+#
+# Notes:            Each field keeps the first non-empty value found for it. Elements are seen when
+#                   they end, so a field matching nested elements gets the innermost one first.
+#
+#####################################################################################################
+def captureFieldElement(fields, path, attributes, text, row):
+#####################################################################################################
+# Look up fields for the element path
+# Keep attribute value or text for the fields not found yet
+#####################################################################################################
+  for index in selectorPathAtoms(fields, path):
+    if row[index] is not None:
+      continue
+    attribute = fields['atoms'][index]['attribute']
+    if attribute is None:
+      value = text
+    else:
+      value = ''
+      for key, attribute_value in attributes.items():
+        if key.rsplit('}', 1)[-1] == attribute:
+          value = attribute_value.strip()
+    if value:
+      row[index] = value
+############################## end of captureFieldElement() function ################################
+#####################################################################################################
+
+
+#####################################################################################################
+#
+# Function Name:    parseIndexFields()
+#
+# Description:      Parses the comma separated paths of the identifier fields to index, such as
+#                   '@icn,//ICN', into fields for iterClaims() and captureFieldElement().
+#
+# Arguments:        input - string fields_text - paths written the same way as selector paths
+#
+# Return Variable:  output - dict fields - 'text' of the sorted paths, 'atoms' with the 'pattern' and
+#                            'attribute' of each path, and the 'paths' cache of selectorPathAtoms()
+#
+# Notes:            A ValueError is raised if a path is invalid or there are none.
+#
+#####################################################################################################
+def parseIndexFields(fields_text):
+#####################################################################################################
+# Split and compile each path once, in a stable order
+#####################################################################################################
+  paths = sorted(set(path.strip() for path in fields_text.split(',') if path.strip()))
+  if not paths:
+    raise ValueError('no index fields in ' + repr(fields_text))
+  fields = {'text': ','.join(paths), 'atoms': [], 'paths': {}}
+  for path in paths:
+    pattern, attribute = compileSelectorPath(path)
+    fields['atoms'].append({'path': path, 'pattern': pattern, 'attribute': attribute})
+#####################################################################################################
+# Return variable
+#####################################################################################################
+  return fields
+############################## end of parseIndexFields() function ###################################
+#####################################################################################################
+
+
+#####################################################################################################
+#
+# Function Name:    evaluateSelector()
+#
+# Description:      Evaluates the selector expression for a claim from the conditions it satisfied.
+#
+# Arguments:        input - tuple expression - expression tree from parseSelector()
+#                   input - set matched      - indexes of the conditions satisfied by the claim
+#
+# Return Variable:  output - bool selected - True if the claim matches the selector
+#
+# Notes:            A condition is satisfied if any element of the claim with a matching path
+#                   satisfies it.
+#
+#####################################################################################################
+def evaluateSelector(expression, matched):
+#####################################################################################################
+# Evaluate expression tree
+#####################################################################################################
+  kind, operand = expression
+  if kind == 'atom':
+    selected = operand in matched
+  elif kind == 'not':
+    selected = not evaluateSelector(operand, matched)
+  elif kind == 'and':
+    selected = all(evaluateSelector(term, matched) for term in operand)
+  else:
+    selected = any(evaluateSelector(term, matched) for term in operand)
+#####################################################################################################
+# Return variable
+#####################################################################################################
+  return selected
+############################## end of evaluateSelector() function ###################################
+#####################################################################################################
+
+
+#####################################################################################################
+#
+# Function Name:    claimMatchesSelector()
+#
+# Description:      Checks a claim element that is already parsed against the selector. Used for
+#                   claims read through the claim index, which are parsed one at a time anyway.
+#
+# Arguments:        input - Element claim   - claim element
+#                   input - dict selector   - selector from parseSelector()
+#
+# Return Variable:  output - bool selected - True if the claim matches the selector
+#
+# Notes:            iterClaims() checks the selector while streaming instead, without building claims.
+#
+#####################################################################################################
+def claimMatchesSelector(claim, selector):
+#####################################################################################################
+# Walk claim elements with their paths and check each one
+# Evaluate selector expression
+#####################################################################################################
+  matched = set()
+  elements = [(claim, '')]
+  while elements:
+    element, path = elements.pop()
+    matchSelectorElement(selector, path, element.attrib, (element.text or '').strip(), matched)
+    for child in element:
+      if isinstance(child.tag, str):
+        name = child.tag.rsplit('}', 1)[-1]
+        elements.append((child, path + '/' + name if path else name))
+  selected = evaluateSelector(selector['expression'], matched)
+#####################################################################################################
+# Return variable
+#####################################################################################################
+  return selected
+############################## end of claimMatchesSelector() function ###############################
+#####################################################################################################
+
+
+#####################################################################################################
+#
+# Function Name:    checkpointKey()
+#
+# Description:      Returns the key of a scan for its checkpoint. Results in a checkpoint are only
+#                   used by a scan with the same key.
+#
+# Arguments:        input - set identifiers   - Unique identifiers searched for
+#                   input - string claim_tag  - Element name of a claim (Default = None)
+#                   input - dict selector     - selector from parseSelector() (Default = None)
+#                   input - string purpose    - what the results are for, 'claims' or 'locate'
+#
+# Return Variable:  output - string run_key - sha1 of the purpose, identifiers, claim_tag and selector
+#
+# Notes:            None.
+#
+#####################################################################################################
+def checkpointKey(identifiers, claim_tag=None, selector=None, purpose='claims'):
+#####################################################################################################
+# Hash everything that changes which claims are kept
+#####################################################################################################
+  key = json.dumps([purpose, sorted(identifiers), claim_tag or '', selector['text'] if selector else ''])
+  run_key = hashlib.sha1(key.encode('utf-8')).hexdigest()
+#####################################################################################################
+# Return variable
+#####################################################################################################
+  return run_key
+############################## end of checkpointKey() function ######################################
+#####################################################################################################
+
+
+#####################################################################################################
+#
+# Function Name:    openCheckpoint()
+#
+# Description:      Opens the checkpoint database at checkpoint_path, creating it if it does not exist.
+#                   For every file scanned it holds the size and modification time of the file, how far
+#                   the scan got and the offsets of the claims kept so far.
+#
+# Arguments:        input - string checkpoint_path - filepath and name of the checkpoint database
+#                   input - string run_key         - key from checkpointKey() (Default = None, not checked)
+#
+# Return Variable:  output - Connection connection - open sqlite3 connection to the checkpoint
+#
+# Notes:            If the checkpoint was written by a scan with a different key, it is emptied first.
+#
+#####################################################################################################
+def openCheckpoint(checkpoint_path, run_key=None):
+#####################################################################################################
+# Create directory for the checkpoint if needed
+# Connect to checkpoint and create tables if they do not exist
+# Empty checkpoint of another scan
+#####################################################################################################
+  checkpoint_dir = os.path.dirname(checkpoint_path)
+  if checkpoint_dir and not os.path.isdir(checkpoint_dir):
+    os.makedirs(checkpoint_dir)
+  connection = sqlite3.connect(checkpoint_path, timeout=index_timeout)
+  connection.executescript('''
+    PRAGMA journal_mode = WAL;
+    CREATE TABLE IF NOT EXISTS run (
+      run_key       TEXT NOT NULL
+    );
+    CREATE TABLE IF NOT EXISTS files (
+      path          TEXT PRIMARY KEY,
+      size          INTEGER NOT NULL,
+      mtime_ns      INTEGER NOT NULL,
+      file_info     TEXT NOT NULL,
+      end_offset    INTEGER NOT NULL,
+      done          INTEGER NOT NULL
+    );
+    CREATE TABLE IF NOT EXISTS claims (
+      path          TEXT NOT NULL,
+      start_offset  INTEGER NOT NULL,
+      length        INTEGER NOT NULL,
+      found         TEXT NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS claims_path ON claims (path);
+  ''')
+  if run_key is not None:
+    with connection:
+      row = connection.execute('SELECT run_key FROM run').fetchone()
+      if row is None or row[0] != run_key:
+        connection.execute('DELETE FROM claims')
+        connection.execute('DELETE FROM files')
+        connection.execute('DELETE FROM run')
+        connection.execute('INSERT INTO run VALUES (?)', (run_key,))
+#####################################################################################################
+# Return variable
+#####################################################################################################
+  return connection
+############################## end of openCheckpoint() function #####################################
+#####################################################################################################
+
+
+#####################################################################################################
+#
+# Function Name:    clearCheckpoint()
+#
+# Description:      Empties the checkpoint database, so the next scan starts from the beginning of
+#                   every file.
+#
+# Arguments:        input - string checkpoint_path - filepath and name of the checkpoint database
+#
+# Return Variable:  N/A
+#
+# Notes:            None.
+#
+#####################################################################################################
+def clearCheckpoint(checkpoint_path):
+#####################################################################################################
+# Delete every row of the checkpoint
+#####################################################################################################
+  connection = openCheckpoint(checkpoint_path)
+  try:
+    with connection:
+      connection.execute('DELETE FROM claims')
+      connection.execute('DELETE FROM files')
+      connection.execute('DELETE FROM run')
+  finally:
+    connection.close()
+############################## end of clearCheckpoint() function ####################################
+#####################################################################################################
+
+
+#####################################################################################################
+#
+# Function Name:    loadCheckpoint()
+#
+# Description:      Looks up how far an earlier scan of a file got.
+#
+# Arguments:        input - Connection connection - open connection to the checkpoint
+#                   input - string path           - absolute path of the file
+#                   input - stat_result stat      - os.stat() of the file now
+#
+# Return Variable:  output - dict saved - 'done' if the whole file was scanned, the 'end_offset' of the
+#                            last claim handled, the 'file_info' of iterClaims() and the (start, length,
+#                            found) of the 'claims' kept so far, in file order. None if the file was not
+#                            scanned yet or changed since.
+#
+# Notes:            The rows of a file that changed are deleted.
+#
+#####################################################################################################
+def loadCheckpoint(connection, path, stat):
+#####################################################################################################
+# Look file up and compare size and modification time
+# Read claims kept so far
+#####################################################################################################
+  saved = None
+  row = connection.execute('SELECT size, mtime_ns, file_info, end_offset, done FROM files WHERE path = ?',
+                           (path,)).fetchone()
+  if row is not None and row[:2] != (stat.st_size, stat.st_mtime_ns):
+    with connection:
+      connection.execute('DELETE FROM claims WHERE path = ?', (path,))
+      connection.execute('DELETE FROM files WHERE path = ?', (path,))
+  elif row is not None:
+    rows = connection.execute('SELECT start_offset, length, found FROM claims WHERE path = ? ORDER BY start_offset',
+                              (path,))
+    saved = {'file_info': json.loads(row[2]), 'end_offset': row[3], 'done': bool(row[4]),
+             'claims': [(start, length, json.loads(found)) for start, length, found in rows]}
+#####################################################################################################
+# Return variable
+#####################################################################################################
+  return saved
+############################## end of loadCheckpoint() function #####################################
+#####################################################################################################
+
+
+#####################################################################################################
+#
+# Function Name:    saveCheckpoint()
+#
+# Description:      Records how far the scan of a file got and the claims kept since the last save.
+#
+# Arguments:        input - Connection connection - open connection to the checkpoint
+#                   input - string path           - absolute path of the file
+#                   input - stat_result stat      - os.stat() of the file when the scan started
+#                   input - dict file_info        - file_info filled in by iterClaims()
+#                   input - int end_offset        - end of the last claim handled
+#                   input - list new_claims       - (start, length, found) of each claim kept since the last save
+#                   input - bool done             - True once the whole file was scanned
+#
+# Return Variable:  N/A
+#
+# Notes:            The claims and the new end offset are saved in one transaction, so a scan killed
+#                   at any point resumes after exactly the claims saved.
+#
+#####################################################################################################
+def saveCheckpoint(connection, path, stat, file_info, end_offset, new_claims, done):
+#####################################################################################################
+# Save claims and progress of the file together
+#####################################################################################################
+  with connection:
+    connection.execute('INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?, ?, ?)',
+                       (path, stat.st_size, stat.st_mtime_ns, json.dumps(file_info), end_offset, int(done)))
+    connection.executemany('INSERT INTO claims VALUES (?, ?, ?, ?)',
+                           ((path, start, length, json.dumps(found)) for start, length, found in new_claims))
+############################## end of saveCheckpoint() function #####################################
+#####################################################################################################
+
+
+#####################################################################################################
+#
+# Function Name:    iterCheckpointedClaims()
+#
+# Description:      Streams the claims of one raw xml file that contain any of the unique identifiers,
+#                   or match the selector if there are no identifiers. With a checkpoint, the claims
+#                   kept by an earlier scan of the unchanged file are returned from the checkpoint and
+#                   the scan continues after the last claim it handled, saving its progress as it goes.
+#
+# Arguments:        input - set identifiers        - Unique identifiers to search for to find claims
+#                   input - string filepathname    - filepath and name for raw xml file to search
+#                   input - string claim_tag       - Element name of a claim (Default = None)
+#                   input - dict selector          - Only keep claims matching this selector (Default = None)
+#                   input - string checkpoint_path - Checkpoint database to resume from and save progress to
+#                                                    (Default = None, scan the whole file)
+#                   input - dict counters          - Optional dict the 'claims_parsed', 'files_skipped'
+#                                                    and 'files_resumed' counts are added to
+#                   input - bool read_claims       - Parse the claims returned from the checkpoint from
+#                                                    their bytes in the file (Default = True, otherwise None
+#                                                    is returned for them)
+#
+# Return Variable:  output - (Element claim, list found, int start, int end) - claim element, sorted
+#                            identifiers found in it and byte offsets of the claim
+#
+# Notes:            Progress is saved every checkpoint_interval seconds and when the file is done. The
+#                   checkpoint must belong to the same identifiers, claim_tag and selector, see
+#                   openCheckpoint().
+#
+#####################################################################################################
+def iterCheckpointedClaims(identifiers, filepathname, claim_tag=None, selector=None, checkpoint_path=None,
+                           counters=None, read_claims=True):
+#####################################################################################################
+# Look file up in the checkpoint
+# Return claims kept by the earlier scan
+# Stream the rest of the file, or all of it, keeping claims with any identifier and saving progress
+#####################################################################################################
+  if counters is None:
+    counters = {}
+  for name in ('claims_parsed', 'files_skipped', 'files_resumed'):
+    counters.setdefault(name, 0)
+  connection = None
+  saved = None
+  resume = None
+  try:
+    if checkpoint_path:
+      path = os.path.abspath(filepathname)
+      stat = os.stat(path)
+      connection = openCheckpoint(checkpoint_path)
+      saved = loadCheckpoint(connection, path, stat)
+    if saved is not None:
+      if saved['done']:
+        counters['files_skipped'] += 1
+      else:
+        counters['files_resumed'] += 1
+        resume = (saved['file_info']['prologue_end'], saved['end_offset'])
+      raw_file = openClaimFile(path) if read_claims and saved['claims'] else None
+      for prefix, uri in saved['file_info']['namespaces'].items():
+        registerNamespace(prefix, uri)
+      try:
+        for start, length, found in saved['claims']:
+          claim = None
+          if raw_file is not None:
+            raw_file.seek(start)
+            claim = parseClaimSlice(raw_file.read(length), saved['file_info'])
+          yield claim, found, start, start + length
+      finally:
+        if raw_file is not None:
+          raw_file.close()
+    if saved is None or not saved['done']:
+      file_info = {}
+      new_claims = []
+      end_offset = 0 if resume is None else resume[1]
+      save_time = time.perf_counter()
+      for claim, values, start, end in iterClaims(filepathname, claim_tag, file_info, selector, resume=resume):
+        counters['claims_parsed'] += 1
+        found = sorted(identifiers.intersection(values))
+        if found or (selector is not None and not identifiers):
+          new_claims.append((start, end - start, found))
+          yield claim, found, start, end
+        end_offset = end
+        if connection is not None and time.perf_counter() - save_time >= checkpoint_interval:
+          saveCheckpoint(connection, path, stat, file_info, end_offset, new_claims, False)
+          new_claims = []
+          save_time = time.perf_counter()
+      if connection is not None:
+        saveCheckpoint(connection, path, stat, file_info, end_offset, new_claims, True)
+  finally:
+    if connection is not None:
+      connection.close()
+############################## end of iterCheckpointedClaims() function #############################
+#####################################################################################################
+
+
+#####################################################################################################
+#
+# Function Name:    scanFile()
+#
+# Description:      Streams one raw xml file and formats every claim containing any of the unique
+#                   identifiers. This is the unit of work given to each process by searchFiles().
+#
+# Arguments:        input - set identifiers     - Unique identifiers to search for to find claims
+#                   input - string filepathname - filepath and name for raw xml file to search
+#                   input - string claim_tag    - Element name of a claim (Default = None)
+#                   input - bool prefilter      - Try prefilterFile() before parsing the whole file
+#                   input - dict selector       - Only keep claims matching this selector from parseSelector(),
+#                                                 every matching claim if identifiers is empty (Default = None)
+#                   input - string checkpoint_path - Checkpoint to resume the scan from and save progress to,
+#                                                 see iterCheckpointedClaims() (Default = None)
+#
+# Return Variable:  output - (list file_matches, string error, dict file_stats) - (sorted identifiers found,
+#                            indented claim) for every claim found in file order, the parse error message
+#                            if the file is not well-formed (None otherwise), and the counters and stage
+#                            times of the scan for mergeStats()
+#
+# Notes:            Each claim is checked with a set intersection, so the cost of the scan does not
+#                   grow with the number of identifiers searched for.
+#                   Claims found before a parse error are still returned. Errors reading or
+#                   decompressing the file are returned the same way as parse errors.
+#                   The prefilter is not used with a selector, which has to see every claim. Files
+#                   answered by the prefilter are not saved in the checkpoint.
+#
+#####################################################################################################
+def scanFile(identifiers, filepathname, claim_tag=None, prefilter=False, selector=None, checkpoint_path=None):
+#####################################################################################################
+# Try prefilter fast path if asked to
+# Otherwise stream claims from raw file and keep formatted claims containing any identifier,
+# or every claim matching the selector if there are no identifiers
+# Return claims found, parse error and stats of the scan
+#####################################################################################################
+  file_matches = None
+  error = None
+  claims = 0
+  format_seconds = 0.0
+  scan_start = time.perf_counter()
+  if prefilter and selector is None:
+    file_matches = prefilterFile(identifiers, filepathname, claim_tag)
+  counters = {'files_scanned': 1, 'prefilter_files': int(file_matches is not None)}
+  if file_matches is None:
+    file_matches = []
+    try:
+      for claim, found, start, end in iterCheckpointedClaims(identifiers, filepathname, claim_tag, selector,
+                                                             checkpoint_path, counters):
+        format_start = time.perf_counter()
+        file_matches.append((found, formatClaim(claim)))
+        format_seconds += time.perf_counter() - format_start
+    except (expat.ExpatError, OSError, EOFError, lzma.LZMAError, sqlite3.Error) as parse_error:
+      error = str(parse_error)
+    claims = counters.pop('claims_parsed', 0)
+  else:
+    claims = len(file_matches)
+  try:
+    counters['bytes_read'] = os.path.getsize(filepathname)
+  except OSError:
+    pass
+  counters['claims_parsed'] = claims
+  counters['parse_errors'] = int(error is not None)
+  file_stats = {'counters': counters,
+                'seconds': {'scan': time.perf_counter() - scan_start - format_seconds, 'format': format_seconds}}
+#####################################################################################################
+# Return variable
+#####################################################################################################
+  return file_matches, error, file_stats
+############################## end of scanFile() function ###########################################
+#####################################################################################################
+
+
+#####################################################################################################
+#
+# Function Name:    iterScannedClaims()
+#
+# Description:      Scans the raw xml files for claims containing any of the unique identifiers, using
+#                   a pool of processes to scan several files at the same time, and yields each claim
+#                   found.
+#
+# Arguments:        input - set identifiers        - Unique identifiers to search for to find claims
+#                   input - string[] filepathnames - filepaths and names for raw xml files to search
+#                   input - string claim_tag       - Element name of a claim (Default = None)
+#                   input - int processes          - Number of files to scan at the same time (Default = 1)
+#                   input - bool prefilter         - Skip files without the identifier bytes and only parse
+#                                                    the claims around them (Default = False)
+#                   input - list errors            - (filepathname, parse error message) is appended for
+#                                                    each file that failed (Default = None, not kept)
+#                   input - dict selector          - Only yield claims matching this selector, every matching
+#                                                    claim if identifiers is empty (Default = None)
+#                   input - string checkpoint_path - Checkpoint to resume from and save progress to (Default = None)
+#
+# Return Variable:  output - (string filepathname, list found, string claim_text) - file the claim is in,
+#                            sorted identifiers found in the claim and indented claim
+#
+# Notes:            Claims are yielded in the order of filepathnames, whatever order the processes
+#                   finish in. Once every identifier has been found the files after the current one are
+#                   not yielded and the pool is stopped, so the result only depends on the files given.
+#                   Without identifiers, every file is scanned for claims matching the selector.
+#                   With a checkpoint, files that did not change since they were scanned with the same
+#                   identifiers, claim_tag and selector are not scanned again, and a file the last scan
+#                   did not finish is scanned from where it stopped. A checkpoint of another scan is
+#                   emptied first.
+#
+#####################################################################################################
+def iterScannedClaims(identifiers, filepathnames, claim_tag=None, processes=1, prefilter=False, errors=None,
+                      selector=None, checkpoint_path=None):
+#####################################################################################################
+# Scan files in a process pool, or in this process for a single file
+# Yield claims of each file in order as soon as the file and the files before it are done
+# Stop when every identifier has been found
+#####################################################################################################
+  remaining = set(identifiers)
+  pool = None
+  if checkpoint_path:
+    openCheckpoint(checkpoint_path, checkpointKey(identifiers, claim_tag, selector)).close()
+  scan = functools.partial(scanFile, identifiers, claim_tag=claim_tag, prefilter=prefilter, selector=selector,
+                           checkpoint_path=checkpoint_path)
+  try:
+    if processes > 1 and len(filepathnames) > 1:
+      pool = multiprocessing.Pool(min(processes, len(filepathnames)))
+      results = pool.imap(scan, filepathnames)
+    else:
+      results = map(scan, filepathnames)
+    for filepathname, (file_matches, error, file_stats) in zip(filepathnames, results):
+      mergeStats(file_stats)
+      if error is not None and errors is not None:
+        errors.append((filepathname, error))
+      for found, claim_text in file_matches:
+        remaining.difference_update(found)
+        yield filepathname, found, claim_text
+      if identifiers and not remaining:
+        break
+  finally:
+    if pool is not None:
+      pool.terminate()
+      pool.join()
+############################## end of iterScannedClaims() function ##################################
+#####################################################################################################
+
+
+#####################################################################################################
+#
+# Function Name:    extractClaims()
+#
+# Description:      Library entry point. Yields every claim containing any of the unique identifiers
+#                   from the files, either through the claim index or by scanning the files. Nothing
+#                   is printed or written.
+#
+# Arguments:        input - iterable identifiers   - Unique identifiers to search for to find claims
+#                   input - string[] filepathnames - filepaths and names for raw xml files to search
+#                   input - string claim_tag       - Element name of a claim (Default = None)
+#                   input - string index_path      - Claim index to look identifiers up in (Default = None)
+#                   input - int processes          - Number of files to scan at the same time (Default = 1)
+#                   input - bool prefilter         - Use the prefilter fast path when scanning (Default = False)
+#                   input - list errors            - (filepathname, parse error message) is appended for
+#                                                    each file that failed to scan (Default = None)
+#                   input - string selector        - Only yield claims matching this selector, see parseSelector().
+#                                                    Every matching claim if identifiers is empty (Default = None)
+#                   input - string checkpoint_path - Checkpoint to resume scans from and save progress to
+#                                                    (Default = None)
+#
+# Return Variable:  output - (string filepathname, list found, string claim_text) - file the claim is in,
+#                            sorted identifiers found in the claim and indented claim
+#
+# Notes:            For example:
+#                     import getIndentedClm
+#                     for filepathname, found, claim_text in getIndentedClm.extractClaims(ids, paths):
+#                       ...
+#                   Indexing errors are raised to the caller, and a ValueError for an invalid selector.
+#                   Selecting claims without identifiers always scans the files, as the index only
+#                   finds claims by identifier.
+#
+#####################################################################################################
+def extractClaims(identifiers, filepathnames, claim_tag=None, index_path=None, processes=1, prefilter=False,
+                  errors=None, selector=None, checkpoint_path=None):
+#####################################################################################################
+# Parse selector if one is given
+# Yield claims from the index if one is given, otherwise from a scan of the files
+#####################################################################################################
+  identifiers = set(identifiers)
+  filepathnames = list(filepathnames)
+  if isinstance(selector, str):
+    selector = parseSelector(selector)
+  if index_path and (identifiers or selector is None):
+    claims = iterIndexedClaims(identifiers, filepathnames, index_path, claim_tag, selector)
+  else:
+    claims = iterScannedClaims(identifiers, filepathnames, claim_tag, processes, prefilter, errors, selector,
+                               checkpoint_path)
+  for claim in claims:
+    yield claim
+############################## end of extractClaims() function ######################################
+#####################################################################################################
+
+
+#####################################################################################################
+#
+# Function Name:    writeClaims()
+#
+# Description:      Writes each claim to INDENT.<identifier> for every identifier it contains, or once
+#                   to a single file when combined_outputname is given.
+#
+# Arguments:        input - iterator claims            - (filepathname, found, claim_text) of each claim
+#                   input - string combined_outputname - filename to write all claims to, or '-' for
+#                                                        standard output (Default = None, write to
+#                                                        INDENT.<identifier> for each identifier)
+#                   input - bool append                - Add the claims to the end of existing output files
+#                                                        instead of replacing them (Default = False)
+#
+# Return Variable:  output - dict matches - number of claims found for each identifier that was found
+#
+# Notes:            Output files are only created if at least one claim is written to them. They are
+#                   written under a temporary name and renamed when all claims were written, so an
+#                   earlier output is replaced whole, or added to with append, and a failed run leaves
+#                   it as it was.
+#
+#####################################################################################################
+def writeClaims(claims, combined_outputname=None, append=False):
+#####################################################################################################
+# Write each claim and count it for every identifier found in it
+# Rename the output files into place, or remove them if writing did not finish
+# Return number of claims found for each identifier
+#####################################################################################################
+  matches = {}
+  outputs = openOutputs(combined_outputname, append)
+  try:
+    for filepathname, found, claim_text in claims:
+      write_start = time.perf_counter()
+      for identifier in found:
+        matches[identifier] = matches.get(identifier, 0) + 1
+      writeClaimOutputs(claim_text, found, outputs)
+      timeStat('write', time.perf_counter() - write_start)
+      countStat('claims_written')
+    write_start = time.perf_counter()
+    closeOutputs(outputs, True)
+    timeStat('write', time.perf_counter() - write_start)
+  finally:
+    closeOutputs(outputs, False)
+#####################################################################################################
+# Return variable
+#####################################################################################################
+  return matches
+############################## end of writeClaims() function ########################################
+#####################################################################################################
+
+
+#####################################################################################################
+#
+# Function Name:    searchFiles()
+#
+# Description:      Scans the raw xml files for claims containing any of the unique identifiers, using
+#                   a pool of processes to scan several files at the same time. Each claim is written
+#                   to INDENT.<identifier> for every identifier it contains, or once to a single file
+#                   when combined_outputname is given.
+#
+# Arguments:        input - set identifiers            - Unique identifiers to search for to find claims
+#                   input - string[] filepathnames     - filepaths and names for raw xml files to search
+#                   input - string combined_outputname - filename to write all claims to (Default = None,
+#                                                        write to INDENT.<identifier> for each identifier)
+#                   input - string claim_tag           - Element name of a claim (Default = None)
+#                   input - int processes              - Number of files to scan at the same time (Default = 1)
+#                   input - bool prefilter             - Skip files without the identifier bytes and only parse
+#                                                        the claims around them (Default = False)
+#                   input - dict selector              - Only write claims matching this selector (Default = None)
+#                   input - string checkpoint_path     - Checkpoint to resume from and save progress to (Default = None)
+#
+# Return Variable:  output - (dict matches, list errors) - number of claims found for each identifier that
+#                            was found, and (filepathname, parse error message) for each file that failed
+#
+# Notes:            See iterScannedClaims() for the order claims are written in.
+#
+#####################################################################################################
+def searchFiles(identifiers, filepathnames, combined_outputname=None, claim_tag=None, processes=1,
+                prefilter=False, selector=None, checkpoint_path=None):
+#####################################################################################################
+# Scan files and write claims as they are yielded
+# Return number of claims found for each identifier and parse errors
+#####################################################################################################
+  errors = []
+  matches = writeClaims(iterScannedClaims(identifiers, filepathnames, claim_tag, processes, prefilter, errors,
+                                          selector, checkpoint_path),
+                        combined_outputname)
+#####################################################################################################
+# Return variable
+#####################################################################################################
+  return matches, errors
+############################## end of searchFiles() function ########################################
+#####################################################################################################
+
+
+#####################################################################################################
+#
+# Function Name:    extractFromFiles()
+#
+# Description:      Extracts the claims for the unique identifiers from the files, either through the
+#                   claim index or by scanning the files, and prints any file that could not be parsed.
+#
+# Arguments:        input - set identifiers            - Unique identifiers to search for to find claims
+#                   input - string[] filepathnames     - filepaths and names for raw xml files to search
+#                   input - string combined_outputname - filename to write all claims to (Default = None)
+#                   input - string claim_tag           - Element name of a claim (Default = None)
+#                   input - string index_path          - Claim index to look identifiers up in (Default = None)
+#                   input - int processes              - Number of files to scan at the same time (Default = 1)
+#                   input - bool prefilter             - Use the prefilter fast path when scanning (Default = False)
+#                   input - dict selector              - Only write claims matching this selector (Default = None)
+#                   input - string checkpoint_path     - Checkpoint to resume scans from and save progress to
+#                                                        (Default = None)
+#
+# Return Variable:  output - dict matches - number of claims found for each identifier that was found
+#
+# Notes:            Indexing errors are raised to the caller. Scan errors are printed and the other
+#                   files are still searched.
+#
+#####################################################################################################
+def extractFromFiles(identifiers, filepathnames, combined_outputname=None, claim_tag=None, index_path=None,
+                     processes=1, prefilter=False, selector=None, checkpoint_path=None):
+#####################################################################################################
+# Look identifiers up in the index if one is given, otherwise scan the files
+# Print parse errors
+# Time the whole search
+# Return number of claims found for each identifier
+#####################################################################################################
+  search_start = time.perf_counter()
+  if index_path:
+    matches = extractIndexedClaims(identifiers, filepathnames, index_path, combined_outputname, claim_tag,
+                                   selector)
+  else:
+    matches, errors = searchFiles(identifiers, filepathnames, combined_outputname, claim_tag, processes,
+                                  prefilter, selector, checkpoint_path)
+    for filepathname, error in errors:
+      printParseErrorMsg(filepathname, error)
+  timeStat('search', time.perf_counter() - search_start)
+#####################################################################################################
+# Return variable
+#####################################################################################################
+  return matches
+############################## end of extractFromFiles() function ###################################
+#####################################################################################################
+
+
+#####################################################################################################
+#
+# Function Name:    readIdentifiersFile()
+#
+# Description:      Reads the unique identifiers to search for from a file containing one identifier
+#                   per line. Blank lines are ignored.
+#
+# Arguments:        input - string ids_filename - filepath and name of the identifiers file
+#
+# Return Variable:  output - set identifiers - unique identifiers read from the file, or '' if the file
+#                            does not exist
+#
+# Notes:            None.
+#
+#####################################################################################################
+def readIdentifiersFile(ids_filename):
+#####################################################################################################
+# Checks if identifiers file exists in the system
+# Return the set of identifiers if valid, otherwise return '' and print an error message
+#####################################################################################################
+  identifiers = ''
+  if os.path.isfile(ids_filename):
+    with open(ids_filename) as ids_file:
+      identifiers = set(line.strip() for line in ids_file)
+    identifiers.discard('')
+  else:
+    printInvalidIdentifiersFileMsg(ids_filename)
+#####################################################################################################
+# Return variable
+#####################################################################################################
+  return identifiers
+############################## end of readIdentifiersFile() function ################################
+#####################################################################################################
+
+
+#####################################################################################################
+#
+# Function Name:    startStats()
+#
+# Description:      Turns on the run stats, so the stages of the run are timed and counted.
+#
+# Arguments:        N/A
+#
+# Return Variable:  N/A
+#
+# Notes:            Stats are off by default, and countStat() and timeStat() do nothing until this is
+#                   called.
+#
+#####################################################################################################
+def startStats():
+  global run_stats
+  run_stats = {'started': time.time(), 'start': time.perf_counter(), 'counters': {}, 'seconds': {}}
+############################## end of startStats() function #########################################
+#####################################################################################################
+
+
+#####################################################################################################
+#
+# Function Name:    countStat() / timeStat()
+#
+# Description:      Adds to a counter, or to the time spent in a stage, of the run stats.
+#
+# Arguments:        input - string name    - name of the counter or stage
+#                   input - number amount  - amount to add (Default = 1) / seconds spent
+#
+# Return Variable:  N/A
+#
+# Notes:            Stages timed in worker processes add up the time of every worker, so they can be
+#                   larger than the time of the whole run.
+#
+#####################################################################################################
+def countStat(name, amount=1):
+  if run_stats is not None:
+    run_stats['counters'][name] = run_stats['counters'].get(name, 0) + amount
+
+def timeStat(name, seconds):
+  if run_stats is not None:
+    run_stats['seconds'][name] = run_stats['seconds'].get(name, 0.0) + seconds
+############################## end of countStat() / timeStat() functions ############################
+#####################################################################################################
+
+
+#####################################################################################################
+#
+# Function Name:    mergeStats()
+#
+# Description:      Adds the counters and stage times returned by a worker process to the run stats.
+#
+# Arguments:        input - dict file_stats - 'counters' and 'seconds' of the work done
+#
+# Return Variable:  N/A
+#
+# Notes:            None.
+#
+#####################################################################################################
+def mergeStats(file_stats):
+  for name, amount in file_stats['counters'].items():
+    countStat(name, amount)
+  for name, seconds in file_stats['seconds'].items():
+    timeStat(name, seconds)
+############################## end of mergeStats() function #########################################
+#####################################################################################################
+
+
+#####################################################################################################
+#
+# Function Name:    finishStats()
+#
+# Description:      Builds the report of the run stats, with the total time and peak memory of the run,
+#                   and writes it to the report file if one is given.
+#
+# Arguments:        input - dict settings          - settings of the run to include in the report
+#                   input - string stats_filename  - report file (Default = None, no file). A name ending
+#                                                    in .ndjson or .jsonl has the report appended as one
+#                                                    line, any other name is overwritten with json.
+#
+# Return Variable:  output - dict report - settings, counters, stage seconds, total seconds and peak RSS
+#
+# Notes:            Peak RSS is the largest of this process and its worker processes, and is left out
+#                   where the resource module is not available.
+#
+#####################################################################################################
+def finishStats(settings, stats_filename=None):
+#####################################################################################################
+# Build report from the run stats
+# Append or write the report file
+#####################################################################################################
+  report = {'started': time.strftime('%Y-%m-%dT%H:%M:%S', time.localtime(run_stats['started'])),
+            'argv': sys.argv[1:], 'settings': settings, 'counters': dict(sorted(run_stats['counters'].items())),
+            'seconds': dict((name, round(seconds, 6)) for name, seconds in sorted(run_stats['seconds'].items())),
+            'total_seconds': round(time.perf_counter() - run_stats['start'], 6)}
+  if resource is not None:
+    peak_kb = max(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+                  resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss)
+    report['peak_rss_mb'] = round(peak_kb / 1024.0, 1)
+  if stats_filename:
+    if stats_filename.endswith(('.ndjson', '.jsonl')):
+      with open(stats_filename, 'a') as stats_file:
+        stats_file.write(json.dumps(report) + '\n')
+    else:
+      with open(stats_filename, 'w') as stats_file:
+        json.dump(report, stats_file, indent=2)
+#####################################################################################################
+# Return variable
+#####################################################################################################
+  return report
+############################## end of finishStats() function ########################################
+#####################################################################################################
+
+
+#####################################################################################################
+#
+# Function Name:    parseClaimSlice()
+#
+# Description:      Parses the bytes of a single claim element read from a raw xml file, without
+#                   reading the rest of the file.
+#
+# Arguments:        input - bytes data       - bytes of the claim from its start tag to its end tag
+#                   input - dict file_info   - 'encoding' and 'namespaces' of the file, as filled in
+#                                              by iterClaims()
+#
+# Return Variable:  output - Element claim - parsed claim element
+#
+# Notes:            The claim is wrapped in an element declaring the namespaces of the file, so
+#                   prefixes declared on the root element of the file still resolve.
+#
+#####################################################################################################
+def parseClaimSlice(data, file_info):
+#####################################################################################################
+# Build wrapper element with namespace declarations of the file
+# Parse the claim inside of the wrapper and return it
+#####################################################################################################
+  declarations = ''
+  for prefix, uri in file_info['namespaces'].items():
+    declarations += ' xmlns' + (':' + prefix if prefix else '') + '=' + quoteattr(uri)
+  encoding = file_info['encoding'] or 'UTF-8'
+  wrapper = '<?xml version="1.0" encoding="' + encoding + '"?><clmSlice' + declarations + '>'
+  root = ET.fromstring(wrapper.encode(encoding) + data + '</clmSlice>'.encode(encoding))
+#####################################################################################################
+# Return variable
+#####################################################################################################
+  return root[0]
+############################## end of parseClaimSlice() function ####################################
+#####################################################################################################
+
+
+#####################################################################################################
+#
+# Function Name:    claimValues()
+#
+# Description:      Collects the values of a parsed claim the same way iterClaims() does while streaming,
+#                   so a claim parsed on its own is matched exactly like a streamed claim.
+#
+# Arguments:        input - Element claim - claim element
+#
+# Return Variable:  output - set values - all non-empty attribute values and element text in the claim
+#
+# Notes:            The text of an element includes the text between its child elements.
+#
+#####################################################################################################
+def claimValues(claim):
+#####################################################################################################
+# Collect stripped attribute values and element text of every element in the claim
+#####################################################################################################
+  values = set()
+  for element in claim.iter():
+    for value in element.attrib.values():
+      value = value.strip()
+      if value:
+        values.add(value)
+    value = ((element.text or '') + ''.join(child.tail or '' for child in element)).strip()
+    if value:
+      values.add(value)
+#####################################################################################################
+# Return variable
+#####################################################################################################
+  return values
+############################## end of claimValues() function ########################################
+#####################################################################################################
+
+
+#####################################################################################################
+#
+# Function Name:    readFileInfo()
+#
+# Description:      Reads the encoding and the namespaces declared up to the root element from the
+#                   beginning of a memory-mapped raw xml file, without parsing the rest of the file.
+#
+# Arguments:        input - mmap mapped - memory-mapped raw xml file
+#
+# Return Variable:  output - dict file_info - 'encoding' and 'namespaces' of the file, the same as filled
+#                            in by iterClaims()
+#
+# Notes:            Namespace prefixes found are registered for writing claims.
+#
+#####################################################################################################
+def readFileInfo(mapped):
+#####################################################################################################
+# Feed the beginning of the file to expat until the root element start tag is read
+# Return encoding and namespaces found
+#####################################################################################################
+  file_info = {'encoding': None, 'namespaces': {}, 'root': False}
+  parser = expat.ParserCreate(namespace_separator='}')
+
+  def xmlDecl(version, encoding, standalone):
+    file_info['encoding'] = encoding
+
+  def startNamespace(prefix, uri):
+    file_info['namespaces'].setdefault(prefix or '', uri)
+    registerNamespace(prefix or '', uri)
+
+  def startElement(name, attrs):
+    file_info['root'] = True
+
+  parser.XmlDeclHandler = xmlDecl
+  parser.StartNamespaceDeclHandler = startNamespace
+  parser.StartElementHandler = startElement
+  offset = 0
+  try:
+    while not file_info['root'] and offset < len(mapped):
+      parser.Parse(mapped[offset:offset + 65536], False)
+      offset += 65536
+  except expat.ExpatError:
+    # Errors past the root element are reported by the full scan
+    pass
+  del file_info['root']
+#####################################################################################################
+# Return variable
+#####################################################################################################
+  return file_info
+############################## end of readFileInfo() function #######################################
+#####################################################################################################
+
+
+#####################################################################################################
+#
+# Function Name:    findClaimSlice()
+#
+# Description:      Finds the start and end of the claim element around a byte position in a
+#                   memory-mapped raw xml file by searching back for the claim start tag and forward
+#                   for its end tag.
+#
+# Arguments:        input - mmap mapped      - memory-mapped raw xml file
+#                   input - int hit          - byte position of an identifier in the file
+#                   input - string claim_tag - Element name of a claim
+#
+# Return Variable:  output - (int start, int end) - byte offsets of the claim start tag and the end of the
+#                            claim end tag, or None if the position is not inside of a claim
+#
+# Notes:            The claim start tag may have a namespace prefix, e.g. <p:Claim ...>.
+#
+#####################################################################################################
+def findClaimSlice(mapped, hit, claim_tag):
+#####################################################################################################
+# Search back for '<tag' or ':tag' followed by the end of the tag name
+# Search forward for the matching end tag
+# Return claim offsets if the position is between them
+#####################################################################################################
+  claim_slice = None
+  tag = claim_tag.encode('utf-8')
+  position = hit
+  while position > 0:
+    start = max(mapped.rfind(b'<' + tag, 0, position), mapped.rfind(b':' + tag, 0, position))
+    if start == -1:
+      break
+    position = start
+    if mapped[start + 1 + len(tag):start + 2 + len(tag)] not in (b' ', b'\t', b'\r', b'\n', b'>', b'/'):
+      # Longer element name, e.g. <ClaimLine>
+      continue
+    qualified_tag = tag
+    if mapped[start:start + 1] == b':':
+      tag_open = mapped.rfind(b'<', 0, start)
+      prefix = mapped[tag_open + 1:start]
+      if tag_open == -1 or not prefix or prefix.startswith(b'/') or not prefix.replace(b'-', b'').replace(b'.', b'').replace(b'_', b'').isalnum():
+        # End tag of an earlier claim, or text that is not a start tag
+        break
+      qualified_tag = prefix + b':' + tag
+      start = tag_open
+    tag_end = mapped.find(b'>', start)
+    if mapped[tag_end - 1:tag_end] == b'/':
+      end = tag_end + 1
+    else:
+      close = mapped.find(b'</' + qualified_tag, tag_end)
+      end = mapped.find(b'>', close) + 1 if close != -1 else 0
+    if start < hit < end:
+      claim_slice = (start, end)
+    break
+#####################################################################################################
+# Return variable
+#####################################################################################################
+  return claim_slice
+############################## end of findClaimSlice() function #####################################
+#####################################################################################################
+
+
+#####################################################################################################
+#
+# Function Name:    prefilterFile()
+#
+# Description:      Fast path for scanFile(). Memory-maps the raw xml file and searches for the bytes of
+#                   each identifier. A file without any hits is skipped without parsing it. For a file
+#                   with hits, only the claims around the hits are parsed.
+#
+# Arguments:        input - set identifiers     - Unique identifiers to search for to find claims
+#                   input - string filepathname - filepath and name for raw xml file to search
+#                   input - string claim_tag    - Element name of a claim (Default = None)
+#
+# Return Variable:  output - list file_matches - (sorted identifiers found, indented claim) for every claim
+#                            found in file order, the same as scanFile(), or None if the file must be
+#                            fully scanned instead
+#
+# Notes:            Without claim_tag the claim around a hit cannot be found, so files with hits are fully
+#                   scanned. Files are also fully scanned when they are compressed, there are more than
+#                   prefilter_limit identifiers, an identifier would be escaped in xml, the file is not in an
+#                   ascii-compatible encoding, or a claim slice does not parse on its own.
+#
+#####################################################################################################
+def prefilterFile(identifiers, filepathname, claim_tag=None):
+#####################################################################################################
+# Memory-map file and find every position of every identifier
+# Return no claims if there are no hits
+# Find, parse and check the claim around each hit
+# Return claims found, or None to fall back to a full scan
+#####################################################################################################
+  file_matches = None
+  if len(identifiers) <= prefilter_limit and detectCompression(filepathname) is None and \
+     not any(set('&<>"\'').intersection(identifier) for identifier in identifiers):
+    with open(filepathname, 'rb') as raw_file:
+      if os.fstat(raw_file.fileno()).st_size == 0:
+        file_matches = []
+      else:
+        mapped = mmap.mmap(raw_file.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+          file_info = readFileInfo(mapped)
+          encoding = file_info['encoding'] or 'UTF-8'
+          hits = []
+          if not encoding.upper().startswith(('UTF-16', 'UTF-32', 'UCS')):
+            for identifier in identifiers:
+              pattern = identifier.encode(encoding)
+              position = mapped.find(pattern)
+              while position != -1:
+                hits.append(position)
+                position = mapped.find(pattern, position + 1)
+            if not hits:
+              file_matches = []
+          if hits and claim_tag is not None:
+            slices = []
+            for hit in sorted(hits):
+              if slices and hit < slices[-1][1]:
+                continue
+              claim_slice = findClaimSlice(mapped, hit, claim_tag)
+              if claim_slice is not None:
+                slices.append(claim_slice)
+            file_matches = []
+            for start, end in slices:
+              claim = parseClaimSlice(mapped[start:end], file_info)
+              found = identifiers.intersection(claimValues(claim))
+              if found:
+                file_matches.append((sorted(found), formatClaim(claim)))
+        except (ET.ParseError, UnicodeError, LookupError):
+          file_matches = None
+        finally:
+          mapped.close()
+#####################################################################################################
+# Return variable
+#####################################################################################################
+  return file_matches
+############################## end of prefilterFile() function ######################################
+#####################################################################################################
+
+
+#####################################################################################################
+#
+# Function Name:    writeClaimOutputs()
+#
+# Description:      Writes a claim found for one or more identifiers to the combined output file, or
+#                   to INDENT.<identifier> for each identifier when there is no combined output file.
+#
+# Arguments:        input - string claim_text    - indented claim to write
+#                   input - set found            - identifiers found in the claim
+#                   input - dict outputs         - outputs from openOutputs()
+#
+# Return Variable:  N/A
+#
+# Notes:            At most max_open_outputs files are kept open. When more are needed, the open ones
+#                   are closed and each is opened again to append to when its next claim is written.
+#
+#####################################################################################################
+def writeClaimOutputs(claim_text, found, outputs):
+#####################################################################################################
+# Write claim once to the combined file, otherwise to the file of every identifier found
+# Open the temporary file of an output the first time it is written to
+#####################################################################################################
+  if outputs['combined'] is not None:
+    outputnames = [outputs['combined']]
+  else:
+    outputnames = ['INDENT.' + identifier for identifier in sorted(found)]
+  for outputname in outputnames:
+    output_file = outputs['files'].get(outputname)
+    if output_file is None:
+      if outputname == '-':
+        output_file = claim_stdout or sys.stdout
+      else:
+        if len(outputs['files']) >= max_open_outputs:
+          for open_outputname in [name for name in outputs['files'] if name != '-']:
+            outputs['files'].pop(open_outputname).close()
+        temp_name = outputs['temp_names'].get(outputname)
+        if temp_name is None:
+          temp_name = tempOutputName(outputname)
+          outputs['temp_names'][outputname] = temp_name
+          output_file = open(temp_name, 'x', buffering=output_buffer)
+        else:
+          output_file = open(temp_name, 'a', buffering=output_buffer)
+      outputs['files'][outputname] = output_file
+    output_file.write(claim_text)
+############################## end of writeClaimOutputs() function ##################################
+#####################################################################################################
+
+
+#####################################################################################################
+#
+# Function Name:    tempOutputName()
+#
+# Description:      Returns a temporary name to write an output file under before it is renamed into
+#                   place.
+#
+# Arguments:        input - string outputname - filepath and name of the output file
+#
+# Return Variable:  output - string temp_name - hidden name in the same directory, unique to this
+#                            process and output
+#
+# Notes:            The same directory keeps the rename on one file system, where it is atomic.
+#
+#####################################################################################################
+def tempOutputName(outputname):
+#####################################################################################################
+# Build hidden name from the output name, process id and a counter
+#####################################################################################################
+  output_dir, output_basename = os.path.split(outputname)
+  temp_name = os.path.join(output_dir, '.' + output_basename + '.' + str(os.getpid()) + '.' +
+                           str(next(output_counter)) + '.tmp')
+#####################################################################################################
+# Return variable
+#####################################################################################################
+  return temp_name
+############################## end of tempOutputName() function #####################################
+#####################################################################################################
+
+
+#####################################################################################################
+#
+# Function Name:    openOutputs()
+#
+# Description:      Starts a set of claim outputs for writeClaimOutputs(), either one combined output
+#                   file or INDENT.<identifier> for each identifier.
+#
+# Arguments:        input - string combined_outputname - filename to write all claims to, or '-' for
+#                                                        standard output (Default = None)
+#                   input - bool append                - Add the claims to the end of existing output files
+#                                                        when they are closed (Default = False)
+#
+# Return Variable:  output - dict outputs - the 'combined' output name, the open 'files' and the
+#                            'temp_names' written to, by output name, and whether to 'append'
+#
+# Notes:            No file is opened until a claim is written to it.
+#
+#####################################################################################################
+def openOutputs(combined_outputname=None, append=False):
+#####################################################################################################
+# Start with no files open
+#####################################################################################################
+  outputs = {'combined': combined_outputname, 'files': {}, 'temp_names': {}, 'append': append}
+#####################################################################################################
+# Return variable
+#####################################################################################################
+  return outputs
+############################## end of openOutputs() function ########################################
+#####################################################################################################
+
+
+#####################################################################################################
+#
+# Function Name:    closeOutputs()
+#
+# Description:      Closes the claim outputs and renames every temporary file to its output name, or
+#                   removes the temporary files when the outputs are not kept.
+#
+# Arguments:        input - dict outputs - outputs from openOutputs()
+#                   input - bool keep    - Rename the files into place (True) or remove them (False)
+#
+# Return Variable:  N/A
+#
+# Notes:            Outputs already closed are skipped, so this may be called again after a failure.
+#                   Standard output is flushed, not closed. Outputs opened to append are added to
+#                   their existing file by appendOutput().
+#
+#####################################################################################################
+def closeOutputs(outputs, keep):
+#####################################################################################################
+# Close open files
+# Rename, append or remove temporary files
+#####################################################################################################
+  while outputs['files']:
+    outputname, output_file = outputs['files'].popitem()
+    try:
+      if outputname == '-':
+        output_file.flush()
+      else:
+        output_file.close()
+    except OSError:
+      if keep:
+        raise
+  for outputname in sorted(outputs['temp_names']):
+    if keep and outputs['append']:
+      appendOutput(outputs['temp_names'][outputname], outputname)
+    elif keep:
+      os.replace(outputs['temp_names'][outputname], outputname)
+    else:
+      try:
+        os.remove(outputs['temp_names'][outputname])
+      except OSError:
+        pass
+    del outputs['temp_names'][outputname]
+############################## end of closeOutputs() function #######################################
+#####################################################################################################
+
+
+#####################################################################################################
+#
+# Function Name:    appendOutput()
+#
+# Description:      Adds the claims written to a temporary file to the end of an output file, by
+#                   copying the existing output and the new claims to another temporary file renamed
+#                   into place.
+#
+# Arguments:        input - string temp_name  - temporary file with the new claims, removed when done
+#                   input - string outputname - filepath and name of the output file
+#
+# Return Variable:  N/A
+#
+# Notes:            The output is locked with a hidden .<output>.lock file in the same directory, so
+#                   processes appending to the same output at the same time each add their claims
+#                   instead of replacing the claims of the other. Only one output is locked at a time.
+#
+#####################################################################################################
+def appendOutput(temp_name, outputname):
+#####################################################################################################
+# Lock output
+# Copy existing output, then the new claims, to a temporary file and rename it into place
+# Remove the temporary files
+#####################################################################################################
+  output_dir, output_basename = os.path.split(outputname)
+  with open(os.path.join(output_dir, '.' + output_basename + '.lock'), 'a') as lock_file:
+    fcntl.flock(lock_file, fcntl.LOCK_EX)
+    append_name = tempOutputName(outputname)
+    try:
+      with open(append_name, 'xb') as append_file:
+        try:
+          with open(outputname, 'rb') as output_file:
+            shutil.copyfileobj(output_file, append_file, output_buffer)
+        except FileNotFoundError:
+          pass
+        with open(temp_name, 'rb') as temp_file:
+          shutil.copyfileobj(temp_file, append_file, output_buffer)
+      os.replace(append_name, outputname)
+    finally:
+      if os.path.exists(append_name):
+        os.remove(append_name)
+  os.remove(temp_name)
+############################## end of appendOutput() function #######################################
+#####################################################################################################
+
+
+#####################################################################################################
+#
+# Function Name:    openIndex()
+#
+# Description:      Opens the claim index database at index_path, creating it if it does not exist.
+#                   The index maps the identifier fields (index_fields) of a claim to the file and the
+#                   byte offset and length of the claim in that file.
+#
+# Arguments:        input - string index_path - filepath and name of the index database
+#
+# Return Variable:  output - Connection connection - open sqlite3 connection to the index
+#
+# Notes:            Files are stored with their size, modification time, claim element name and index
+#                   fields so a stale entry can be detected and the file indexed again. An index from
+#                   before the index fields, of every value in the claims, is emptied to be built again.
+#
+#####################################################################################################
+def openIndex(index_path):
+#####################################################################################################
+# Create directory for the index if needed
+# Connect to index, drop tables of an index of every value, and create tables if they do not exist
+#####################################################################################################
+  index_dir = os.path.dirname(index_path)
+  if index_dir and not os.path.isdir(index_dir):
+    os.makedirs(index_dir)
+  connection = sqlite3.connect(index_path, timeout=index_timeout)
+  connection.execute('PRAGMA journal_mode = WAL')
+  columns = [column[1] for column in connection.execute('PRAGMA table_info(files)')]
+  if columns and 'index_fields' not in columns:
+    connection.executescript('''
+      DROP TABLE IF EXISTS claims;
+      DROP TABLE IF EXISTS files;
+      VACUUM;
+    ''')
+  connection.executescript('''
+    CREATE TABLE IF NOT EXISTS files (
+      file_id       INTEGER PRIMARY KEY,
+      path          TEXT NOT NULL UNIQUE,
+      size          INTEGER NOT NULL,
+      mtime_ns      INTEGER NOT NULL,
+      claim_tag     TEXT NOT NULL,
+      index_fields  TEXT NOT NULL,
+      file_info     TEXT NOT NULL
+    );
+    CREATE TABLE IF NOT EXISTS claims (
+      identifier    TEXT NOT NULL,
+      file_id       INTEGER NOT NULL,
+      start_offset  INTEGER NOT NULL,
+      length        INTEGER NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS claims_identifier ON claims (identifier);
+    CREATE INDEX IF NOT EXISTS claims_file ON claims (file_id);
+  ''')
+#####################################################################################################
+# Return variable
+#####################################################################################################
+  return connection
+############################## end of openIndex() function ##########################################
+#####################################################################################################
+
+
+#####################################################################################################
+#
+# Function Name:    refreshIndex()
+#
+# Description:      Indexes every file that is not in the index yet, or whose size, modification time,
+#                   claim element name or index_fields changed since it was indexed. Up to date files
+#                   are skipped.
+#
+# Arguments:        input - Connection connection - open connection to the index
+#                   input - string[] filepathnames - filepaths and names for raw xml files to index
+#                   input - string claim_tag       - Element name of a claim (Default = None)
+#
+# Return Variable:  output - int indexed - number of files that were (re)indexed
+#
+# Notes:            Each file is indexed in its own transaction, so a file that fails to parse is
+#                   reported and left as it was in the index. The file is parsed into a temporary table and
+#                   the index is only locked while its rows are copied in, so several processes can
+#                   index files at the same time.
+#                   Only the first value of each index field in a claim is indexed, captured while the
+#                   file is streamed without building the claims.
+#
+#####################################################################################################
+def refreshIndex(connection, filepathnames, claim_tag=None):
+#####################################################################################################
+# Check size and modification time of each file against the index
+# Stream stale files and replace their claims in the index
+# Return number of files indexed
+#####################################################################################################
+  indexed = 0
+  tag = claim_tag or ''
+  fields = parseIndexFields(index_fields)
+  for filepathname in filepathnames:
+    path = os.path.abspath(filepathname)
+    stat = os.stat(path)
+    row = connection.execute('SELECT file_id, size, mtime_ns, claim_tag, index_fields FROM files WHERE path = ?',
+                             (path,)).fetchone()
+    if row is not None and row[1:] == (stat.st_size, stat.st_mtime_ns, tag, fields['text']):
+      countStat('index_hits')
+      continue
+    countStat('index_misses')
+    index_start = time.perf_counter()
+    # Parse into a temporary table first, which does not lock the index for other processes
+    connection.execute('CREATE TEMP TABLE IF NOT EXISTS new_claims (identifier TEXT, start_offset INTEGER, length INTEGER)')
+    connection.execute('DELETE FROM new_claims')
+    file_info = {}
+    rows = ((value, start, end - start)
+            for row, values, start, end in iterClaims(path, claim_tag, file_info, fields=fields)
+            for value in set(row) if value is not None)
+    try:
+      with connection:
+        connection.executemany('INSERT INTO new_claims VALUES (?, ?, ?)', rows)
+      with connection:
+        # Take the write lock up front so a busy index is waited for instead of failing
+        connection.execute('BEGIN IMMEDIATE')
+        # Look the file up again, another process may have indexed it in the meantime
+        for file_id, in connection.execute('SELECT file_id FROM files WHERE path = ?', (path,)).fetchall():
+          connection.execute('DELETE FROM claims WHERE file_id = ?', (file_id,))
+          connection.execute('DELETE FROM files WHERE file_id = ?', (file_id,))
+        file_id = connection.execute('''INSERT INTO files (path, size, mtime_ns, claim_tag, index_fields, file_info)
+                                        VALUES (?, ?, ?, ?, ?, ?)''',
+                                     (path, stat.st_size, stat.st_mtime_ns, tag, fields['text'],
+                                      json.dumps(file_info))).lastrowid
+        connection.execute('INSERT INTO claims SELECT identifier, ?, start_offset, length FROM new_claims', (file_id,))
+        connection.execute('DELETE FROM new_claims')
+      indexed += 1
+      countStat('bytes_read', stat.st_size)
+    except (expat.ExpatError, OSError, EOFError, lzma.LZMAError) as error:
+      # File is left out of the index, the other files are still indexed
+      printParseErrorMsg(path, error)
+      countStat('parse_errors')
+    timeStat('index', time.perf_counter() - index_start)
+#####################################################################################################
+# Return variable
+#####################################################################################################
+  return indexed
+############################## end of refreshIndex() function #######################################
+#####################################################################################################
+
+
+#####################################################################################################
+#
+# Function Name:    buildIndex()
+#
+# Description:      Opens the index at index_path and brings it up to date for the given files.
+#
+# Arguments:        input - string[] filepathnames - filepaths and names for raw xml files to index
+#                   input - string index_path      - filepath and name of the index database
+#                   input - string claim_tag       - Element name of a claim (Default = None)
+#
+# Return Variable:  output - int indexed - number of files that were (re)indexed
+#
+# Notes:            None.
+#
+#####################################################################################################
+def buildIndex(filepathnames, index_path, claim_tag=None):
+#####################################################################################################
+# Open index, refresh it for every file and close it
+#####################################################################################################
+  connection = openIndex(index_path)
+  try:
+    indexed = refreshIndex(connection, filepathnames, claim_tag)
+  finally:
+    connection.close()
+#####################################################################################################
+# Return variable
+#####################################################################################################
+  return indexed
+############################## end of buildIndex() function #########################################
+#####################################################################################################
+
+
+#####################################################################################################
+#
+# Function Name:    iterIndexedClaims()
+#
+# Description:      Indexed version of iterScannedClaims(). Brings the index up to date for the given
+#                   files, looks up the identifiers in the index and reads only the bytes of the
+#                   matching claims from the files. Identifiers not in the index are searched for in
+#                   the files, so the claims are the same as a scan finds.
+#
+# Arguments:        input - set identifiers        - Unique identifiers to search for to find claims
+#                   input - string[] filepathnames - filepaths and names for raw xml files to search
+#                   input - string index_path      - filepath and name of the index database
+#                   input - string claim_tag       - Element name of a claim (Default = None)
+#                   input - dict selector          - Only yield claims matching this selector (Default = None)
+#
+# Return Variable:  output - (string filepathname, list found, string claim_text) - file the claim is in,
+#                            sorted identifiers found in the claim and indented claim
+#
+# Notes:            Claims are yielded in the order of filepathnames, then in the order of the file, so
+#                   compressed files are only ever decompressed forward to the next claim.
+#                   The selector is checked on each claim read, before it is formatted.
+#                   Only the index_fields of a claim are indexed, so an identifier in any other field,
+#                   or not in the files at all, is not found in the index. Each file that may contain
+#                   such an identifier is scanned for it. The prefilter skips the uncompressed files
+#                   without its bytes, up to prefilter_limit identifiers.
+#
+#####################################################################################################
+def iterIndexedClaims(identifiers, filepathnames, index_path, claim_tag=None, selector=None):
+#####################################################################################################
+# Refresh index for the files
+# Look up all identifiers at once and group the rows by file and claim
+# Scan each file for the identifiers not in the index, adding the claims found to those of the index
+# Seek to each claim, parse only its bytes and yield it
+#####################################################################################################
+  raw_file = None
+  connection = openIndex(index_path)
+  try:
+    refreshIndex(connection, filepathnames, claim_tag)
+    lookup_start = time.perf_counter()
+    file_order = dict((os.path.abspath(filepathname), order) for order, filepathname in enumerate(filepathnames))
+    connection.execute('CREATE TEMP TABLE IF NOT EXISTS lookup (identifier TEXT PRIMARY KEY)')
+    connection.execute('DELETE FROM lookup')
+    connection.executemany('INSERT OR IGNORE INTO lookup VALUES (?)', ((identifier,) for identifier in identifiers))
+    rows = connection.execute('''SELECT files.path, files.file_info, claims.start_offset, claims.length, claims.identifier
+                                 FROM lookup
+                                 JOIN claims ON claims.identifier = lookup.identifier
+                                 JOIN files ON files.file_id = claims.file_id''')
+    claims = {}
+    indexed = set()
+    for path, file_info, start, length, identifier in rows:
+      indexed.add(identifier)
+      if path in file_order:
+        file_claims = claims.setdefault(file_order[path], {})
+        file_claims.setdefault(start, [file_info, length, set(), None])[2].add(identifier)
+    missing = set(identifiers).difference(indexed)
+    connection.close()
+    connection = None
+    timeStat('lookup', time.perf_counter() - lookup_start)
+
+    current_path = None
+    for order, filepathname in enumerate(filepathnames):
+      file_claims = claims.get(order, {})
+      if missing and file_order.get(os.path.abspath(filepathname)) == order and \
+         prefilterFile(missing, filepathname, claim_tag) != []:
+        scan_start = time.perf_counter()
+        counters = {}
+        try:
+          for claim, found, start, end in iterCheckpointedClaims(missing, filepathname, claim_tag, selector,
+                                                                 counters=counters):
+            file_claims.setdefault(start, [None, end - start, set(), None])
+            file_claims[start][2].update(found)
+            file_claims[start][3] = claim
+        except (expat.ExpatError, OSError, EOFError, lzma.LZMAError) as error:
+          # File is left out, the same as a scan
+          printParseErrorMsg(filepathname, error)
+          countStat('parse_errors')
+        countStat('files_scanned')
+        countStat('claims_parsed', counters.get('claims_parsed', 0))
+        timeStat('scan', time.perf_counter() - scan_start)
+      for start in sorted(file_claims):
+        read_start = time.perf_counter()
+        file_info, length, found, claim = file_claims[start]
+        if claim is None:
+          path = os.path.abspath(filepathname)
+          if path != current_path:
+            if raw_file is not None:
+              raw_file.close()
+            raw_file = openClaimFile(path)
+            current_path = path
+            current_info = json.loads(file_info)
+            for prefix, uri in current_info['namespaces'].items():
+              registerNamespace(prefix, uri)
+          raw_file.seek(start)
+          claim = parseClaimSlice(raw_file.read(length), current_info)
+          countStat('claims_parsed')
+        if selector is not None and not claimMatchesSelector(claim, selector):
+          timeStat('read', time.perf_counter() - read_start)
+          continue
+        claim_text = formatClaim(claim)
+        timeStat('read', time.perf_counter() - read_start)
+        yield filepathname, sorted(found), claim_text
+  finally:
+    if connection is not None:
+      connection.close()
+    if raw_file is not None:
+      raw_file.close()
+############################## end of iterIndexedClaims() function ##################################
+#####################################################################################################
+
+
+#####################################################################################################
+#
+# Function Name:    extractIndexedClaims()
+#
+# Description:      Indexed version of searchFiles(). Writes every claim found through the claim index
+#                   to INDENT.<identifier> for every identifier it contains, or once to a single file
+#                   when combined_outputname is given.
+#
+# Arguments:        input - set identifiers            - Unique identifiers to search for to find claims
+#                   input - string[] filepathnames     - filepaths and names for raw xml files to search
+#                   input - string index_path          - filepath and name of the index database
+#                   input - string combined_outputname - filename to write all claims to (Default = None)
+#                   input - string claim_tag           - Element name of a claim (Default = None)
+#                   input - dict selector              - Only write claims matching this selector (Default = None)
+#                   input - bool append                - Add the claims to the end of existing output files
+#                                                        instead of replacing them (Default = False)
+#
+# Return Variable:  output - dict matches - number of claims found for each identifier that was found
+#
+# Notes:            See iterIndexedClaims() for the order claims are written in.
+#
+#####################################################################################################
+def extractIndexedClaims(identifiers, filepathnames, index_path, combined_outputname=None, claim_tag=None,
+                         selector=None, append=False):
+#####################################################################################################
+# Look claims up in the index and write them as they are yielded
+# Return number of claims found for each identifier
+#####################################################################################################
+  matches = writeClaims(iterIndexedClaims(identifiers, filepathnames, index_path, claim_tag, selector),
+                        combined_outputname, append)
+#####################################################################################################
+# Return variable
+#####################################################################################################
+  return matches
+############################## end of extractIndexedClaims() function ###############################
+#####################################################################################################
+
+
+#####################################################################################################
+#
+# Function Name:    requestClaims()
+#
+# Description:      Sends a lookup to a running getIndentedClmServer.py and returns its answer.
+#
+# Arguments:        input - set identifiers     - Unique identifiers to search for to find claims
+#                   input - string server       - host:port of the lookup server
+#                   input - string extension    - Filetype extension to search for
+#                   input - string search_path  - Full path to directory that is to be searched for file
+#                   input - string claim_tag    - Element name of a claim (Default = None)
+#                   input - bool search_all     - Search every file with the extension, not only the first
+#                   input - bool recursive      - Also search files in subdirectories of search_path
+#
+# Return Variable:  output - dict response - 'claims' as (filepathname, found, claim_text), 'errors' as
+#                            (filepathname, parse error message) and number of 'files' searched
+#
+# Notes:            Raises OSError if the server cannot be reached or refuses the lookup.
+#
+#####################################################################################################
+def requestClaims(identifiers, server, extension, search_path, claim_tag=None, search_all=False, recursive=False):
+#####################################################################################################
+# Post lookup to the server as json
+# Return the json answer, or raise the error message of the server
+#####################################################################################################
+  request = {'identifiers': sorted(identifiers), 'extension': extension, 'search_path': os.path.abspath(search_path),
+             'claim_tag': claim_tag, 'search_all': bool(search_all), 'recursive': bool(recursive)}
+  http_request = urllib.request.Request('http://' + server + '/claims', data=json.dumps(request).encode('utf-8'),
+                                        headers={'Content-Type': 'application/json'})
+  try:
+    with urllib.request.urlopen(http_request, timeout=server_timeout) as http_response:
+      response = json.loads(http_response.read())
+  except urllib.error.HTTPError as error:
+    try:
+      message = json.loads(error.read())['error']
+    except (ValueError, KeyError):
+      message = str(error)
+    raise OSError(message)
+#####################################################################################################
+# Return variable
+#####################################################################################################
+  return response
+############################## end of requestClaims() function ######################################
+#####################################################################################################
+
+
+#####################################################################################################
+#
+# Function Name:    extractFromServer()
+#
+# Description:      Server version of extractFromFiles(). Asks a running getIndentedClmServer.py for the
+#                   claims and writes them out the same way, so no file is read by this process.
+#
+# Arguments:        input - set identifiers            - Unique identifiers to search for to find claims
+#                   input - string server              - host:port of the lookup server
+#                   input - string extension           - Filetype extension to search for
+#                   input - string search_path         - Full path to directory that is to be searched for file
+#                   input - string claim_tag           - Element name of a claim (Default = None)
+#                   input - string combined_outputname - filename to write all claims to (Default = None)
+#                   input - bool search_all            - Search every file with the extension, not only the first
+#                   input - bool recursive             - Also search files in subdirectories of search_path
+#
+# Return Variable:  output - dict matches - number of claims found for each identifier that was found, or
+#                            None if the server could not answer
+#
+# Notes:            Server and parse errors are printed.
+#
+#####################################################################################################
+def extractFromServer(identifiers, server, extension, search_path, claim_tag=None, combined_outputname=None,
+                      search_all=False, recursive=False):
+#####################################################################################################
+# Request claims from the server
+# Print parse errors and write claims
+# Return number of claims found for each identifier
+#####################################################################################################
+  matches = None
+  try:
+    server_start = time.perf_counter()
+    response = requestClaims(identifiers, server, extension, search_path, claim_tag, search_all, recursive)
+    timeStat('server', time.perf_counter() - server_start)
+    countStat('files_scanned', response['files'])
+    msg = 'Looked up ' + str(len(identifiers)) + ' unique identifiers in ' + str(response['files']) + ' ' + \
+          extension + ' files on server ' + server
+    print(msg)
+    for filepathname, error in response['errors']:
+      printParseErrorMsg(filepathname, error)
+    matches = writeClaims(response['claims'], combined_outputname)
+  except (OSError, ValueError, KeyError) as error:
+    printServerErrorMsg(server, error)
+#####################################################################################################
+# Return variable
+#####################################################################################################
+  return matches
+############################## end of extractFromServer() function ##################################
+#####################################################################################################
+
+
+#####################################################################################################
+#
+# Function Name:    locateInFile()
+#
+# Description:      Streams one raw xml file and collects which of the unique identifiers are in any
+#                   of its claims, without formatting the claims. This is the unit of work given to each
+#                   process by locateIdentifiers().
+#
+# Arguments:        input - set identifiers     - Unique identifiers to search for
+#                   input - string filepathname - filepath and name for raw xml file to search
+#                   input - string claim_tag    - Element name of a claim (Default = None)
+#                   input - bool prefilter      - Try prefilterFile() before parsing the whole file
+#                   input - string checkpoint_path - Checkpoint to resume the scan from and save progress to
+#                                                 (Default = None)
+#
+# Return Variable:  output - (set found, string error) - identifiers found in the file, and the parse
+#                            error message if the file is not well-formed (None otherwise)
+#
+# Notes:            Identifiers found before a parse error are still returned.
+#
+#####################################################################################################
+def locateInFile(identifiers, filepathname, claim_tag=None, prefilter=False, checkpoint_path=None):
+#####################################################################################################
+# Try prefilter fast path if asked to
+# Otherwise stream claims from raw file and collect identifiers in them
+# Return identifiers found and parse error
+#####################################################################################################
+  found = None
+  error = None
+  if prefilter:
+    file_matches = prefilterFile(identifiers, filepathname, claim_tag)
+    if file_matches is not None:
+      found = set()
+      for claim_found, claim_text in file_matches:
+        found.update(claim_found)
+  if found is None:
+    found = set()
+    try:
+      for claim, claim_found, start, end in iterCheckpointedClaims(identifiers, filepathname, claim_tag, None,
+                                                                   checkpoint_path, read_claims=False):
+        found.update(claim_found)
+    except (expat.ExpatError, OSError, EOFError, lzma.LZMAError, sqlite3.Error) as parse_error:
+      error = str(parse_error)
+#####################################################################################################
+# Return variable
+#####################################################################################################
+  return found, error
+############################## end of locateInFile() function #######################################
+#####################################################################################################
+
+
+#####################################################################################################
+#
+# Function Name:    locateIdentifiers()
+#
+# Description:      Finds every file containing each of the unique identifiers, either through the
+#                   claim index or by scanning the files in a pool of processes. No claims are written.
+#
+# Arguments:        input - set identifiers        - Unique identifiers to search for
+#                   input - string[] filepathnames - filepaths and names for raw xml files to search
+#                   input - string claim_tag       - Element name of a claim (Default = None)
+#                   input - string index_path      - Claim index to look identifiers up in (Default = None)
+#                   input - int processes          - Number of files to scan at the same time (Default = 1)
+#                   input - bool prefilter         - Use the prefilter fast path when scanning (Default = False)
+#                   input - string checkpoint_path - Checkpoint to resume scans from and save progress to, so
+#                                                    unchanged files are not scanned again (Default = None)
+#
+# Return Variable:  output - (dict locations, list errors) - filepathnames containing each identifier that
+#                            was found, in the order of filepathnames, and (filepathname, parse error
+#                            message) for each file that failed to scan
+#
+# Notes:            Unlike searchFiles(), every file is searched even after all identifiers have been
+#                   found, so every file containing an identifier is listed. Indexing errors are raised
+#                   to the caller, files that fail to index are printed by refreshIndex().
+#
+#####################################################################################################
+def locateIdentifiers(identifiers, filepathnames, claim_tag=None, index_path=None, processes=1, prefilter=False,
+                      checkpoint_path=None):
+#####################################################################################################
+# Look identifiers up in the index if one is given
+# Otherwise scan files in a process pool, or in this process for a single file
+# Return files for each identifier and parse errors
+#####################################################################################################
+  locations = {}
+  errors = []
+  if index_path:
+    connection = openIndex(index_path)
+    try:
+      refreshIndex(connection, filepathnames, claim_tag)
+      file_order = dict((os.path.abspath(filepathname), order) for order, filepathname in enumerate(filepathnames))
+      connection.execute('CREATE TEMP TABLE IF NOT EXISTS lookup (identifier TEXT PRIMARY KEY)')
+      connection.execute('DELETE FROM lookup')
+      connection.executemany('INSERT OR IGNORE INTO lookup VALUES (?)', ((identifier,) for identifier in identifiers))
+      rows = connection.execute('''SELECT DISTINCT claims.identifier, files.path
+                                   FROM lookup
+                                   JOIN claims ON claims.identifier = lookup.identifier
+                                   JOIN files ON files.file_id = claims.file_id''')
+      for identifier, path in rows:
+        if path in file_order:
+          locations.setdefault(identifier, []).append(file_order[path])
+    finally:
+      connection.close()
+    for identifier, orders in locations.items():
+      locations[identifier] = [filepathnames[order] for order in sorted(orders)]
+  else:
+    pool = None
+    if checkpoint_path:
+      openCheckpoint(checkpoint_path, checkpointKey(identifiers, claim_tag, None, 'locate')).close()
+    locate = functools.partial(locateInFile, identifiers, claim_tag=claim_tag, prefilter=prefilter,
+                               checkpoint_path=checkpoint_path)
+    try:
+      if processes > 1 and len(filepathnames) > 1:
+        pool = multiprocessing.Pool(min(processes, len(filepathnames)))
+        results = pool.imap(locate, filepathnames)
+      else:
+        results = map(locate, filepathnames)
+      for filepathname, (found, error) in zip(filepathnames, results):
+        if error is not None:
+          errors.append((filepathname, error))
+        for identifier in found:
+          locations.setdefault(identifier, []).append(filepathname)
+    finally:
+      if pool is not None:
+        pool.terminate()
+        pool.join()
+#####################################################################################################
+# Return variable
+#####################################################################################################
+  return locations, errors
+############################## end of locateIdentifiers() function ##################################
+#####################################################################################################
+
+
+#####################################################################################################
+#
+# Print Functions 
+#
+#####################################################################################################
+def printResult(return_code):
+  if return_code == iSuccess:
+    print('Done!')
+  else:
+    print('Program failed!')
+
+def printNoIdentifierMsg():
+  noIdentifierMsg = ['Error occured\n',
+                     'No unique identifier included to search claim for.']
+  noIdentifierMsg = ''.join(noIdentifierMsg)
+  print(noIdentifierMsg)
+
+def printFileNotFoundMsg(extension, search_path):
+  fileNotFoundMsg = ['Error occured\n',
+                     extension, ' file not found in ', search_path]
+  fileNotFoundMsg = ''.join(fileNotFoundMsg)
+  print(fileNotFoundMsg)
+
+def printInvalidSearchPathMsg(search_path):
+  invalidSearchPathMsg = ['Error occured\n',
+                          'Search path ', search_path, ' for file does not exist.\n',
+                          'Please verify search path.']
+  invalidSearchPathMsg = ''.join(invalidSearchPathMsg)
+  print(invalidSearchPathMsg)
+
+def printIdentifierNotFoundMsg(identifier, search_path):
+  identifierNotFoundMsg = ['Identifier ', identifier, ' not found in search path ', search_path]
+  identifierNotFoundMsg = ''.join(identifierNotFoundMsg)
+  print(identifierNotFoundMsg)
+
+def printInvalidIdentifiersFileMsg(ids_filename):
+  invalidIdentifiersFileMsg = ['Error occured\n',
+                               'Identifiers file ', ids_filename, ' does not exist.\n',
+                               'Please verify path to identifiers file.']
+  invalidIdentifiersFileMsg = ''.join(invalidIdentifiersFileMsg)
+  print(invalidIdentifiersFileMsg)
+
+def printBatchSummaryMsg(identifier_count, missing):
+  batchSummaryMsg = ['Found ', str(identifier_count - len(missing)), ' of ', str(identifier_count),
+                     ' unique identifiers. ', str(len(missing)), ' not found.']
+  if missing:
+    batchSummaryMsg += ['\nIdentifiers not found:\n',
+                        '######################################################\n',
+                        '\n'.join(missing), '\n',
+                        '######################################################']
+  batchSummaryMsg = ''.join(batchSummaryMsg)
+  print(batchSummaryMsg)
+
+def printSelectSummaryMsg(selected, combined_outputname):
+  selectSummaryMsg = ['Found ', str(selected), ' claims matching the selector.']
+  if selected:
+    selectSummaryMsg += [' Claims written to ', 'standard output' if combined_outputname == '-' else combined_outputname]
+  selectSummaryMsg = ''.join(selectSummaryMsg)
+  print(selectSummaryMsg)
+
+def printInvalidSelectorMsg(error):
+  invalidSelectorMsg = ['Error occured\n',
+                        'Invalid selector: ', str(error), '\n',
+                        'Please verify the selector, e.g. "Provider/@npi = 1234567890 AND //ServiceDate in 2024-01-01..2024-03-31".']
+  invalidSelectorMsg = ''.join(invalidSelectorMsg)
+  print(invalidSelectorMsg)
+
+def printIndexErrorMsg(index_path, error):
+  indexErrorMsg = ['Error occured\n',
+                   'Unable to use claim index ', str(index_path), ': ', str(error), '\n',
+                   'Please verify the index path, or remove the index file to rebuild it.']
+  indexErrorMsg = ''.join(indexErrorMsg)
+  print(indexErrorMsg)
+
+def printInvalidIndexFieldsMsg(error):
+  invalidIndexFieldsMsg = ['Error occured\n',
+                           'Invalid index fields: ', str(error), '\n',
+                           'Please verify --index-fields, e.g. "@icn,//ICN".']
+  invalidIndexFieldsMsg = ''.join(invalidIndexFieldsMsg)
+  print(invalidIndexFieldsMsg)
+
+def printCheckpointErrorMsg(checkpoint_path, error):
+  checkpointErrorMsg = ['Error occured\n',
+                        'Unable to use checkpoint ', str(checkpoint_path), ': ', str(error), '\n',
+                        'Please verify the checkpoint path, or run without --resume to start over.']
+  checkpointErrorMsg = ''.join(checkpointErrorMsg)
+  print(checkpointErrorMsg)
+
+def printServerErrorMsg(server, error):
+  serverErrorMsg = ['Error occured\n',
+                    'Unable to look up claims on server ', server, ': ', str(error), '\n',
+                    'Please verify getIndentedClmServer.py is running.']
+  serverErrorMsg = ''.join(serverErrorMsg)
+  print(serverErrorMsg)
+
+def printStatsMsg(report):
+  statsMsg = ['Run stats (', str(report['total_seconds']), ' seconds']
+  if 'peak_rss_mb' in report:
+    statsMsg += [', peak memory ', str(report['peak_rss_mb']), ' MB']
+  statsMsg.append('):')
+  for name, seconds in report['seconds'].items():
+    statsMsg += ['\n  ', name.ljust(16), '%.3f' % seconds, ' s']
+  for name, amount in report['counters'].items():
+    statsMsg += ['\n  ', name.ljust(16), str(amount)]
+  statsMsg = ''.join(statsMsg)
+  print(statsMsg)
+
+def printProfileMsg(profile_filename):
+  profileMsg = ['Profile saved to ', profile_filename, '\n',
+                'View it with: python -m pstats ', profile_filename]
+  profileMsg = ''.join(profileMsg)
+  print(profileMsg)
+
+def printParseErrorMsg(filepathname, error):
+  parseErrorMsg = ['Error occured\n',
+                   'Unable to parse ', filepathname, ': ', str(error), '\n',
+                   'Please verify the file is well-formed xml.']
+  parseErrorMsg = ''.join(parseErrorMsg)
+  print(parseErrorMsg)
+############################## end of print messages ################################################
+#####################################################################################################
+
+
+#####################################################################################################
+# Execute only if program was called as a script, not if it was imported
+#####################################################################################################
+# Initialize program by getting identifier, extension and search_path
+# Fetches options from init() function
+# Clear terminal, or with --stdout keep standard output for the claims and print messages to standard error
+# Execute mainBuildIndex() if the user asks to build the claim index
+# Execute mainBatch() if an identifiers file is provided by the user
+# Otherwise execute main() if identifier is provided by the user
+# Otherwise execute mainSelect() if only a selector is provided by the user
+# Save profile and report stats if asked for
+#####################################################################################################
+if __name__ == '__main__':
+  options = init()
+  outputname = options.outputname
+  if options.stdout:
+    outputname = '-'
+    claim_stdout = sys.stdout
+    sys.stdout = sys.stderr
+  else:
+    os.system('cls' if os.name == 'nt' else 'clear')
+  if options.identifier:
+    identifier = options.identifier
+  if options.extension:
+    extension = options.extension
+  if options.folder:
+    search_path = os.path.join(search_path, options.folder)
+  elif options.search_path:
+    search_path = options.search_path
+  if options.claim_tag:
+    claim_tag = options.claim_tag
+  if options.processes:
+    processes = options.processes
+  index_fields_error = None
+  if options.index_fields:
+    try:
+      index_fields = parseIndexFields(options.index_fields)['text']
+    except ValueError as error:
+      index_fields_error = error
+  if options.stats or options.stats_filename:
+    startStats()
+  profiler = None
+  if options.profile_filename:
+    profiler = cProfile.Profile()
+    profiler.enable()
+  run_checkpoint = None
+  if options.resume or options.checkpoint_path:
+    run_checkpoint = options.checkpoint_path or checkpoint_path
+  selector = None
+  selector_error = None
+  server = options.server
+  if options.selector:
+    try:
+      selector = parseSelector(options.selector)
+      server = None
+    except ValueError as error:
+      selector_error = error
+  
+  if run_checkpoint and not options.resume and not options.build_index:
+    try:
+      clearCheckpoint(run_checkpoint)
+    except sqlite3.Error as error:
+      printCheckpointErrorMsg(run_checkpoint, error)
+      run_checkpoint = None
+  
+  if index_fields_error is not None:
+    printInvalidIndexFieldsMsg(index_fields_error)
+    printResult(iFailure)
+  elif options.build_index:
+    ret = mainBuildIndex(extension, search_path, claim_tag, options.index_path or index_path, options.recursive)
+    printResult(ret)
+  elif selector_error is not None:
+    printInvalidSelectorMsg(selector_error)
+    printResult(iFailure)
+  elif options.ids_file:
+    identifiers = readIdentifiersFile(options.ids_file)
+    if identifiers != '':
+      if identifier:
+        identifiers.add(identifier)
+      ret = mainBatch(identifiers, extension, search_path, claim_tag, outputname, options.index_path,
+                      options.search_all, options.recursive, processes, options.prefilter, server, selector,
+                      run_checkpoint)
+      printResult(ret)
+  elif identifier:
+    ret = main(identifier, extension, search_path, claim_tag, options.index_path,
+               options.search_all, options.recursive, processes, options.prefilter, server, selector,
+               run_checkpoint, outputname)
+    printResult(ret)
+  elif selector is not None:
+    ret = mainSelect(selector, extension, search_path, claim_tag, outputname or 'INDENT.select',
+                     options.search_all, options.recursive, processes, run_checkpoint)
+    printResult(ret)
+  else:
+    printNoIdentifierMsg()
+
+  if profiler is not None:
+    profiler.disable()
+    profiler.dump_stats(options.profile_filename)
+    printProfileMsg(options.profile_filename)
+  if run_stats is not None:
+    report = finishStats({'search_path': search_path, 'extension': extension, 'claim_tag': claim_tag,
+                          'processes': processes, 'prefilter': bool(options.prefilter),
+                          'index_path': options.index_path, 'index_fields': index_fields, 'server': server,
+                          'selector': options.selector, 'checkpoint_path': run_checkpoint,
+                          'resume': bool(options.resume),
+                          'chunk_size': chunk_size},
+                         options.stats_filename)
+    if options.stats:
+      printStatsMsg(report)
 #####################################################################################################
 ############################## end of getIndentedClmXml.py program ##################################
 #####################################################################################################
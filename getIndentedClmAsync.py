@@ -0,0 +1,853 @@
+#!/usr/bin/env python
+#####################################################################################################
+##  Usage:
+##  getIndentedClmAsync.py (--p <root path>) (--port <port>) (--j <concurrent scans>)
+##  getIndentedClmAsync.py --connect localhost:<port> --ids-file <identifiers file> (--id <unique_identifier>)
+##                         (--p <search path>) (--x <extension>) (--t <claim element name>) (--a) (--r)
+##
+##  File ID:      getIndentedClmAsync.py
+##
+##  Description:  Concurrent lookup front end for getIndentedClm.py. The server accepts any number of
+##                lookup requests at once on a localhost socket, one json request per line. Requests
+##                for the same file that arrive while a scan of that file is waiting to start are
+##                merged into that one scan, at most --j file scans run at the same time, and every
+##                claim is sent back to the requests it belongs to as soon as it is read.
+##                Scans run in --j worker processes, which send each claim back to the server as soon
+##                as it is read.
+##                With --connect, all identifiers are sent as one request to a running server, which
+##                scans each file once for all of them, and each claim is written to
+##                INDENT.<identifier> as soon as it arrives. The files are renamed into place once the
+##                lookup is done.
+##
+##  Outputs:      Request:  {"request": id, "identifiers": [...], "search_path": path, "extension": ext,
+##                           "claim_tag": tag, "search_all": bool, "recursive": bool}
+##                Replies:  {"request": id, "file": path, "found": [...], "claim": indented claim}
+##                          for every claim found, then
+##                          {"request": id, "done": true, "missing": [...], "errors": [[path, error], ...]}
+##                          or {"request": id, "done": true, "error": message}
+##
+##  Notes:        Every file of a request is searched, even after all of its identifiers were found,
+##                since the same scan answers other requests. Only paths inside of the root path (--p,
+##                default the getIndentedClm.py search path) are looked up.
+##                Claims from different files of a request are sent in the order the scans find them,
+##                not in file order.
+##
+#####################################################################################################
+##
+##                        Modification Log
+##
+##  Author              Version     Date           Comments
+##
+#####################################################################################################
+
+#####################################################################################################
+# Set up (Import libraries and set defaults for variables
+#####################################################################################################
+import asyncio
+import concurrent.futures
+import itertools
+import json
+import lzma
+import multiprocessing
+import os
+import signal
+import threading
+from optparse import OptionParser
+from xml.parsers import expat
+import getIndentedClm
+root_path = getIndentedClm.search_path
+host = '127.0.0.1'
+port = 8766
+max_scans = os.cpu_count() or 1
+merge_delay = 0.05
+line_limit = 64 * 1024 * 1024
+reply_timeout = 60
+queue_size = 1000
+scan_counter = itertools.count(1)
+scan_queue = None
+iSuccess = 0
+iFailure = 1
+############################## end of set up ########################################################
+#####################################################################################################
+
+
+#####################################################################################################
+#
+# Function Name:    main()
+#
+# Description:      This is the main function of the server. It answers lookup requests on localhost
+#                   until the server is stopped.
+#
+# Arguments:        input - string root_path  - Full path to the directory lookups are allowed in
+#                   input - int port          - Port to listen on
+#                   input - int max_scans     - Most file scans to run at the same time
+#
+# Return Codes:     0 - iSuccess - The function executed successfully.
+#                   1 - iFailure - The function did not execute successfully.
+#
+# Notes:            Stops on Ctrl-C.
+#
+#####################################################################################################
+def main(root_path, port, max_scans):
+#####################################################################################################
+# Initialize Return Code.
+# Check root path
+# Run the server until interrupted
+# Return iRc.
+#####################################################################################################
+  iRc = iFailure
+  if not os.path.isdir(root_path):
+    getIndentedClm.printInvalidSearchPathMsg(root_path)
+  else:
+    try:
+      asyncio.run(serveLookups(os.path.abspath(root_path), port, max_scans))
+      iRc = iSuccess
+    except KeyboardInterrupt:
+      iRc = iSuccess
+    except OSError as error:
+      printServeErrorMsg(port, error)
+#####################################################################################################
+# Return code of the function
+#####################################################################################################
+  return iRc
+############################## end of main() function ###############################################
+#####################################################################################################
+
+
+#####################################################################################################
+#
+# Function Name:    mainConnect()
+#
+# Description:      Client version of getIndentedClm.py mainBatch(). Sends the identifiers as one
+#                   request to a running server and writes each claim as soon as it arrives.
+#
+# Arguments:        input - set identifiers         - Unique identifiers to search for to find claims
+#                   input - string server           - host:port of the server
+#                   input - string extension        - Filetype extension to search for
+#                   input - string search_path      - Full path to directory that is to be searched for file
+#                   input - string claim_tag        - Element name of a claim (Default = None)
+#                   input - bool search_all         - Search every file with the extension, not only the first
+#                   input - bool recursive          - Also search files in subdirectories of search_path
+#
+# Return Codes:     0 - iSuccess - Every identifier was found.
+#                   1 - iFailure - The function did not execute successfully, or identifiers were missing.
+#
+# Notes:            None.
+#
+#####################################################################################################
+def mainConnect(identifiers, server, extension, search_path, claim_tag=None, search_all=False, recursive=False):
+#####################################################################################################
+# Initialize Return Code.
+# Send requests and write claims as they arrive
+# Print summary of identifiers not found
+# Return iRc.
+#####################################################################################################
+  iRc = iFailure
+  try:
+    matches = asyncio.run(requestLookups(identifiers, server, extension, search_path, claim_tag, search_all,
+                                         recursive))
+    missing = sorted(identifiers.difference(matches))
+    getIndentedClm.printBatchSummaryMsg(len(identifiers), missing)
+    if not missing:
+      iRc = iSuccess
+  except (OSError, ValueError) as error:
+    getIndentedClm.printServerErrorMsg(server, error)
+#####################################################################################################
+# Return code of the function
+#####################################################################################################
+  return iRc
+############################## end of mainConnect() function ########################################
+#####################################################################################################
+
+
+#####################################################################################################
+#
+# Function Definitions
+#
+#####################################################################################################
+#####################################################################################################
+#
+# Function Name:    init()
+#
+# Description:      Create and use parser to fetch command argument options.
+#
+# Arguments:        N/A
+#
+# Returned Data:    output - string options.search_path - root path for the server, search path for --connect
+#                   output - int options.port           - port to listen on
+#                   output - int options.max_scans      - most file scans to run at the same time
+#                   output - string options.server      - host:port of the server to send lookups to
+#                   output - string options.identifier  - unique identifier to look up
+#                   output - string options.ids_file    - file with one unique identifier per line
+#                   output - string options.extension   - Filetype extension to search for
+#                   output - string options.claim_tag   - Element name of a claim
+#                   output - bool options.search_all    - Search every file with the extension
+#                   output - bool options.recursive     - Also search subdirectories
+#
+# Notes:            None.
+#
+#####################################################################################################
+def init():
+#####################################################################################################
+# Setup parser for command line arugments
+# Fetch and return data from parser
+#####################################################################################################
+  parser = OptionParser()
+  parser.add_option('--p', '--path',                  dest='search_path',
+                    help='set directory lookups are allowed in, or with --connect the search path. default: ' + root_path)
+  parser.add_option('--port',                         dest='port', type='int',
+                    help='set localhost port to listen on. default: 8766')
+  parser.add_option('--j', '--scans',                 dest='max_scans', type='int',
+                    help='set most file scans to run at the same time. default: number of cpus')
+  parser.add_option('--connect',                      dest='server',
+                    help='send lookups to the server running on host:port instead of serving, e.g. localhost:8766')
+  parser.add_option('--id', '--identifier',           dest='identifier',
+                    help='input for unique identifier to look up with --connect')
+  parser.add_option('--ids-file',                     dest='ids_file',
+                    help='input file with one unique identifier per line to look up with --connect')
+  parser.add_option('--x', '--ext', '--extension',    dest='extension',
+                    help='set extension of file to search for with --connect. default: .xml')
+  parser.add_option('--t', '--tag',                   dest='claim_tag',
+                    help='set element name of a claim with --connect. default: every child of the root element')
+  parser.add_option('--a', '--all',                   dest='search_all', action='store_true',
+                    help='search every file with the extension in the search path with --connect')
+  parser.add_option('--r', '--recursive',             dest='recursive', action='store_true',
+                    help='also search files in subdirectories of the search path with --connect. implies --a')
+  # get and set command line arugments into local variables using parser
+  options, args = parser.parse_args()
+#####################################################################################################
+# Return variable from function
+#####################################################################################################
+  return options
+############################## end of init() function ###############################################
+#####################################################################################################
+
+
+#####################################################################################################
+#
+# Function Name:    serveLookups()
+#
+# Description:      Creates the shared state of the server and accepts connections on localhost.
+#
+# Arguments:        input - string root_path  - Full path to the directory lookups are allowed in
+#                   input - int port          - Port to listen on
+#                   input - int max_scans     - Most file scans to run at the same time
+#
+# Return Variable:  N/A
+#
+# Notes:            Scans run in a pool of max_scans processes, so files are parsed in parallel while the
+#                   event loop keeps reading requests and sending claims. The workers put the claims
+#                   they find on a queue that a thread of the server hands to the event loop.
+#                   The workers are started from a fork server, not forked from the server itself, so
+#                   they do not hold the sockets of the clients connected at the time open.
+#
+#####################################################################################################
+async def serveLookups(root_path, port, max_scans):
+#####################################################################################################
+# Create shared state with the pending and running scans, scan limit, process pool and claim queue
+# Start thread that hands claims from the workers to the event loop
+# Accept connections until cancelled
+#####################################################################################################
+  loop = asyncio.get_running_loop()
+  context = multiprocessing.get_context('forkserver')
+  claim_queue = context.Queue(queue_size)
+  state = {'root': root_path, 'pending': {}, 'running': {}, 'semaphore': asyncio.Semaphore(max_scans),
+           'max_scans': max_scans, 'queue': claim_queue, 'context': context,
+           'executor': concurrent.futures.ProcessPoolExecutor(max_scans, mp_context=context, initializer=initScanWorker,
+                                                              initargs=(claim_queue,))}
+  reader_thread = threading.Thread(target=readScanQueue, args=(state, loop, claim_queue), daemon=True)
+  reader_thread.start()
+  server = await asyncio.start_server(lambda reader, writer: handleConnection(state, reader, writer),
+                                      host, port, limit=line_limit)
+  printServingMsg(root_path, port, max_scans)
+  try:
+    async with server:
+      await server.serve_forever()
+  finally:
+    state['executor'].shutdown(wait=False, cancel_futures=True)
+    claim_queue.put(None)
+############################## end of serveLookups() function #######################################
+#####################################################################################################
+
+
+#####################################################################################################
+#
+# Function Name:    handleConnection()
+#
+# Description:      Reads lookup requests from one connection, one json request per line, and starts
+#                   each of them as a task without waiting for the ones before it.
+#
+# Arguments:        input - dict state           - shared state created by serveLookups()
+#                   input - StreamReader reader  - connection to read requests from
+#                   input - StreamWriter writer  - connection to send replies to
+#
+# Return Variable:  N/A
+#
+# Notes:            The connection is closed once the client stops sending and every request on it is done.
+#
+#####################################################################################################
+async def handleConnection(state, reader, writer):
+#####################################################################################################
+# Read requests line by line and start each lookup
+# Wait for outstanding lookups when the client is done sending
+#####################################################################################################
+  connection = {'writer': writer, 'open_requests': 0, 'idle': asyncio.Event()}
+  connection['idle'].set()
+  try:
+    line = await reader.readline()
+    while line:
+      try:
+        request = json.loads(line)
+        lookup = {'request': request.get('request'), 'connection': connection,
+                  'identifiers': set(request.get('identifiers', [])), 'found': set(), 'errors': [],
+                  'files_left': 0}
+        connection['open_requests'] += 1
+        connection['idle'].clear()
+        asyncio.ensure_future(startLookup(state, lookup, request))
+      except (ValueError, TypeError, AttributeError) as error:
+        await sendReply(connection, {'request': None, 'done': True, 'error': 'Invalid request: ' + str(error)})
+      await writer.drain()
+      line = await reader.readline()
+    await connection['idle'].wait()
+    await writer.drain()
+  except (ConnectionError, asyncio.IncompleteReadError, asyncio.LimitOverrunError):
+    pass
+  finally:
+    writer.close()
+############################## end of handleConnection() function ###################################
+#####################################################################################################
+
+
+#####################################################################################################
+#
+# Function Name:    startLookup()
+#
+# Description:      Finds the files of a lookup request and adds the request to a pending scan of each
+#                   file, creating the scan if there is no pending scan of the file yet.
+#
+# Arguments:        input - dict state       - shared state created by serveLookups()
+#                   input - dict lookup      - lookup of the request, counted as open on its connection
+#                   input - dict request     - lookup request read from the connection
+#
+# Return Variable:  N/A
+#
+# Notes:            A request without files or outside of the root path is answered at once. The files
+#                   are listed in a thread, so the event loop is not held up by a large directory. A
+#                   request that cannot be started for any other reason is answered with the error.
+#
+#####################################################################################################
+async def startLookup(state, lookup, request):
+#####################################################################################################
+# Check search path and find files the same way getIndentedClm.py does
+# Join the pending scan of each file, or create it
+# Answer and release the request if it was not started
+#####################################################################################################
+  connection = lookup['connection']
+  started = False
+  error = 'Lookup was stopped before it started.'
+  try:
+    search_path = os.path.abspath(request.get('search_path') or state['root'])
+    if os.path.commonpath([search_path, state['root']]) != state['root']:
+      error = 'Search path ' + search_path + ' is not inside of ' + state['root']
+    else:
+      filenames = await asyncio.get_running_loop().run_in_executor(
+        None, findLookupFiles, search_path, request.get('extension') or getIndentedClm.extension,
+        request.get('search_all', False), request.get('recursive', False))
+      if filenames is None:
+        error = 'Search path ' + search_path + ' for file does not exist.'
+      else:
+        for filename in filenames:
+          key = (os.path.join(search_path, filename), request.get('claim_tag'))
+          scan = state['pending'].get(key)
+          if scan is None:
+            scan = {'filepathname': key[0], 'claim_tag': key[1], 'subscribers': {}, 'lookups': []}
+            state['pending'][key] = scan
+            asyncio.ensure_future(runScan(state, key, scan))
+          scan['lookups'].append(lookup)
+          for identifier in lookup['identifiers']:
+            scan['subscribers'].setdefault(identifier, []).append(lookup)
+        lookup['files_left'] = len(filenames)
+        started = True
+        if not filenames:
+          await finishLookup(lookup)
+  except Exception as lookup_error:
+    error = 'Unable to start lookup: ' + type(lookup_error).__name__ + ': ' + str(lookup_error)
+  finally:
+    if not started:
+      await sendReply(connection, {'request': lookup['request'], 'done': True, 'error': error})
+      closeRequest(connection)
+############################## end of startLookup() function ########################################
+#####################################################################################################
+
+
+#####################################################################################################
+#
+# Function Name:    findLookupFiles()
+#
+# Description:      Lists the files of a lookup the same way getIndentedClm.py does. Runs in a thread.
+#
+# Arguments:        input - string search_path  - Full path to directory that is to be searched for file
+#                   input - string extension    - Filetype extension to search for
+#                   input - bool search_all     - Search every file with the extension, not only the first
+#                   input - bool recursive      - Also search files in subdirectories of search_path
+#
+# Return Variable:  output - string[] filenames - files found, relative to search_path, or None if the
+#                            search path does not exist
+#
+# Notes:            None.
+#
+#####################################################################################################
+def findLookupFiles(search_path, extension, search_all=False, recursive=False):
+#####################################################################################################
+# Read directory and pick the first file, or every file
+#####################################################################################################
+  filenames = None
+  if os.path.isdir(search_path):
+    files = getIndentedClm.readFilesFromSearchPath(search_path, recursive)
+    if search_all or recursive:
+      filenames = getIndentedClm.lookForFiles(files, extension, search_path)
+    else:
+      filename = getIndentedClm.lookForFile(files, extension, search_path)
+      filenames = [filename] if filename != '' else []
+#####################################################################################################
+# Return variable
+#####################################################################################################
+  return filenames
+############################## end of findLookupFiles() function ####################################
+#####################################################################################################
+
+
+#####################################################################################################
+#
+# Function Name:    runScan()
+#
+# Description:      Waits for a free scan slot, then scans the file once for the identifiers of every
+#                   lookup that joined the scan, and finishes the lookups when the file is done.
+#
+# Arguments:        input - dict state  - shared state created by serveLookups()
+#                   input - tuple key   - (filepathname, claim_tag) of the scan
+#                   input - dict scan   - pending scan of the file
+#
+# Return Variable:  N/A
+#
+# Notes:            Lookups keep joining the scan until it leaves the pending scans, right before it
+#                   starts, so a burst of requests for a busy file is answered by a single scan.
+#                   The scan is done when its 'done' message arrives after all of its claims, not when
+#                   the worker returns, so no claim is sent after its lookups are finished.
+#
+#####################################################################################################
+async def runScan(state, key, scan):
+#####################################################################################################
+# Give other requests for the file a moment to join, then wait for a free slot
+# Stop accepting lookups and scan the file in the process pool
+# Wait for the last claim of the scan, then finish every lookup of the scan
+#####################################################################################################
+  loop = asyncio.get_running_loop()
+  await asyncio.sleep(merge_delay)
+  async with state['semaphore']:
+    del state['pending'][key]
+    scan_id = next(scan_counter)
+    scan['done'] = loop.create_future()
+    state['running'][scan_id] = scan
+    executor = state['executor']
+    try:
+      await loop.run_in_executor(executor, scanForLookups, scan_id, scan['filepathname'],
+                                 scan['claim_tag'], sorted(scan['subscribers']))
+      error = await scan['done']
+    except concurrent.futures.process.BrokenProcessPool as scan_error:
+      # A worker died, replace the pool once so later scans still run
+      error = str(scan_error) or type(scan_error).__name__
+      if state['executor'] is executor:
+        executor.shutdown(wait=False, cancel_futures=True)
+        state['executor'] = concurrent.futures.ProcessPoolExecutor(state['max_scans'], mp_context=state['context'],
+                                                                   initializer=initScanWorker,
+                                                                   initargs=(state['queue'],))
+    except Exception as scan_error:
+      # Any other failure is reported to the lookups instead of leaving them open
+      error = str(scan_error) or type(scan_error).__name__
+    finally:
+      del state['running'][scan_id]
+  for lookup in scan['lookups']:
+    if error is not None:
+      lookup['errors'].append([scan['filepathname'], error])
+    lookup['files_left'] -= 1
+    if lookup['files_left'] == 0:
+      await finishLookup(lookup)
+############################## end of runScan() function ############################################
+#####################################################################################################
+
+
+#####################################################################################################
+#
+# Function Name:    initScanWorker()
+#
+# Description:      Sets up a scan worker process of the process pool.
+#
+# Arguments:        input - Queue claim_queue - queue to put the claims found on
+#
+# Return Variable:  N/A
+#
+# Notes:            Ctrl-C is ignored by the workers, the server stops them.
+#
+#####################################################################################################
+def initScanWorker(claim_queue):
+#####################################################################################################
+# Ignore Ctrl-C and keep the claim queue for scanForLookups()
+#####################################################################################################
+  global scan_queue
+  signal.signal(signal.SIGINT, signal.SIG_IGN)
+  scan_queue = claim_queue
+############################## end of initScanWorker() function #####################################
+#####################################################################################################
+
+
+#####################################################################################################
+#
+# Function Name:    scanForLookups()
+#
+# Description:      Streams one raw xml file and puts every claim containing one of the identifiers on
+#                   the claim queue as soon as it is read. Runs in a worker process.
+#
+# Arguments:        input - int scan_id          - number of the scan in the server
+#                   input - string filepathname  - filepath and name for raw xml file to search
+#                   input - string claim_tag     - Element name of a claim (Default = None)
+#                   input - list identifiers     - Unique identifiers of the lookups of the scan
+#
+# Return Variable:  N/A
+#
+# Notes:            Puts ('claim', scan_id, sorted identifiers found, indented claim) for every claim,
+#                   then always ('done', scan_id, parse error message or None) last.
+#
+#####################################################################################################
+def scanForLookups(scan_id, filepathname, claim_tag, identifiers):
+#####################################################################################################
+# Stream claims and queue the ones containing any identifier
+# Queue parse error, or any other error, as the end of the scan
+#####################################################################################################
+  error = None
+  identifiers = set(identifiers)
+  try:
+    for claim, values, start, end in getIndentedClm.iterClaims(filepathname, claim_tag):
+      found = identifiers.intersection(values)
+      if found:
+        scan_queue.put(('claim', scan_id, sorted(found), getIndentedClm.formatClaim(claim)))
+  except (expat.ExpatError, OSError, EOFError, lzma.LZMAError) as parse_error:
+    error = str(parse_error)
+  except Exception as scan_error:
+    error = type(scan_error).__name__ + ': ' + str(scan_error)
+  finally:
+    scan_queue.put(('done', scan_id, error))
+############################## end of scanForLookups() function #####################################
+#####################################################################################################
+
+
+#####################################################################################################
+#
+# Function Name:    readScanQueue()
+#
+# Description:      Takes the messages of the scan workers from the claim queue and hands each one to
+#                   the event loop, waiting for it to be sent. Runs in its own thread of the server.
+#
+# Arguments:        input - dict state          - shared state created by serveLookups()
+#                   input - EventLoop loop      - event loop of the server
+#                   input - Queue claim_queue   - queue the workers put claims on, None to stop
+#
+# Return Variable:  N/A
+#
+# Notes:            Messages are handled one at a time, in the order they were put on the queue. While a
+#                   client is slow to read its claims, the queue fills up and the scans wait for it,
+#                   instead of the claims piling up in the server.
+#
+#####################################################################################################
+def readScanQueue(state, loop, claim_queue):
+#####################################################################################################
+# Forward messages until told to stop or the loop is closed
+#####################################################################################################
+  message = claim_queue.get()
+  while message is not None and not loop.is_closed():
+    try:
+      asyncio.run_coroutine_threadsafe(handleScanMessage(state, message), loop).result()
+    except (RuntimeError, concurrent.futures.CancelledError):
+      # Loop closed or stopped while the message was handled
+      break
+    message = claim_queue.get()
+############################## end of readScanQueue() function ######################################
+#####################################################################################################
+
+
+#####################################################################################################
+#
+# Function Name:    handleScanMessage()
+#
+# Description:      Sends a claim from a scan worker to its lookups, or marks the scan done. Runs in the
+#                   event loop.
+#
+# Arguments:        input - dict state    - shared state created by serveLookups()
+#                   input - tuple message - message put on the claim queue by scanForLookups()
+#
+# Return Variable:  N/A
+#
+# Notes:            Messages of a scan that is no longer running are dropped.
+#
+#####################################################################################################
+async def handleScanMessage(state, message):
+#####################################################################################################
+# Dispatch claim, or set the result of the scan
+#####################################################################################################
+  scan = state['running'].get(message[1])
+  if scan is not None:
+    if message[0] == 'claim':
+      await dispatchClaim(scan, message[2], message[3])
+    elif not scan['done'].done():
+      scan['done'].set_result(message[2])
+############################## end of handleScanMessage() function ##################################
+#####################################################################################################
+
+
+#####################################################################################################
+#
+# Function Name:    dispatchClaim()
+#
+# Description:      Sends a claim found by a scan to every lookup of the scan that asked for one of the
+#                   identifiers in it. Runs in the event loop.
+#
+# Arguments:        input - dict scan           - scan that found the claim
+#                   input - list found          - sorted identifiers found in the claim
+#                   input - string claim_text   - indented claim
+#
+# Return Variable:  N/A
+#
+# Notes:            Each lookup is only told about its own identifiers.
+#
+#####################################################################################################
+async def dispatchClaim(scan, found, claim_text):
+#####################################################################################################
+# Group identifiers found by lookup and send the claim once to each lookup
+#####################################################################################################
+  lookups = {}
+  for identifier in found:
+    for lookup in scan['subscribers'][identifier]:
+      lookups.setdefault(id(lookup), (lookup, []))[1].append(identifier)
+  for lookup, lookup_found in lookups.values():
+    lookup['found'].update(lookup_found)
+    await sendReply(lookup['connection'], {'request': lookup['request'], 'file': scan['filepathname'],
+                                           'found': lookup_found, 'claim': claim_text})
+############################## end of dispatchClaim() function ######################################
+#####################################################################################################
+
+
+#####################################################################################################
+#
+# Function Name:    finishLookup()
+#
+# Description:      Sends the final reply of a lookup once all of its files are done.
+#
+# Arguments:        input - dict lookup - lookup that is done
+#
+# Return Variable:  N/A
+#
+# Notes:            None.
+#
+#####################################################################################################
+async def finishLookup(lookup):
+#####################################################################################################
+# Send identifiers not found and parse errors
+# Mark the connection idle if this was its last open request
+#####################################################################################################
+  connection = lookup['connection']
+  await sendReply(connection, {'request': lookup['request'], 'done': True,
+                               'missing': sorted(lookup['identifiers'].difference(lookup['found'])),
+                               'errors': lookup['errors']})
+  closeRequest(connection)
+############################## end of finishLookup() function #######################################
+#####################################################################################################
+
+
+#####################################################################################################
+#
+# Function Name:    closeRequest()
+#
+# Description:      Counts a request of a connection as answered.
+#
+# Arguments:        input - dict connection - connection the request came in on
+#
+# Return Variable:  N/A
+#
+# Notes:            None.
+#
+#####################################################################################################
+def closeRequest(connection):
+#####################################################################################################
+# Mark the connection idle if this was its last open request
+#####################################################################################################
+  connection['open_requests'] -= 1
+  if connection['open_requests'] == 0:
+    connection['idle'].set()
+############################## end of closeRequest() function #######################################
+#####################################################################################################
+
+
+#####################################################################################################
+#
+# Function Name:    sendReply()
+#
+# Description:      Writes one json reply line to a connection, unless the client has gone away, and
+#                   waits until the connection can take more.
+#
+# Arguments:        input - dict connection  - connection to send the reply to
+#                   input - dict reply       - reply to send
+#
+# Return Variable:  N/A
+#
+# Notes:            Waiting for the client keeps the replies not yet read by it to the write buffer of
+#                   the connection. A client that reads nothing for reply_timeout seconds, or has gone
+#                   away, is disconnected and sent nothing more.
+#
+#####################################################################################################
+async def sendReply(connection, reply):
+#####################################################################################################
+# Write reply as a line of json
+# Wait for the client to read it, disconnect the client if it stopped reading
+#####################################################################################################
+  writer = connection['writer']
+  if not writer.is_closing():
+    writer.write(json.dumps(reply).encode('utf-8') + b'\n')
+    try:
+      await asyncio.wait_for(writer.drain(), reply_timeout)
+    except (ConnectionError, asyncio.TimeoutError):
+      writer.transport.abort()
+############################## end of sendReply() function ##########################################
+#####################################################################################################
+
+
+#####################################################################################################
+#
+# Function Name:    requestLookups()
+#
+# Description:      Sends the identifiers as one lookup request to the server, so each file is listed
+#                   and scanned once for all of them, and writes each claim to INDENT.<identifier> as
+#                   soon as it arrives.
+#
+# Arguments:        input - set identifiers     - Unique identifiers to search for to find claims
+#                   input - string server       - host:port of the server
+#                   input - string extension    - Filetype extension to search for
+#                   input - string search_path  - Full path to directory that is to be searched for file
+#                   input - string claim_tag    - Element name of a claim (Default = None)
+#                   input - bool search_all     - Search every file with the extension, not only the first
+#                   input - bool recursive      - Also search files in subdirectories of search_path
+#
+# Return Variable:  output - dict matches - number of claims found for each identifier that was found
+#
+# Notes:            Raises OSError if the server cannot be reached or refuses a lookup.
+#
+#####################################################################################################
+async def requestLookups(identifiers, server, extension, search_path, claim_tag=None, search_all=False,
+                         recursive=False):
+#####################################################################################################
+# Connect and send the request
+# Write claims as they arrive until the request is done
+# Rename the output files into place, or remove them if a lookup failed
+# Return number of claims found for each identifier
+#####################################################################################################
+  matches = {}
+  outputs = getIndentedClm.openOutputs()
+  server_host, server_port = server.rsplit(':', 1)
+  reader, writer = await asyncio.open_connection(server_host, int(server_port), limit=line_limit)
+  try:
+    request = {'request': 'lookup', 'identifiers': sorted(identifiers), 'search_path': os.path.abspath(search_path),
+               'extension': extension, 'claim_tag': claim_tag, 'search_all': bool(search_all),
+               'recursive': bool(recursive)}
+    writer.write(json.dumps(request).encode('utf-8') + b'\n')
+    await writer.drain()
+    open_requests = 1
+    while open_requests:
+      line = await reader.readline()
+      if not line:
+        raise OSError('Connection closed with ' + str(open_requests) + ' lookups open')
+      reply = json.loads(line)
+      if 'error' in reply:
+        raise OSError(reply['error'])
+      elif reply.get('done'):
+        for filepathname, error in reply['errors']:
+          getIndentedClm.printParseErrorMsg(filepathname, error)
+        open_requests -= 1
+      else:
+        for identifier in reply['found']:
+          matches[identifier] = matches.get(identifier, 0) + 1
+        getIndentedClm.writeClaimOutputs(reply['claim'], reply['found'], outputs)
+    getIndentedClm.closeOutputs(outputs, True)
+  finally:
+    writer.close()
+    getIndentedClm.closeOutputs(outputs, False)
+#####################################################################################################
+# Return variable
+#####################################################################################################
+  return matches
+############################## end of requestLookups() function #####################################
+#####################################################################################################
+
+
+#####################################################################################################
+#
+# Print Functions
+#
+#####################################################################################################
+def printResult(return_code):
+  if return_code == iSuccess:
+    print('Done!')
+  else:
+    print('Program failed!')
+
+def printServingMsg(root_path, port, max_scans):
+  servingMsg = ['Serving concurrent claim lookups for ', root_path, ' on ', host, ':', str(port),
+                ' with at most ', str(max_scans), ' scans at a time\n',
+                'Press Ctrl-C to stop.']
+  servingMsg = ''.join(servingMsg)
+  print(servingMsg, flush=True)
+
+def printServeErrorMsg(port, error):
+  serveErrorMsg = ['Error occured\n',
+                   'Unable to listen on ', host, ':', str(port), ': ', str(error), '\n',
+                   'Please verify the port is not already in use.']
+  serveErrorMsg = ''.join(serveErrorMsg)
+  print(serveErrorMsg)
+############################## end of print messages ################################################
+#####################################################################################################
+
+
+#####################################################################################################
+# Execute only if program was called as a script, not if it was imported
+#####################################################################################################
+# Initialize program by getting root path, port and scan limit, or the lookups to send
+# Fetches options from init() function
+# Execute mainConnect() if a server is provided by the user
+# Otherwise execute main() to serve lookups
+#####################################################################################################
+if __name__ == '__main__':
+  options = init()
+  if options.max_scans:
+    max_scans = options.max_scans
+  if options.port:
+    port = options.port
+
+  if options.server:
+    identifiers = set()
+    if options.ids_file:
+      identifiers = getIndentedClm.readIdentifiersFile(options.ids_file)
+    if options.identifier and identifiers != '':
+      identifiers.add(options.identifier)
+    if identifiers:
+      ret = mainConnect(identifiers, options.server, options.extension or getIndentedClm.extension,
+                        options.search_path or getIndentedClm.search_path, options.claim_tag,
+                        options.search_all, options.recursive)
+      printResult(ret)
+    elif identifiers != '':
+      getIndentedClm.printNoIdentifierMsg()
+  else:
+    if options.search_path:
+      root_path = options.search_path
+    ret = main(root_path, port, max_scans)
+    printResult(ret)
+#####################################################################################################
+############################## end of getIndentedClmAsync.py program ################################
+#####################################################################################################
@@ -0,0 +1,645 @@
+#!/usr/bin/env python
+#####################################################################################################
+##  Usage:
+##  getIndentedClmServer.py (--p <root path>) (--port <port>) (--c <cache size in MB>)
+##  getIndentedClm.py --server localhost:<port> --id <unique_identifier> (--p ...) (--f ...) ...
+##
+##  File ID:      getIndentedClmServer.py
+##
+##  Description:  Long running lookup server for getIndentedClm.py. Listens on localhost only, and keeps
+##                directory listings, the claim offsets of the identifiers looked up and recently
+##                extracted claims in memory, so repeated lookups do not walk the directories or parse
+##                the claim files again. getIndentedClm.py --server sends its lookups here instead of reading the
+##                files itself, and writes the same INDENT.<identifier> files.
+##
+##  Outputs:      POST /claims - JSON {"claims": [[file, [identifiers found], indented claim], ...],
+##                                     "errors": [[file, parse error], ...], "files": number of files}
+##                GET /stats   - JSON cache entries, size, limit, hits and misses
+##
+##  Notes:        Cached entries remember the size and modification time of the files and directories
+##                they were read from, and are dropped as soon as one of them changes. The least
+##                recently used entries are dropped when the cache is over --c MB.
+##                Only paths inside of the root path (--p, default the getIndentedClm.py search path)
+##                are looked up.
+##
+#####################################################################################################
+##
+##                        Modification Log
+##
+##  Author              Version     Date           Comments
+##
+#####################################################################################################
+
+#####################################################################################################
+# Set up (Import libraries and set defaults for variables
+#####################################################################################################
+import collections
+import json
+import lzma
+import os
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from optparse import OptionParser
+from xml.parsers import expat
+import getIndentedClm
+root_path = getIndentedClm.search_path
+host = '127.0.0.1'
+port = 8765
+cache_limit = 256 * 1024 * 1024
+offset_size = 100
+claim_cache = None
+iSuccess = 0
+iFailure = 1
+############################## end of set up ########################################################
+#####################################################################################################
+
+
+#####################################################################################################
+#
+# Function Name:    main()
+#
+# Description:      This is the main function that controls the processing. It creates the cache and
+#                   answers lookups on localhost until the server is stopped.
+#
+# Arguments:        input - string root_path  - Full path to the directory lookups are allowed in
+#                   input - int port          - Port to listen on
+#                   input - int cache_limit   - Most bytes to keep in the cache
+#
+# Return Codes:     0 - iSuccess - The function executed successfully.
+#                   1 - iFailure - The function did not execute successfully.
+#
+# Notes:            Stops on Ctrl-C.
+#
+#####################################################################################################
+def main(root_path, port, cache_limit):
+#####################################################################################################
+# Initialize Return Code.
+# Check root path
+# Create cache and serve lookups until interrupted
+# Return iRc.
+#####################################################################################################
+  global claim_cache
+  iRc = iFailure
+  if not os.path.isdir(root_path):
+    getIndentedClm.printInvalidSearchPathMsg(root_path)
+  else:
+    claim_cache = {'entries': collections.OrderedDict(), 'size': 0, 'limit': cache_limit,
+                   'root': os.path.abspath(root_path), 'hits': 0, 'misses': 0}
+    try:
+      server = HTTPServer((host, port), ClaimRequestHandler)
+    except OSError as error:
+      printServeErrorMsg(port, error)
+    else:
+      printServingMsg(claim_cache['root'], port)
+      try:
+        server.serve_forever()
+      except KeyboardInterrupt:
+        pass
+      finally:
+        server.server_close()
+      iRc = iSuccess
+#####################################################################################################
+# Return code of the function
+#####################################################################################################
+  return iRc
+############################## end of main() function ###############################################
+#####################################################################################################
+
+
+#####################################################################################################
+#
+# Function Definitions
+#
+#####################################################################################################
+#####################################################################################################
+#
+# Function Name:    init()
+#
+# Description:      Create and use parser to fetch command argument options.
+#
+# Arguments:        N/A
+#
+# Returned Data:    output - string options.root_path   - directory lookups are allowed in
+#                   output - int options.port           - port to listen on
+#                   output - int options.cache_size     - cache size in MB
+#
+# Notes:            None.
+#
+#####################################################################################################
+def init():
+#####################################################################################################
+# Setup parser for command line arugments
+# Fetch and return data from parser
+#####################################################################################################
+  parser = OptionParser()
+  parser.add_option('--p', '--path',                  dest='root_path',
+                    help='set directory lookups are allowed in, including subdirectories. default: ' + root_path)
+  parser.add_option('--port',                         dest='port', type='int',
+                    help='set localhost port to listen on. default: 8765')
+  parser.add_option('--c', '--cache-size',            dest='cache_size', type='int',
+                    help='set most MB of listings, claim offsets and claims to keep in memory. default: 256')
+  # get and set command line arugments into local variables using parser
+  options, args = parser.parse_args()
+#####################################################################################################
+# Return variable from function
+#####################################################################################################
+  return options
+############################## end of init() function ###############################################
+#####################################################################################################
+
+
+#####################################################################################################
+#
+# Function Name:    fileStamps()
+#
+# Description:      Reads the size and modification time of files or directories, to tell when a
+#                   cached entry read from them is out of date.
+#
+# Arguments:        input - string[] paths - files or directories a cached entry was read from
+#
+# Return Variable:  output - tuple stamps - (size, modification time in ns) of each path, or None for a
+#                            path that no longer exists
+#
+# Notes:            None.
+#
+#####################################################################################################
+def fileStamps(paths):
+#####################################################################################################
+# Stat every path
+#####################################################################################################
+  stamps = []
+  for path in paths:
+    try:
+      stat = os.stat(path)
+      stamps.append((stat.st_size, stat.st_mtime_ns))
+    except OSError:
+      stamps.append(None)
+#####################################################################################################
+# Return variable
+#####################################################################################################
+  return tuple(stamps)
+############################## end of fileStamps() function #########################################
+#####################################################################################################
+
+
+#####################################################################################################
+#
+# Function Name:    cacheGet()
+#
+# Description:      Returns a cached value if the files it was read from have not changed since, and
+#                   marks it as the most recently used.
+#
+# Arguments:        input - dict cache - claim cache created by main()
+#                   input - tuple key  - key of the cached value
+#
+# Return Variable:  output - value - cached value, or None if it is not cached or out of date
+#
+# Notes:            Out of date entries are dropped.
+#
+#####################################################################################################
+def cacheGet(cache, key):
+#####################################################################################################
+# Look entry up and check the stamps of its files
+# Drop it if they changed, otherwise move it to the most recently used end
+#####################################################################################################
+  value = None
+  entry = cache['entries'].get(key)
+  if entry is not None:
+    paths, stamps, cached_value, size = entry
+    if fileStamps(paths) == stamps:
+      cache['entries'].move_to_end(key)
+      value = cached_value
+    else:
+      del cache['entries'][key]
+      cache['size'] -= size
+  if value is None:
+    cache['misses'] += 1
+  else:
+    cache['hits'] += 1
+#####################################################################################################
+# Return variable
+#####################################################################################################
+  return value
+############################## end of cacheGet() function ###########################################
+#####################################################################################################
+
+
+#####################################################################################################
+#
+# Function Name:    cachePut()
+#
+# Description:      Caches a value read from the given files, dropping the least recently used entries
+#                   until the cache is back under its size limit.
+#
+# Arguments:        input - dict cache      - claim cache created by main()
+#                   input - tuple key       - key of the value
+#                   input - string[] paths  - files or directories the value was read from
+#                   input - tuple stamps    - fileStamps() of paths, taken before the value was read
+#                   input - value           - value to cache
+#                   input - int size        - approximate size of the value in bytes
+#
+# Return Variable:  N/A
+#
+# Notes:            Values larger than the whole cache are not cached.
+#
+#####################################################################################################
+def cachePut(cache, key, paths, stamps, value, size):
+#####################################################################################################
+# Replace any old entry with the new one
+# Drop least recently used entries while over the limit
+#####################################################################################################
+  if size <= cache['limit']:
+    old_entry = cache['entries'].pop(key, None)
+    if old_entry is not None:
+      cache['size'] -= old_entry[3]
+    cache['entries'][key] = (paths, stamps, value, size)
+    cache['size'] += size
+    while cache['size'] > cache['limit']:
+      unused_key, old_entry = cache['entries'].popitem(last=False)
+      cache['size'] -= old_entry[3]
+############################## end of cachePut() function ###########################################
+#####################################################################################################
+
+
+#####################################################################################################
+#
+# Function Name:    cachedFiles()
+#
+# Description:      Finds the file, or every file, with the extension in the search path the same way
+#                   getIndentedClm.py does, using the cached listing while no directory changed.
+#
+# Arguments:        input - dict cache          - claim cache created by main()
+#                   input - string extension    - Filetype extension to search for
+#                   input - string search_path  - Full path to directory that is to be searched for file
+#                   input - bool search_all     - Return every file with the extension, not only the first
+#                   input - bool recursive      - Also search subdirectories (implies search_all)
+#
+# Return Variable:  output - string[] filepathnames - filepaths and names of the files to search, or []
+#
+# Notes:            Adding or removing a file changes the modification time of its directory, so every
+#                   directory walked is stamped.
+#
+#####################################################################################################
+def cachedFiles(cache, extension, search_path, search_all=False, recursive=False):
+#####################################################################################################
+# Return cached listing if no directory changed
+# Otherwise stamp the directories, list them and cache the files found
+#####################################################################################################
+  key = ('files', search_path, extension, search_all or recursive, recursive)
+  filepathnames = cacheGet(cache, key)
+  if filepathnames is None:
+    if recursive:
+      directories = [dirpath for dirpath, dirnames, filenames in os.walk(search_path)]
+    else:
+      directories = [search_path]
+    stamps = fileStamps(directories)
+    files = getIndentedClm.readFilesFromSearchPath(search_path, recursive)
+    if search_all or recursive:
+      filenames = getIndentedClm.lookForFiles(files, extension, search_path)
+    else:
+      filename = getIndentedClm.lookForFile(files, extension, search_path)
+      filenames = [filename] if filename != '' else []
+    filepathnames = [os.path.join(search_path, filename) for filename in filenames]
+    cachePut(cache, key, directories, stamps, filepathnames,
+             sum(len(path) + offset_size for path in directories + filepathnames))
+#####################################################################################################
+# Return variable
+#####################################################################################################
+  return filepathnames
+############################## end of cachedFiles() function ########################################
+#####################################################################################################
+
+
+#####################################################################################################
+#
+# Function Name:    cachedClaimOffsets()
+#
+# Description:      Finds the byte offsets and lengths of the claims of a file containing each of the
+#                   identifiers, using the cached offsets of an identifier while the file has not changed.
+#
+# Arguments:        input - dict cache          - claim cache created by main()
+#                   input - string filepathname - filepath and name for raw xml file
+#                   input - set identifiers     - Unique identifiers to find the claims of
+#                   input - string claim_tag    - Element name of a claim (Default = None)
+#
+# Return Variable:  output - (dict offsets, dict file_info, string error) - list of (start, length) for
+#                            each identifier, 'encoding' and 'namespaces' of the file, and the parse error
+#                            message if the file is not well-formed (None otherwise)
+#
+# Notes:            Only the offsets of the identifiers asked for are kept, each in its own cache entry,
+#                   so memory does not grow with the size of the file. The file is streamed once for all
+#                   identifiers not cached yet, without building the claims. The offsets of a file that
+#                   failed to parse are returned but not cached.
+#
+#####################################################################################################
+def cachedClaimOffsets(cache, filepathname, identifiers, claim_tag=None):
+#####################################################################################################
+# Return cached offsets of identifiers if the file did not change
+# Stream the file once for the other identifiers and cache their offsets
+#####################################################################################################
+  error = None
+  offsets = {}
+  missing = set()
+  file_info = cacheGet(cache, ('file_info', filepathname, claim_tag))
+  for identifier in identifiers:
+    cached = cacheGet(cache, ('offsets', filepathname, claim_tag, identifier))
+    if cached is None or file_info is None:
+      missing.add(identifier)
+    else:
+      offsets[identifier] = cached
+  if missing:
+    stamps = fileStamps([filepathname])
+    file_info = {}
+    found = dict((identifier, []) for identifier in missing)
+    # Fields mode with no fields collects the values of each claim without building it
+    fields = {'atoms': [], 'paths': {}}
+    try:
+      for row, values, start, end in getIndentedClm.iterClaims(filepathname, claim_tag, file_info, fields=fields):
+        for identifier in missing.intersection(values):
+          found[identifier].append((start, end - start))
+    except (expat.ExpatError, OSError, EOFError, lzma.LZMAError) as parse_error:
+      error = str(parse_error)
+    offsets.update(found)
+    if error is None:
+      cachePut(cache, ('file_info', filepathname, claim_tag), [filepathname], stamps, file_info,
+               len(json.dumps(file_info)) + offset_size)
+      for identifier, identifier_offsets in found.items():
+        cachePut(cache, ('offsets', filepathname, claim_tag, identifier), [filepathname], stamps,
+                 identifier_offsets, len(identifier) + offset_size * (1 + len(identifier_offsets)))
+#####################################################################################################
+# Return variable
+#####################################################################################################
+  return offsets, file_info, error
+############################## end of cachedClaimOffsets() function #################################
+#####################################################################################################
+
+
+#####################################################################################################
+#
+# Function Name:    cachedClaim()
+#
+# Description:      Reads and indents the claim at the byte offset of a file, using the cached claim
+#                   while the file has not changed.
+#
+# Arguments:        input - dict cache          - claim cache created by main()
+#                   input - string filepathname - filepath and name for raw xml file
+#                   input - dict file_info      - 'encoding' and 'namespaces' of the file
+#                   input - int start           - byte offset of the claim
+#                   input - int length          - length of the claim in bytes
+#
+# Return Variable:  output - string claim_text - indented claim
+#
+# Notes:            None.
+#
+#####################################################################################################
+def cachedClaim(cache, filepathname, file_info, start, length):
+#####################################################################################################
+# Return cached claim if the file did not change
+# Otherwise read only the bytes of the claim and indent it
+#####################################################################################################
+  key = ('claim', filepathname, start)
+  claim_text = cacheGet(cache, key)
+  if claim_text is None:
+    stamps = fileStamps([filepathname])
+    for prefix, uri in file_info['namespaces'].items():
+      getIndentedClm.registerNamespace(prefix, uri)
+    with getIndentedClm.openClaimFile(filepathname) as raw_file:
+      raw_file.seek(start)
+      claim = getIndentedClm.parseClaimSlice(raw_file.read(length), file_info)
+    claim_text = getIndentedClm.formatClaim(claim)
+    cachePut(cache, key, [filepathname], stamps, claim_text, len(claim_text) + offset_size)
+#####################################################################################################
+# Return variable
+#####################################################################################################
+  return claim_text
+############################## end of cachedClaim() function ########################################
+#####################################################################################################
+
+
+#####################################################################################################
+#
+# Function Name:    lookupClaims()
+#
+# Description:      Cached version of getIndentedClm.iterScannedClaims(). Finds every claim containing
+#                   any of the unique identifiers in the files.
+#
+# Arguments:        input - dict cache             - claim cache created by main()
+#                   input - set identifiers        - Unique identifiers to search for to find claims
+#                   input - string[] filepathnames - filepaths and names for raw xml files to search
+#                   input - string claim_tag       - Element name of a claim (Default = None)
+#
+# Return Variable:  output - (list claims, list errors) - [filepathname, sorted identifiers found, indented
+#                            claim] for every claim found, and [filepathname, parse error message] for
+#                            each file that failed
+#
+# Notes:            Claims are in the order of filepathnames then of the file, and the files after the one
+#                   where every identifier has been found are not searched, the same as a scan.
+#
+#####################################################################################################
+def lookupClaims(cache, identifiers, filepathnames, claim_tag=None):
+#####################################################################################################
+# Look identifiers up in the cached claim offsets of each file
+# Read the claims found in file order
+# Stop when every identifier has been found
+#####################################################################################################
+  claims = []
+  errors = []
+  remaining = set(identifiers)
+  for filepathname in filepathnames:
+    offsets, file_info, error = cachedClaimOffsets(cache, filepathname, identifiers, claim_tag)
+    if error is not None:
+      errors.append([filepathname, error])
+    file_claims = {}
+    for identifier in identifiers:
+      for start, length in offsets.get(identifier, []):
+        file_claims.setdefault((start, length), []).append(identifier)
+    for start, length in sorted(file_claims):
+      found = sorted(file_claims[(start, length)])
+      remaining.difference_update(found)
+      claims.append([filepathname, found, cachedClaim(cache, filepathname, file_info, start, length)])
+    if not remaining:
+      break
+#####################################################################################################
+# Return variable
+#####################################################################################################
+  return claims, errors
+############################## end of lookupClaims() function #######################################
+#####################################################################################################
+
+
+#####################################################################################################
+#
+# Function Name:    handleLookup()
+#
+# Description:      Answers one lookup request sent by getIndentedClm.py --server.
+#
+# Arguments:        input - dict cache   - claim cache created by main()
+#                   input - dict request - 'identifiers', 'extension', 'search_path', 'claim_tag',
+#                                          'search_all' and 'recursive' of the lookup
+#
+# Return Variable:  output - dict response - 'claims', 'errors' and 'files' searched, or 'error' if the
+#                            request could not be answered
+#
+# Notes:            The request is checked with checkLookupRequest() first.
+#
+#####################################################################################################
+def handleLookup(cache, request):
+#####################################################################################################
+# Check request fields
+# Check search path is inside of the root path
+# Find files and look claims up in them
+#####################################################################################################
+  request_error = checkLookupRequest(request)
+  if request_error is not None:
+    response = {'error': 'Invalid request: ' + request_error}
+  else:
+    search_path = os.path.abspath(request.get('search_path') or cache['root'])
+    if os.path.commonpath([search_path, cache['root']]) != cache['root']:
+      response = {'error': 'Search path ' + search_path + ' is not inside of ' + cache['root']}
+    elif not os.path.isdir(search_path):
+      response = {'error': 'Search path ' + search_path + ' for file does not exist.'}
+    else:
+      filepathnames = cachedFiles(cache, request.get('extension') or getIndentedClm.extension, search_path,
+                                  request.get('search_all', False), request.get('recursive', False))
+      claims, errors = lookupClaims(cache, set(request['identifiers']), filepathnames, request.get('claim_tag'))
+      response = {'claims': claims, 'errors': errors, 'files': len(filepathnames)}
+#####################################################################################################
+# Return variable
+#####################################################################################################
+  return response
+############################## end of handleLookup() function #######################################
+#####################################################################################################
+
+
+#####################################################################################################
+#
+# Function Name:    checkLookupRequest()
+#
+# Description:      Checks the fields of a lookup request have the types handleLookup() uses.
+#
+# Arguments:        input - request - decoded json body of the request
+#
+# Return Variable:  output - string request_error - what is wrong with the request, or None if it can
+#                            be answered
+#
+# Notes:            'identifiers' must be a non-empty list of strings. 'extension', 'search_path' and
+#                   'claim_tag' are optional strings, and 'search_all' and 'recursive' optional booleans.
+#
+#####################################################################################################
+def checkLookupRequest(request):
+#####################################################################################################
+# Check body is an object with a list of identifiers
+# Check optional fields
+#####################################################################################################
+  request_error = None
+  if not isinstance(request, dict):
+    request_error = 'request must be a json object'
+  elif not isinstance(request.get('identifiers'), list) or not request['identifiers']:
+    request_error = 'identifiers must be a non-empty list'
+  elif not all(isinstance(identifier, str) for identifier in request['identifiers']):
+    request_error = 'identifiers must be strings'
+  else:
+    for name in ('extension', 'search_path', 'claim_tag'):
+      if request.get(name) is not None and not isinstance(request[name], str):
+        request_error = name + ' must be a string'
+    for name in ('search_all', 'recursive'):
+      if request.get(name) is not None and not isinstance(request[name], bool):
+        request_error = name + ' must be true or false'
+#####################################################################################################
+# Return variable
+#####################################################################################################
+  return request_error
+############################## end of checkLookupRequest() function #################################
+#####################################################################################################
+
+
+#####################################################################################################
+#
+# Function Name:    ClaimRequestHandler
+#
+# Description:      HTTP handler for the lookup server. POST /claims answers a lookup, GET /stats
+#                   returns the cache counters.
+#
+# Notes:            Requests are answered one at a time, so the cache needs no locking.
+#
+#####################################################################################################
+class ClaimRequestHandler(BaseHTTPRequestHandler):
+
+  def sendJson(self, status, response):
+    body = json.dumps(response).encode('utf-8')
+    self.send_response(status)
+    self.send_header('Content-Type', 'application/json')
+    self.send_header('Content-Length', str(len(body)))
+    self.end_headers()
+    self.wfile.write(body)
+
+  def do_POST(self):
+    if self.path != '/claims':
+      self.sendJson(404, {'error': 'Unknown path ' + self.path})
+      return
+    try:
+      request = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))))
+    except ValueError as error:
+      self.sendJson(400, {'error': 'Invalid request: ' + str(error)})
+      return
+    response = handleLookup(claim_cache, request)
+    self.sendJson(400 if 'error' in response else 200, response)
+
+  def do_GET(self):
+    if self.path != '/stats':
+      self.sendJson(404, {'error': 'Unknown path ' + self.path})
+      return
+    self.sendJson(200, {'entries': len(claim_cache['entries']), 'size': claim_cache['size'],
+                        'limit': claim_cache['limit'], 'hits': claim_cache['hits'],
+                        'misses': claim_cache['misses']})
+############################## end of ClaimRequestHandler class #####################################
+#####################################################################################################
+
+
+#####################################################################################################
+#
+# Print Functions
+#
+#####################################################################################################
+def printResult(return_code):
+  if return_code == iSuccess:
+    print('Done!')
+  else:
+    print('Program failed!')
+
+def printServingMsg(root_path, port):
+  servingMsg = ['Serving claim lookups for ', root_path, ' on ', host, ':', str(port), '\n',
+                'Press Ctrl-C to stop.']
+  servingMsg = ''.join(servingMsg)
+  print(servingMsg)
+
+def printServeErrorMsg(port, error):
+  serveErrorMsg = ['Error occured\n',
+                   'Unable to listen on ', host, ':', str(port), ': ', str(error), '\n',
+                   'Please verify the port is not already in use.']
+  serveErrorMsg = ''.join(serveErrorMsg)
+  print(serveErrorMsg)
+############################## end of print messages ################################################
+#####################################################################################################
+
+
+#####################################################################################################
+# Execute only if program was called as a script, not if it was imported
+#####################################################################################################
+# Initialize program by getting root path, port and cache size
+# Fetches options from init() function
+# Execute main()
+#####################################################################################################
+if __name__ == '__main__':
+  options = init()
+  if options.root_path:
+    root_path = options.root_path
+  if options.port:
+    port = options.port
+  if options.cache_size:
+    cache_limit = options.cache_size * 1024 * 1024
+
+  ret = main(root_path, port, cache_limit)
+  printResult(ret)
+#####################################################################################################
+############################## end of getIndentedClmServer.py program ###############################
+#####################################################################################################
@@ -0,0 +1,693 @@
+#!/usr/bin/env python
+#####################################################################################################
+##  Usage:
+##  lookupMissingICN.py --s <searched ICN file> --r <returned ICN file> (--o <output directory>)
+##                      (--m <most ICNs in memory>) (--tmp <temporary directory>) (--quiet)
+##  lookupMissingICN.py --s <searched ICN file> --p <claim file directory> (--x <extension>)
+##                      (--t <claim element name>) (--recursive) (--j <processes>) (--index <index file>)
+##                      (--prefilter) (--o <output directory>) (--quiet)
+##                      (--resume) (--checkpoint <checkpoint file>)
+##
+##  File ID:      lookupMissingICN.py
+##
+##  Description:  Reconciles the list of internal control numbers (ICN) being searched for against the
+##                list of ICN returned by the reconciliation query. Each list is a file with one ICN
+##                per line. ICN searched for but not returned are missing, ICN returned but not
+##                searched for are unexpected, and ICN listed more than once in either list are
+##                duplicated.
+##                With --p, the ICN searched for are looked for directly in the claim files of a
+##                directory instead of a list of returned ICN, using the same scan or claim index
+##                as getIndentedClm.py.
+##
+##  Outputs:      missing.txt    - missing ICN, one per line
+##                unexpected.txt - unexpected ICN, one per line
+##                duplicated.txt - duplicated ICN, with the number of times it is in the searched
+##                                 list and in the returned list, separated by tabs
+##                found.txt      - with --p, ICN found and the claim file it was found in, separated by
+##                                 a tab, one line per ICN and file
+##                The counts are output to STDOUT, along with the missing ICN unless --quiet is used.
+##
+##  Notes:        The lists are counted in memory. If either list has more than --m different ICN, the
+##                lists are sorted in runs on disk and merged instead, so any size of list can be
+##                reconciled. Both ways give the same output files.
+##                With --p and --resume, claim files that did not change since the last run with the
+##                same searched ICN are not scanned again, and a scan that was stopped continues from
+##                its last checkpoint.
+##
+#####################################################################################################
+##
+##                        Modification Log
+##
+##  Author              Version     Date           Comments
+##
+#####################################################################################################
+
+#####################################################################################################
+# Set up (Import libraries and set defaults for variables
+#####################################################################################################
+import heapq
+import itertools
+import os
+import shutil
+import sqlite3
+import tempfile
+from collections import Counter
+from optparse import OptionParser
+import getIndentedClm
+output_dir = '.'
+extension = '.xml'
+claim_tag = None
+processes = os.cpu_count() or 1
+max_in_memory = 5000000
+checkpoint_path = os.path.join(os.path.expanduser('~'), 'develop', 'data', 'icncheckpoint.db')
+batch_size = 100000
+iSuccess = 0
+iFailure = 1
+############################## end of set up ########################################################
+#####################################################################################################
+
+
+#####################################################################################################
+#
+# Function Name:    main()
+#
+# Description:      This is the main function that controls the processing. It counts both lists, in
+#                   memory or on disk, writes the missing, unexpected and duplicated ICN and prints the
+#                   counts.
+#
+# Arguments:        input - string searched_filename - file with the ICN being searched for
+#                   input - string returned_filename - file with the ICN returned by the query
+#                   input - string output_dir        - directory to write the output files to
+#                   input - string temp_dir          - directory for sorted runs (Default = None, system default)
+#                   input - bool quiet               - Do not print the missing ICN (Default = False)
+#
+# Return Codes:     0 - iSuccess - The function executed successfully.
+#                   1 - iFailure - The function did not execute successfully.
+#
+# Notes:            None.
+#
+#####################################################################################################
+def main(searched_filename, returned_filename, output_dir, temp_dir=None, quiet=False):
+#####################################################################################################
+# Initialize Return Code.
+# Check input files
+# Count lists in memory, or sort them on disk if they are too large
+# Write output files and print counts
+# Return iRc.
+#####################################################################################################
+  iRc = iFailure
+  if not os.path.isfile(searched_filename):
+    printInvalidListMsg(searched_filename)
+  elif not os.path.isfile(returned_filename):
+    printInvalidListMsg(returned_filename)
+  else:
+    if not os.path.isdir(output_dir):
+      os.makedirs(output_dir)
+    searched = countInMemory(searched_filename)
+    returned = countInMemory(returned_filename) if searched is not None else None
+    if searched is not None and returned is not None:
+      counts = reconcileCounts(iterHashedCounts(searched[0], returned[0]), output_dir)
+      counts['searched'] = searched[1]
+      counts['returned'] = returned[1]
+    else:
+      # Too many ICN for memory, drop what was counted and sort on disk
+      searched = returned = None
+      printSortingMsg(max_in_memory)
+      run_dir = tempfile.mkdtemp(prefix='lookupMissingICN.', dir=temp_dir)
+      try:
+        searched_runs, searched_lines = sortRuns(searched_filename, run_dir)
+        returned_runs, returned_lines = sortRuns(returned_filename, run_dir)
+        counts = reconcileCounts(iterMergedCounts(iterSortedCounts(searched_runs), iterSortedCounts(returned_runs)),
+                                 output_dir)
+        counts['searched'] = searched_lines
+        counts['returned'] = returned_lines
+      finally:
+        shutil.rmtree(run_dir, ignore_errors=True)
+    if not quiet:
+      printMissingIcn(os.path.join(output_dir, 'missing.txt'), counts['missing'])
+    printCountsMsg(counts)
+    iRc = iSuccess
+#####################################################################################################
+# Return code of the function
+#####################################################################################################
+  return iRc
+############################## end of main() function ###############################################
+#####################################################################################################
+
+
+#####################################################################################################
+#
+# Function Name:    mainClaimFiles()
+#
+# Description:      Reconciles the ICN being searched for directly against the claim files in a
+#                   directory, without a list of returned ICN. Writes the ICN found, with the files they
+#                   were found in, and the missing ICN, and prints the counts.
+#
+# Arguments:        input - string searched_filename - file with the ICN being searched for
+#                   input - string claim_path        - directory of claim files to search
+#                   input - string output_dir        - directory to write the output files to
+#                   input - string extension         - Filetype extension of the claim files
+#                   input - string claim_tag         - Element name of a claim (Default = None)
+#                   input - bool recursive           - Also search subdirectories (Default = False)
+#                   input - int processes            - Number of files to scan at the same time (Default = 1)
+#                   input - string index_path        - Claim index to look ICN up in (Default = None, scan files)
+#                   input - bool prefilter           - Use the prefilter fast path when scanning (Default = False)
+#                   input - bool quiet               - Do not print the missing ICN (Default = False)
+#                   input - string checkpoint_path   - Checkpoint to resume the scan from and save progress to
+#                                                      (Default = None)
+#
+# Return Codes:     0 - iSuccess - The function executed successfully.
+#                   1 - iFailure - The function did not execute successfully.
+#
+# Notes:            Every file with the extension is searched, in one pass for all ICN.
+#
+#####################################################################################################
+def mainClaimFiles(searched_filename, claim_path, output_dir, extension, claim_tag=None, recursive=False,
+                   processes=1, index_path=None, prefilter=False, quiet=False, checkpoint_path=None):
+#####################################################################################################
+# Initialize Return Code.
+# Check input file and find claim files
+# Find files containing each ICN
+# Write output files and print counts
+# Return iRc.
+#####################################################################################################
+  iRc = iFailure
+  if not os.path.isfile(searched_filename):
+    printInvalidListMsg(searched_filename)
+  else:
+    filepathnames = getIndentedClm.findFilesToSearch(extension, claim_path, True, recursive)
+    if filepathnames:
+      if not os.path.isdir(output_dir):
+        os.makedirs(output_dir)
+      searched = Counter(readIcn(searched_filename))
+      locations = None
+      try:
+        locations, errors = getIndentedClm.locateIdentifiers(set(searched), filepathnames, claim_tag, index_path,
+                                                             processes, prefilter, checkpoint_path)
+      except (sqlite3.Error, OSError) as error:
+        # The index or checkpoint could not be opened or written, e.g. in a missing or read-only directory
+        if index_path:
+          getIndentedClm.printIndexErrorMsg(index_path, error)
+        elif checkpoint_path:
+          getIndentedClm.printCheckpointErrorMsg(checkpoint_path, error)
+        else:
+          getIndentedClm.printParseErrorMsg(claim_path, error)
+      if locations is not None:
+        for filepathname, error in errors:
+          getIndentedClm.printParseErrorMsg(filepathname, error)
+        counts = writeLocations(searched, locations, output_dir)
+        counts['searched'] = sum(searched.values())
+        if not quiet:
+          printMissingIcn(os.path.join(output_dir, 'missing.txt'), counts['missing'])
+        printFoundCountsMsg(counts, len(filepathnames))
+        iRc = iSuccess
+#####################################################################################################
+# Return code of the function
+#####################################################################################################
+  return iRc
+############################## end of mainClaimFiles() function #####################################
+#####################################################################################################
+
+
+#####################################################################################################
+#
+# Function Definitions
+#
+#####################################################################################################
+#####################################################################################################
+#
+# Function Name:    init()
+#
+# Description:      Create and use parser to fetch command argument options.
+#
+# Arguments:        N/A
+#
+# Returned Data:    output - string options.searched_filename - file with the ICN being searched for
+#                   output - string options.returned_filename - file with the ICN returned by the query
+#                   output - string options.output_dir        - directory to write the output files to
+#                   output - int options.max_in_memory        - most different ICN to count in memory
+#                   output - string options.temp_dir          - directory for sorted runs
+#                   output - bool options.quiet               - Do not print the missing ICN
+#                   output - string options.claim_path        - directory of claim files to search instead of
+#                                                               a returned ICN file
+#                   output - string options.extension         - Filetype extension of the claim files
+#                   output - string options.claim_tag         - Element name of a claim
+#                   output - bool options.recursive           - Also search subdirectories of claim_path
+#                   output - int options.processes            - Number of claim files to scan at the same time
+#                   output - string options.index_path        - Claim index to look ICN up in
+#                   output - string options.index_fields      - Paths of the ICN values to index
+#                   output - bool options.prefilter           - Use the prefilter fast path when scanning
+#                   output - string options.checkpoint_path   - Checkpoint file to save --p scan progress to
+#                   output - bool options.resume              - Continue the --p scan from the checkpoint
+#
+# Notes:            None.
+#
+#####################################################################################################
+def init():
+#####################################################################################################
+# Setup parser for command line arugments
+# Fetch and return data from parser
+#####################################################################################################
+  parser = OptionParser()
+  parser.add_option('--s', '--searched',              dest='searched_filename',
+                    help='input file with the ICN being searched for, one per line')
+  parser.add_option('--r', '--returned',              dest='returned_filename',
+                    help='input file with the ICN returned by the query, one per line')
+  parser.add_option('--o', '--output-dir',            dest='output_dir',
+                    help='set directory to write missing.txt, unexpected.txt and duplicated.txt to. default: .')
+  parser.add_option('--m', '--max-memory',            dest='max_in_memory', type='int',
+                    help='set most different ICN in a list to count in memory before sorting on disk. default: 5000000')
+  parser.add_option('--tmp',                          dest='temp_dir',
+                    help='set directory for sorted runs when sorting on disk. default: system temporary directory')
+  parser.add_option('--quiet',                        dest='quiet', action='store_true',
+                    help='do not print the missing ICN, only the counts')
+  parser.add_option('--p', '--claim-path',            dest='claim_path',
+                    help='search the claim files in this directory for the searched ICN instead of using --r')
+  parser.add_option('--x', '--extension',             dest='extension',
+                    help='set extension of the claim files for --p. default: .xml')
+  parser.add_option('--t', '--tag',                   dest='claim_tag',
+                    help='set element name of a claim for --p. default: every child of the root element')
+  parser.add_option('--recursive',                    dest='recursive', action='store_true',
+                    help='also search subdirectories of --p')
+  parser.add_option('--j', '--processes',             dest='processes', type='int',
+                    help='set number of claim files to scan at the same time for --p. default: number of cpus')
+  parser.add_option('--index',                        dest='index_path',
+                    help='look the ICN up in the getIndentedClm.py claim index file instead of scanning --p')
+  parser.add_option('--index-fields',                 dest='index_fields',
+                    help='comma separated paths of the ICN values to index. default: ' + getIndentedClm.index_fields)
+  parser.add_option('--prefilter',                    dest='prefilter', action='store_true',
+                    help='skip claim files without the ICN bytes when scanning --p')
+  parser.add_option('--checkpoint',                   dest='checkpoint_path',
+                    help='save the progress of the --p scan to this file, starting over unless --resume is used. default with --resume: ' + checkpoint_path)
+  parser.add_option('--resume',                       dest='resume', action='store_true',
+                    help='continue the --p scan from the checkpoint of the last run with the same searched ICN, skipping claim files that did not change since')
+  # get and set command line arugments into local variables using parser
+  options, args = parser.parse_args()
+#####################################################################################################
+# Return variable from function
+#####################################################################################################
+  return options
+############################## end of init() function ###############################################
+#####################################################################################################
+
+
+#####################################################################################################
+#
+# Function Name:    readIcn()
+#
+# Description:      Reads the ICN from a list file, one per line, stripping whitespace and skipping
+#                   blank lines.
+#
+# Arguments:        input - string filename - file with one ICN per line
+#
+# Return Variable:  output - string icn - each ICN in the file, in file order
+#
+# Notes:            None.
+#
+#####################################################################################################
+def readIcn(filename):
+#####################################################################################################
+# Yield each stripped, non-blank line
+#####################################################################################################
+  with open(filename) as icn_file:
+    for line in icn_file:
+      icn = line.strip()
+      if icn:
+        yield icn
+############################## end of readIcn() function ############################################
+#####################################################################################################
+
+
+#####################################################################################################
+#
+# Function Name:    countInMemory()
+#
+# Description:      Counts how many times each ICN is in a list file, in batches of batch_size lines,
+#                   and gives up as soon as there are more than max_in_memory different ICN.
+#
+# Arguments:        input - string filename - file with one ICN per line
+#
+# Return Variable:  output - (Counter counts, int lines) - number of times each ICN is in the list and
+#                            number of ICN in the list, or None if the list is too large for memory
+#
+# Notes:            None.
+#
+#####################################################################################################
+def countInMemory(filename):
+#####################################################################################################
+# Count ICN batch by batch, stopping if the count gets too large
+#####################################################################################################
+  counts = Counter()
+  lines = 0
+  icn_iter = readIcn(filename)
+  batch = list(itertools.islice(icn_iter, batch_size))
+  while batch:
+    counts.update(batch)
+    lines += len(batch)
+    if len(counts) > max_in_memory:
+      icn_iter.close()
+      return None
+    batch = list(itertools.islice(icn_iter, batch_size))
+#####################################################################################################
+# Return variable
+#####################################################################################################
+  return counts, lines
+############################## end of countInMemory() function ######################################
+#####################################################################################################
+
+
+#####################################################################################################
+#
+# Function Name:    iterHashedCounts()
+#
+# Description:      Pairs the counts of the searched and returned lists for every ICN that is missing,
+#                   unexpected or duplicated, using hash lookups only.
+#
+# Arguments:        input - Counter searched - number of times each ICN is in the searched list
+#                   input - Counter returned - number of times each ICN is in the returned list
+#
+# Return Variable:  output - (string icn, int searched_count, int returned_count) - for every ICN that
+#                            is not exactly once in both lists, sorted by ICN
+#
+# Notes:            Only the ICN that are written out are sorted, not the whole lists.
+#
+#####################################################################################################
+def iterHashedCounts(searched, returned):
+#####################################################################################################
+# Collect ICN that are not exactly once in both lists
+# Yield them in sorted order with both counts
+#####################################################################################################
+  exceptions = [icn for icn, count in searched.items() if count > 1 or icn not in returned]
+  # ICN in both lists only once in the searched list are not collected yet
+  exceptions += [icn for icn, count in returned.items() if icn not in searched or (count > 1 and searched[icn] == 1)]
+  for icn in sorted(exceptions):
+    yield icn, searched.get(icn, 0), returned.get(icn, 0)
+############################## end of iterHashedCounts() function ###################################
+#####################################################################################################
+
+
+#####################################################################################################
+#
+# Function Name:    sortRuns()
+#
+# Description:      Splits a list file into sorted runs of at most max_in_memory ICN, each written to
+#                   its own file in the run directory.
+#
+# Arguments:        input - string filename - file with one ICN per line
+#                   input - string run_dir  - directory to write the runs to
+#
+# Return Variable:  output - (string[] run_filenames, int lines) - files of sorted runs, and number of ICN
+#                            in the list
+#
+# Notes:            None.
+#
+#####################################################################################################
+def sortRuns(filename, run_dir):
+#####################################################################################################
+# Read list in runs, sort each run and write it to a run file
+#####################################################################################################
+  run_filenames = []
+  lines = 0
+  icn_iter = readIcn(filename)
+  run = list(itertools.islice(icn_iter, max_in_memory))
+  while run:
+    run.sort()
+    lines += len(run)
+    run_filename = os.path.join(run_dir, 'run' + str(len(os.listdir(run_dir))))
+    with open(run_filename, 'w') as run_file:
+      run_file.write('\n'.join(run))
+      run_file.write('\n')
+    run_filenames.append(run_filename)
+    run = list(itertools.islice(icn_iter, max_in_memory))
+#####################################################################################################
+# Return variable
+#####################################################################################################
+  return run_filenames, lines
+############################## end of sortRuns() function ###########################################
+#####################################################################################################
+
+
+#####################################################################################################
+#
+# Function Name:    iterSortedCounts()
+#
+# Description:      Merges sorted runs and counts how many times each ICN is in them.
+#
+# Arguments:        input - string[] run_filenames - files of sorted runs of one list
+#
+# Return Variable:  output - (string icn, int count) - each ICN of the list with its count, sorted by ICN
+#
+# Notes:            Only one line of each run is in memory at a time.
+#
+#####################################################################################################
+def iterSortedCounts(run_filenames):
+#####################################################################################################
+# Merge runs line by line and count equal lines
+#####################################################################################################
+  run_files = [open(run_filename) for run_filename in run_filenames]
+  try:
+    merged = heapq.merge(*[(line.rstrip('\n') for line in run_file) for run_file in run_files])
+    for icn, group in itertools.groupby(merged):
+      yield icn, sum(1 for unused in group)
+  finally:
+    for run_file in run_files:
+      run_file.close()
+############################## end of iterSortedCounts() function ###################################
+#####################################################################################################
+
+
+#####################################################################################################
+#
+# Function Name:    iterMergedCounts()
+#
+# Description:      Walks the sorted counts of the searched and returned lists together and pairs the
+#                   counts of every ICN that is missing, unexpected or duplicated.
+#
+# Arguments:        input - iterator searched - (icn, count) of the searched list, sorted by ICN
+#                   input - iterator returned - (icn, count) of the returned list, sorted by ICN
+#
+# Return Variable:  output - (string icn, int searched_count, int returned_count) - for every ICN that
+#                            is not exactly once in both lists, sorted by ICN
+#
+# Notes:            Gives the same ICN in the same order as iterHashedCounts().
+#
+#####################################################################################################
+def iterMergedCounts(searched, returned):
+#####################################################################################################
+# Merge join the two sorted count streams
+#####################################################################################################
+  searched_icn, searched_count = next(searched, (None, 0))
+  returned_icn, returned_count = next(returned, (None, 0))
+  while searched_icn is not None or returned_icn is not None:
+    if returned_icn is None or (searched_icn is not None and searched_icn < returned_icn):
+      icn, counts = searched_icn, (searched_count, 0)
+      searched_icn, searched_count = next(searched, (None, 0))
+    elif searched_icn is None or returned_icn < searched_icn:
+      icn, counts = returned_icn, (0, returned_count)
+      returned_icn, returned_count = next(returned, (None, 0))
+    else:
+      icn, counts = searched_icn, (searched_count, returned_count)
+      searched_icn, searched_count = next(searched, (None, 0))
+      returned_icn, returned_count = next(returned, (None, 0))
+    if counts != (1, 1):
+      yield icn, counts[0], counts[1]
+############################## end of iterMergedCounts() function ###################################
+#####################################################################################################
+
+
+#####################################################################################################
+#
+# Function Name:    reconcileCounts()
+#
+# Description:      Writes every ICN that is not exactly once in both lists to missing.txt,
+#                   unexpected.txt and duplicated.txt, and counts them.
+#
+# Arguments:        input - iterator exceptions - (icn, searched_count, returned_count), sorted by ICN
+#                   input - string output_dir   - directory to write the output files to
+#
+# Return Variable:  output - dict counts - number of 'missing', 'unexpected' and 'duplicated' ICN
+#
+# Notes:            An ICN can be both duplicated and missing or unexpected.
+#
+#####################################################################################################
+def reconcileCounts(exceptions, output_dir):
+#####################################################################################################
+# Open output files
+# Sort each ICN into missing, unexpected and duplicated
+# Return counts
+#####################################################################################################
+  counts = {'missing': 0, 'unexpected': 0, 'duplicated': 0}
+  with open(os.path.join(output_dir, 'missing.txt'), 'w') as missing_file, \
+       open(os.path.join(output_dir, 'unexpected.txt'), 'w') as unexpected_file, \
+       open(os.path.join(output_dir, 'duplicated.txt'), 'w') as duplicated_file:
+    for icn, searched_count, returned_count in exceptions:
+      if returned_count == 0:
+        missing_file.write(icn + '\n')
+        counts['missing'] += 1
+      elif searched_count == 0:
+        unexpected_file.write(icn + '\n')
+        counts['unexpected'] += 1
+      if searched_count > 1 or returned_count > 1:
+        duplicated_file.write(icn + '\t' + str(searched_count) + '\t' + str(returned_count) + '\n')
+        counts['duplicated'] += 1
+#####################################################################################################
+# Return variable
+#####################################################################################################
+  return counts
+############################## end of reconcileCounts() function ####################################
+#####################################################################################################
+
+
+#####################################################################################################
+#
+# Function Name:    writeLocations()
+#
+# Description:      Writes every ICN found in the claim files, with each file it was found in, to
+#                   found.txt and every ICN not found to missing.txt, and counts them.
+#
+# Arguments:        input - Counter searched  - number of times each ICN is in the searched list
+#                   input - dict locations    - filepathnames containing each ICN found
+#                   input - string output_dir - directory to write the output files to
+#
+# Return Variable:  output - dict counts - number of 'found' and 'missing' ICN
+#
+# Notes:            Both files are sorted by ICN.
+#
+#####################################################################################################
+def writeLocations(searched, locations, output_dir):
+#####################################################################################################
+# Write found ICN with their files, and missing ICN
+# Return counts
+#####################################################################################################
+  counts = {'found': 0, 'missing': 0}
+  with open(os.path.join(output_dir, 'found.txt'), 'w') as found_file, \
+       open(os.path.join(output_dir, 'missing.txt'), 'w') as missing_file:
+    for icn in sorted(searched):
+      if icn in locations:
+        for filepathname in locations[icn]:
+          found_file.write(icn + '\t' + filepathname + '\n')
+        counts['found'] += 1
+      else:
+        missing_file.write(icn + '\n')
+        counts['missing'] += 1
+#####################################################################################################
+# Return variable
+#####################################################################################################
+  return counts
+############################## end of writeLocations() function #####################################
+#####################################################################################################
+
+
+#####################################################################################################
+#
+# Print Functions
+#
+#####################################################################################################
+def printResult(return_code):
+  if return_code == iSuccess:
+    print('Done!')
+  else:
+    print('Program failed!')
+
+def printMissingIcn(missing_filename, missing_count):
+  if missing_count > 0:
+    print('Missing ICN:')
+    print('######################################################')
+    with open(missing_filename) as missing_file:
+      for line in missing_file:
+        print(line.rstrip('\n'))
+  print('######################################################')
+
+def printCountsMsg(counts):
+  countsMsg = ['There are ', str(counts['missing']), ' missing ICN from ', str(counts['searched']),
+               ' ICN in the search.\n',
+               'There are ', str(counts['unexpected']), ' unexpected ICN from ', str(counts['returned']),
+               ' ICN returned.\n',
+               'There are ', str(counts['duplicated']), ' duplicated ICN.']
+  countsMsg = ''.join(countsMsg)
+  print(countsMsg)
+
+def printFoundCountsMsg(counts, file_count):
+  foundCountsMsg = ['Found ', str(counts['found']), ' ICN in ', str(file_count), ' claim files. ',
+                    'There are ', str(counts['missing']), ' missing ICN from ', str(counts['searched']),
+                    ' ICN in the search.']
+  foundCountsMsg = ''.join(foundCountsMsg)
+  print(foundCountsMsg)
+
+def printSortingMsg(max_in_memory):
+  sortingMsg = ['More than ', str(max_in_memory), ' different ICN in a list, sorting lists on disk...']
+  sortingMsg = ''.join(sortingMsg)
+  print(sortingMsg)
+
+def printNoListsMsg():
+  noListsMsg = ['Error occured\n',
+                'The searched (--s) ICN file and either the returned (--r) ICN file or the claim\n',
+                'file directory (--p) are needed.']
+  noListsMsg = ''.join(noListsMsg)
+  print(noListsMsg)
+
+def printInvalidListMsg(filename):
+  invalidListMsg = ['Error occured\n',
+                    'ICN file ', filename, ' does not exist.\n',
+                    'Please verify path to ICN file.']
+  invalidListMsg = ''.join(invalidListMsg)
+  print(invalidListMsg)
+############################## end of print messages ################################################
+#####################################################################################################
+
+
+#####################################################################################################
+# Execute only if program was called as a script, not if it was imported
+#####################################################################################################
+# Initialize program by getting searched and returned ICN files
+# Fetches options from init() function
+# Execute mainClaimFiles() if a claim file directory is provided by the user
+# Otherwise execute main() if both files are provided by the user
+#####################################################################################################
+if __name__ == '__main__':
+  options = init()
+  if options.output_dir:
+    output_dir = options.output_dir
+  if options.max_in_memory:
+    max_in_memory = options.max_in_memory
+  if options.extension:
+    extension = options.extension
+  if options.claim_tag:
+    claim_tag = options.claim_tag
+  if options.processes:
+    processes = options.processes
+  index_fields_error = None
+  if options.index_fields:
+    try:
+      getIndentedClm.index_fields = getIndentedClm.parseIndexFields(options.index_fields)['text']
+    except ValueError as error:
+      index_fields_error = error
+  run_checkpoint = None
+  checkpoint_error = None
+  if options.resume or options.checkpoint_path:
+    run_checkpoint = options.checkpoint_path or checkpoint_path
+    if not options.resume:
+      try:
+        getIndentedClm.clearCheckpoint(run_checkpoint)
+      except sqlite3.Error as error:
+        checkpoint_error = error
+
+  if index_fields_error is not None:
+    getIndentedClm.printInvalidIndexFieldsMsg(index_fields_error)
+    printResult(iFailure)
+  elif checkpoint_error is not None:
+    getIndentedClm.printCheckpointErrorMsg(run_checkpoint, checkpoint_error)
+    printResult(iFailure)
+  elif options.searched_filename and options.claim_path:
+    ret = mainClaimFiles(options.searched_filename, options.claim_path, output_dir, extension, claim_tag,
+                         options.recursive, processes, options.index_path, options.prefilter, options.quiet,
+                         run_checkpoint)
+    printResult(ret)
+  elif options.searched_filename and options.returned_filename:
+    ret = main(options.searched_filename, options.returned_filename, output_dir, options.temp_dir, options.quiet)
+    printResult(ret)
+  else:
+    printNoListsMsg()
+#####################################################################################################
+############################## end of lookupMissingICN.py program ###################################
+#####################################################################################################
@@ -0,0 +1,1006 @@
+#!/usr/bin/env python
+#####################################################################################################
+##  Usage:
+##  watchdir.py <directory path> (--i <poll interval seconds>) (--s <snapshot file>) (--poll)
+##              (--index <index file> (--x <extension>) (--t <claim element name>) (--w <workers>)
+##               (--q <queue size>) (--watchlist <identifiers file>) (--o <output directory>))
+##
+##  File ID:      watchdir.py
+##
+##  Description:  Watches a directory for new, changed and removed files. Linux inotify is used to be
+##                told about changes as they happen. Where inotify is not available, or with --poll,
+##                the directory is scanned every --interval seconds instead.
+##                The directory path is relative to $HOME/develop/log, unless a full path is given,
+##                the same as watchdir.sh.
+##
+##  Outputs:      New, changed and removed files are output to STDOUT
+##                The snapshot file is updated with the current files, their sizes and modification times
+##                With --index, new and changed claim files are added to the claim index used by
+##                getIndentedClm.py --index, and the claims of --watchlist identifiers found in them are
+##                added to the end of INDENT.<identifier> files
+##
+##  Notes:        The known files are kept in memory and saved to the snapshot file, so changes made
+##                while the watcher was stopped are reported when it starts again.
+##                With inotify, only the files named by each event are checked. The whole directory
+##                is only listed at start up, and again if the kernel event queue overflows.
+##
+#####################################################################################################
+##
+##                        Modification Log
+##
+##  Author              Version     Date           Comments
+##
+#####################################################################################################
+
+#####################################################################################################
+# Set up (Import libraries and set defaults for variables
+#####################################################################################################
+import ctypes
+import ctypes.util
+import multiprocessing
+import os
+import queue
+import select
+import signal
+import sqlite3
+import struct
+import sys
+import time
+from optparse import OptionParser
+import getIndentedClm
+monitor_root = os.path.join(os.path.expanduser('~'), 'develop', 'log')
+snapshot_path = os.path.join(os.path.expanduser('~'), 'develop', 'data', 'filelist.snapshot')
+interval = 60
+settle_time = 0.5
+max_settle_time = 5
+snapshot_interval = 60
+extension = '.xml'
+claim_tag = None
+workers = 2
+queue_size = 100
+stable_time = 2
+iSuccess = 0
+iFailure = 1
+# inotify constants from <sys/inotify.h>
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_CLOEXEC = 0o2000000
+inotify_mask = (IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE |
+                IN_DELETE_SELF | IN_MOVE_SELF)
+inotify_event = struct.Struct('iIII')
+############################## end of set up ########################################################
+#####################################################################################################
+
+
+#####################################################################################################
+#
+# Function Name:    main()
+#
+# Description:      This is the main function that controls the processing. It loads the last snapshot,
+#                   reports changes made since it was saved and then watches the directory until the
+#                   program is stopped.
+#
+# Arguments:        input - string monitor_dir    - Full path to directory to watch
+#                   input - string snapshot_path  - filepath and name of the snapshot file
+#                   input - int interval          - Seconds between scans when polling
+#                   input - bool use_polling      - Poll even if inotify is available
+#                   input - function onChanges    - Called with (monitor_dir, added, changed, removed)
+#                                                   lists of names (Default = reportChanges)
+#
+# Return Codes:     0 - iSuccess - The function executed successfully.
+#                   1 - iFailure - The function did not execute successfully.
+#
+# Notes:            The snapshot is saved when the program is stopped with Ctrl-C or SIGTERM.
+#
+#####################################################################################################
+def main(monitor_dir, snapshot_path, interval, use_polling=False, onChanges=None):
+#####################################################################################################
+# Initialize Return Code.
+# Check directory to watch
+# Load snapshot and report changes made since it was saved
+# Watch directory with inotify, or poll it
+# Save snapshot on exit
+# Return iRc.
+#####################################################################################################
+  iRc = iFailure
+  if onChanges is None:
+    onChanges = reportChanges
+  if os.path.isdir(monitor_dir):
+    state = {'entries': readSnapshot(snapshot_path), 'dirty': False, 'saved': time.time()}
+    signal.signal(signal.SIGTERM, stopWatching)
+    try:
+      first_run = not os.path.exists(snapshot_path)
+      rescanDirectory(monitor_dir, state, None if first_run else onChanges)
+      saveSnapshot(snapshot_path, state)
+      inotify_fd = None if use_polling else openInotify(monitor_dir)
+      if inotify_fd is None:
+        msg = 'Polling ' + monitor_dir + ' every ' + str(interval) + ' seconds.'
+        print(msg)
+        watchPolling(monitor_dir, snapshot_path, interval, state, onChanges)
+      else:
+        msg = 'Watching ' + monitor_dir + ' for changes.'
+        print(msg)
+        try:
+          watchInotify(inotify_fd, monitor_dir, snapshot_path, state, onChanges)
+        finally:
+          os.close(inotify_fd)
+      iRc = iSuccess
+    except KeyboardInterrupt:
+      iRc = iSuccess
+    finally:
+      saveSnapshot(snapshot_path, state, force=True)
+  else:
+    printInvalidDirectoryMsg(monitor_dir)
+#####################################################################################################
+# Return code of the function
+#####################################################################################################
+  return iRc
+############################## end of main() function ###############################################
+#####################################################################################################
+
+
+#####################################################################################################
+#
+# Function Name:    mainIndexing()
+#
+# Description:      Runs main() with a pool of worker processes that index new and changed claim files
+#                   as they land, so later lookups with getIndentedClm.py --index do not start a scan.
+#                   Files can also be searched for a watchlist of identifiers as soon as they are indexed.
+#
+# Arguments:        input - string monitor_dir    - Full path to directory to watch
+#                   input - string snapshot_path  - filepath and name of the snapshot file
+#                   input - int interval          - Seconds between scans when polling
+#                   input - bool use_polling      - Poll even if inotify is available
+#                   input - string index_path     - Claim index to add the files to
+#                   input - set identifiers       - Watchlist of identifiers to extract claims for (Default = None)
+#                   input - string output_dir     - Directory to write INDENT.<identifier> files to (Default = '.')
+#
+# Return Codes:     0 - iSuccess - The function executed successfully.
+#                   1 - iFailure - The function did not execute successfully.
+#
+# Notes:            Files are handed to the workers in turn through a queue per worker, of at most
+#                   queue_size files between them. When they are full the watcher waits for the workers
+#                   before reporting more changes, and starts a new worker for any that failed while it
+#                   waits. When the watcher is stopped, the files already queued are indexed before
+#                   exiting.
+#
+#####################################################################################################
+def mainIndexing(monitor_dir, snapshot_path, interval, use_polling, index_path, identifiers=None, output_dir='.'):
+#####################################################################################################
+# Start index workers with bounded queues
+# Run watcher, queueing each new or changed claim file
+# Stop workers
+# Return iRc.
+#####################################################################################################
+  pool = {'workers': [None] * workers, 'queues': [None] * workers, 'next': 0,
+          'args': (index_path, identifiers, os.path.abspath(output_dir))}
+  startIndexWorkers(pool)
+  try:
+    iRc = main(monitor_dir, snapshot_path, interval, use_polling, queueClaimFiles(pool))
+  finally:
+    stopIndexWorkers(pool)
+#####################################################################################################
+# Return code of the function
+#####################################################################################################
+  return iRc
+############################## end of mainIndexing() function #######################################
+#####################################################################################################
+
+
+#####################################################################################################
+#
+# Function Definitions
+#
+#####################################################################################################
+#####################################################################################################
+#
+# Function Name:    init()
+#
+# Description:      Create and use parser to fetch command argument options.
+#
+# Arguments:        N/A
+#
+# Returned Data:    output - string options.interval      - Seconds between scans when polling
+#                   output - string options.snapshot_path - Snapshot file to keep the known files in
+#                   output - bool options.use_polling     - Poll even if inotify is available
+#                   output - string options.index_path    - Claim index to add new and changed claim files to
+#                   output - string options.index_fields  - Paths of the identifier values to index
+#                   output - string options.extension     - Extension of claim files to index
+#                   output - string options.claim_tag     - Element name of a claim in the files
+#                   output - int options.workers          - Number of index worker processes
+#                   output - int options.queue_size       - Most files waiting to be indexed
+#                   output - string options.watchlist     - File with one identifier per line to extract claims for
+#                   output - string options.output_dir    - Directory to write watchlist claims to
+#                   output - string[] args                - Directory to watch
+#
+# Notes:            None.
+#
+#####################################################################################################
+def init():
+#####################################################################################################
+# Setup parser for command line arugments
+# Fetch and return data from parser
+#####################################################################################################
+  parser = OptionParser(usage='%prog <directory path> [options]')
+  parser.add_option('--i', '--interval',              dest='interval', type='int',
+                    help='set seconds between scans when polling. default: 60')
+  parser.add_option('--s', '--snapshot',              dest='snapshot_path',
+                    help='set snapshot file to keep the known files in. default: ' + snapshot_path)
+  parser.add_option('--poll',                         dest='use_polling', action='store_true',
+                    help='scan the directory every interval even if inotify is available')
+  parser.add_option('--index',                        dest='index_path',
+                    help='add new and changed claim files to this claim index as they land')
+  parser.add_option('--index-fields',                 dest='index_fields',
+                    help='comma separated paths of the identifier values to index. default: ' + getIndentedClm.index_fields)
+  parser.add_option('--x', '--ext', '--extension',    dest='extension',
+                    help='set extension of claim files to index. default: .xml')
+  parser.add_option('--t', '--tag',                   dest='claim_tag',
+                    help='set element name of a claim. default: every child of the root element')
+  parser.add_option('--w', '--workers',               dest='workers', type='int',
+                    help='set number of index worker processes. default: 2')
+  parser.add_option('--q', '--queue-size',            dest='queue_size', type='int',
+                    help='set most files waiting to be indexed before the watcher waits. default: 100')
+  parser.add_option('--watchlist',                    dest='watchlist',
+                    help='input file with one identifier per line to extract claims for as files are indexed')
+  parser.add_option('--o', '--output-dir',            dest='output_dir',
+                    help='set directory to write INDENT.<identifier> files for --watchlist to. default: .')
+  # get and set command line arugments into local variables using parser
+  options, args = parser.parse_args()
+#####################################################################################################
+# Return variable from function
+#####################################################################################################
+  return options, args
+############################## end of init() function ###############################################
+#####################################################################################################
+
+
+#####################################################################################################
+#
+# Function Name:    statEntry()
+#
+# Description:      Gets the size and modification time of one entry in the watched directory.
+#
+# Arguments:        input - string monitor_dir - Full path to directory being watched
+#                   input - string name        - name of the entry in the directory
+#
+# Return Variable:  output - (int size, int mtime_ns) - size and modification time, or None if the entry
+#                            no longer exists
+#
+# Notes:            None.
+#
+#####################################################################################################
+def statEntry(monitor_dir, name):
+#####################################################################################################
+# Stat entry and return its size and modification time
+#####################################################################################################
+  entry = None
+  try:
+    stat = os.stat(os.path.join(monitor_dir, name))
+    entry = (stat.st_size, stat.st_mtime_ns)
+  except OSError:
+    pass
+#####################################################################################################
+# Return variable
+#####################################################################################################
+  return entry
+############################## end of statEntry() function ##########################################
+#####################################################################################################
+
+
+#####################################################################################################
+#
+# Function Name:    scanDirectory()
+#
+# Description:      Lists every entry in the watched directory with its size and modification time.
+#
+# Arguments:        input - string monitor_dir - Full path to directory being watched
+#
+# Return Variable:  output - dict entries - name: (size, mtime_ns) of every entry
+#
+# Notes:            os.scandir() is used so each entry is only stat'ed once.
+#
+#####################################################################################################
+def scanDirectory(monitor_dir):
+#####################################################################################################
+# Scan directory and collect size and modification time of each entry
+#####################################################################################################
+  entries = {}
+  with os.scandir(monitor_dir) as directory:
+    for dir_entry in directory:
+      try:
+        stat = dir_entry.stat()
+        entries[dir_entry.name] = (stat.st_size, stat.st_mtime_ns)
+      except OSError:
+        # Removed while scanning
+        pass
+#####################################################################################################
+# Return variable
+#####################################################################################################
+  return entries
+############################## end of scanDirectory() function ######################################
+#####################################################################################################
+
+
+#####################################################################################################
+#
+# Function Name:    updateEntries()
+#
+# Description:      Compares the current size and modification time of the named entries with the known
+#                   entries, updates the known entries and sorts the names into added, changed and
+#                   removed.
+#
+# Arguments:        input - dict state      - watcher state, with the known 'entries'
+#                   input - iterable names  - names of the entries to check
+#                   input - dict current    - name: (size, mtime_ns) of the current entries, a missing
+#                                             name has been removed
+#
+# Return Variable:  output - (list added, list changed, list removed) - sorted names of the entries
+#
+# Notes:            Marks the state dirty if anything changed so that the snapshot is saved.
+#
+#####################################################################################################
+def updateEntries(state, names, current):
+#####################################################################################################
+# Compare each name with the known entries
+# Update known entries and return the differences
+#####################################################################################################
+  added = []
+  changed = []
+  removed = []
+  entries = state['entries']
+  for name in names:
+    old = entries.get(name)
+    new = current.get(name)
+    if old == new:
+      continue
+    if new is None:
+      del entries[name]
+      removed.append(name)
+    else:
+      entries[name] = new
+      if old is None:
+        added.append(name)
+      else:
+        changed.append(name)
+  if added or changed or removed:
+    state['dirty'] = True
+#####################################################################################################
+# Return variable
+#####################################################################################################
+  return sorted(added), sorted(changed), sorted(removed)
+############################## end of updateEntries() function ######################################
+#####################################################################################################
+
+
+#####################################################################################################
+#
+# Function Name:    rescanDirectory()
+#
+# Description:      Scans the whole watched directory and reports every difference with the known
+#                   entries.
+#
+# Arguments:        input - string monitor_dir - Full path to directory being watched
+#                   input - dict state         - watcher state, with the known 'entries'
+#                   input - function onChanges - Called with the differences, or None to only update
+#
+# Return Variable:  N/A
+#
+# Notes:            Used at start up, when polling and after an inotify queue overflow.
+#
+#####################################################################################################
+def rescanDirectory(monitor_dir, state, onChanges):
+#####################################################################################################
+# Scan directory, compare with known entries and report differences
+#####################################################################################################
+  current = scanDirectory(monitor_dir)
+  names = set(state['entries']).union(current)
+  added, changed, removed = updateEntries(state, names, current)
+  if onChanges is not None and (added or changed or removed):
+    onChanges(monitor_dir, added, changed, removed)
+############################## end of rescanDirectory() function ####################################
+#####################################################################################################
+
+
+#####################################################################################################
+#
+# Function Name:    openInotify()
+#
+# Description:      Creates an inotify instance watching the directory for files being created,
+#                   written, moved and removed.
+#
+# Arguments:        input - string monitor_dir - Full path to directory to watch
+#
+# Return Variable:  output - int inotify_fd - inotify file descriptor, or None if inotify is not available
+#
+# Notes:            inotify is called through ctypes so no extra library is needed.
+#
+#####################################################################################################
+def openInotify(monitor_dir):
+#####################################################################################################
+# Load libc and check it has inotify
+# Create inotify instance and add watch for the directory
+# Return inotify file descriptor
+#####################################################################################################
+  inotify_fd = None
+  try:
+    libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+    fd = libc.inotify_init1(IN_CLOEXEC)
+    if fd >= 0:
+      if libc.inotify_add_watch(fd, os.fsencode(monitor_dir), inotify_mask) >= 0:
+        inotify_fd = fd
+      else:
+        os.close(fd)
+  except (OSError, AttributeError):
+    # No libc, or libc without inotify
+    pass
+#####################################################################################################
+# Return variable
+#####################################################################################################
+  return inotify_fd
+############################## end of openInotify() function ########################################
+#####################################################################################################
+
+
+#####################################################################################################
+#
+# Function Name:    readInotifyEvents()
+#
+# Description:      Reads the pending events from the inotify file descriptor.
+#
+# Arguments:        input - int inotify_fd - inotify file descriptor
+#
+# Return Variable:  output - (set names, bool overflow, bool gone) - names of the entries the events
+#                            are about, whether events were lost, and whether the watched directory
+#                            was removed or moved away
+#
+# Notes:            None.
+#
+#####################################################################################################
+def readInotifyEvents(inotify_fd):
+#####################################################################################################
+# Read buffer of events and unpack each event and its name
+#####################################################################################################
+  names = set()
+  overflow = False
+  gone = False
+  data = os.read(inotify_fd, 1024 * 1024)
+  position = 0
+  while position < len(data):
+    wd, mask, cookie, length = inotify_event.unpack_from(data, position)
+    position += inotify_event.size
+    if length:
+      names.add(os.fsdecode(data[position:position + length].rstrip(b'\0')))
+    position += length
+    if mask & IN_Q_OVERFLOW:
+      overflow = True
+    if mask & (IN_DELETE_SELF | IN_MOVE_SELF | IN_IGNORED):
+      gone = True
+#####################################################################################################
+# Return variable
+#####################################################################################################
+  return names, overflow, gone
+############################## end of readInotifyEvents() function ##################################
+#####################################################################################################
+
+
+#####################################################################################################
+#
+# Function Name:    watchInotify()
+#
+# Description:      Waits for inotify events and reports the entries they are about. Events are
+#                   gathered until the directory has been quiet for settle_time seconds, or for at
+#                   most max_settle_time seconds, so a burst of events is checked and reported once.
+#
+# Arguments:        input - int inotify_fd        - inotify file descriptor
+#                   input - string monitor_dir    - Full path to directory being watched
+#                   input - string snapshot_path  - filepath and name of the snapshot file
+#                   input - dict state            - watcher state, with the known 'entries'
+#                   input - function onChanges    - Called with the differences
+#
+# Return Variable:  N/A
+#
+# Notes:            Returns when the watched directory is removed.
+#
+#####################################################################################################
+def watchInotify(inotify_fd, monitor_dir, snapshot_path, state, onChanges):
+#####################################################################################################
+# Wait for events, gathering the names they are about
+# Check gathered names once the directory is quiet, or rescan after an overflow
+# Save snapshot from time to time
+#####################################################################################################
+  pending = set()
+  overflow = False
+  first_event = None
+  while True:
+    timeout = settle_time if (pending or overflow) else snapshot_interval
+    ready, unused, unused = select.select([inotify_fd], [], [], timeout)
+    if ready:
+      names, lost, gone = readInotifyEvents(inotify_fd)
+      if gone:
+        printDirectoryGoneMsg(monitor_dir)
+        break
+      pending.update(names)
+      overflow = overflow or lost
+      if first_event is None and (pending or overflow):
+        first_event = time.time()
+    if (pending or overflow) and (not ready or time.time() - first_event >= max_settle_time):
+      if overflow:
+        rescanDirectory(monitor_dir, state, onChanges)
+      else:
+        current = {}
+        for name in pending:
+          entry = statEntry(monitor_dir, name)
+          if entry is not None:
+            current[name] = entry
+        added, changed, removed = updateEntries(state, pending, current)
+        if added or changed or removed:
+          onChanges(monitor_dir, added, changed, removed)
+      pending = set()
+      overflow = False
+      first_event = None
+    saveSnapshot(snapshot_path, state)
+############################## end of watchInotify() function #######################################
+#####################################################################################################
+
+
+#####################################################################################################
+#
+# Function Name:    watchPolling()
+#
+# Description:      Scans the watched directory every interval seconds and reports the differences.
+#
+# Arguments:        input - string monitor_dir    - Full path to directory being watched
+#                   input - string snapshot_path  - filepath and name of the snapshot file
+#                   input - int interval          - Seconds between scans
+#                   input - dict state            - watcher state, with the known 'entries'
+#                   input - function onChanges    - Called with the differences
+#
+# Return Variable:  N/A
+#
+# Notes:            Returns when the watched directory is removed.
+#
+#####################################################################################################
+def watchPolling(monitor_dir, snapshot_path, interval, state, onChanges):
+#####################################################################################################
+# Wait interval, rescan directory and save snapshot
+#####################################################################################################
+  while True:
+    time.sleep(interval)
+    if not os.path.isdir(monitor_dir):
+      printDirectoryGoneMsg(monitor_dir)
+      break
+    rescanDirectory(monitor_dir, state, onChanges)
+    saveSnapshot(snapshot_path, state)
+############################## end of watchPolling() function #######################################
+#####################################################################################################
+
+
+#####################################################################################################
+#
+# Function Name:    readSnapshot()
+#
+# Description:      Reads the known entries from the snapshot file. Each line of the snapshot is
+#                   <size> <tab> <mtime_ns> <tab> <name>.
+#
+# Arguments:        input - string snapshot_path - filepath and name of the snapshot file
+#
+# Return Variable:  output - dict entries - name: (size, mtime_ns), empty if there is no snapshot yet
+#
+# Notes:            None.
+#
+#####################################################################################################
+def readSnapshot(snapshot_path):
+#####################################################################################################
+# Read snapshot lines into dict of entries
+#####################################################################################################
+  entries = {}
+  if os.path.exists(snapshot_path):
+    with open(snapshot_path, encoding='utf-8', errors='surrogateescape') as snapshot_file:
+      for line in snapshot_file:
+        size, mtime_ns, name = line.rstrip('\n').split('\t', 2)
+        entries[name] = (int(size), int(mtime_ns))
+#####################################################################################################
+# Return variable
+#####################################################################################################
+  return entries
+############################## end of readSnapshot() function #######################################
+#####################################################################################################
+
+
+#####################################################################################################
+#
+# Function Name:    saveSnapshot()
+#
+# Description:      Writes the known entries to the snapshot file if they changed, at most once every
+#                   snapshot_interval seconds unless forced.
+#
+# Arguments:        input - string snapshot_path - filepath and name of the snapshot file
+#                   input - dict state           - watcher state, with the known 'entries'
+#                   input - bool force           - Write now even if snapshot_interval has not passed
+#
+# Return Variable:  N/A
+#
+# Notes:            The snapshot is written to a temporary file and renamed over the old one, so a
+#                   stopped watcher never leaves a partial snapshot behind.
+#
+#####################################################################################################
+def saveSnapshot(snapshot_path, state, force=False):
+#####################################################################################################
+# Skip if nothing changed or snapshot was saved recently
+# Write entries to temporary file and rename it over snapshot file
+#####################################################################################################
+  if state['dirty'] or not os.path.exists(snapshot_path):
+    if force or time.time() - state['saved'] >= snapshot_interval or not os.path.exists(snapshot_path):
+      snapshot_dir = os.path.dirname(snapshot_path)
+      if snapshot_dir and not os.path.isdir(snapshot_dir):
+        os.makedirs(snapshot_dir)
+      temp_path = snapshot_path + '.' + str(os.getpid())
+      with open(temp_path, 'w', encoding='utf-8', errors='surrogateescape') as snapshot_file:
+        for name, (size, mtime_ns) in state['entries'].items():
+          snapshot_file.write(str(size) + '\t' + str(mtime_ns) + '\t' + name + '\n')
+      os.replace(temp_path, snapshot_path)
+      state['dirty'] = False
+      state['saved'] = time.time()
+############################## end of saveSnapshot() function #######################################
+#####################################################################################################
+
+
+#####################################################################################################
+#
+# Function Name:    stopWatching()
+#
+# Description:      SIGTERM handler. Stops the watcher the same way as Ctrl-C so the snapshot is saved.
+#
+# Arguments:        input - int signum - signal number
+#                   input - frame frame - current stack frame
+#
+# Return Variable:  N/A
+#
+# Notes:            None.
+#
+#####################################################################################################
+def stopWatching(signum, frame):
+#####################################################################################################
+# Raise KeyboardInterrupt in the main thread
+#####################################################################################################
+  raise KeyboardInterrupt()
+############################## end of stopWatching() function #######################################
+#####################################################################################################
+
+
+#####################################################################################################
+#
+# Function Name:    queueClaimFiles()
+#
+# Description:      Creates the onChanges callback for mainIndexing(). It reports the changes, then puts
+#                   every new or changed claim file on the queue of an index worker.
+#
+# Arguments:        input - dict pool - index workers and their queues from mainIndexing()
+#
+# Return Variable:  output - function onChanges - callback for main()
+#
+# Notes:            Only files with the extension are queued, and INDENT. files are ignored, the same as
+#                   getIndentedClm.py. Putting a file on full queues waits for a worker to take one.
+#
+#####################################################################################################
+def queueClaimFiles(pool):
+#####################################################################################################
+# Report changes and queue full path of each claim file added or changed
+#####################################################################################################
+  def onChanges(monitor_dir, added, changed, removed):
+    reportChanges(monitor_dir, added, changed, removed)
+    for name in added + changed:
+      filepathname = os.path.abspath(os.path.join(monitor_dir, name))
+      if ('INDENT.' not in name) and (extension in name) and os.path.isfile(filepathname):
+        putIndexWork(pool, filepathname)
+#####################################################################################################
+# Return variable
+#####################################################################################################
+  return onChanges
+############################## end of queueClaimFiles() function ####################################
+#####################################################################################################
+
+
+#####################################################################################################
+#
+# Function Name:    putIndexWork()
+#
+# Description:      Puts a file on the queue of the next index worker with room for it, or None on the
+#                   queue of one worker to stop it.
+#
+# Arguments:        input - dict pool           - index workers and their queues from mainIndexing()
+#                   input - string filepathname - filepath and name of the claim file, or None
+#                   input - int slot            - Worker to put the item on the queue of (Default = None,
+#                                                 the next worker with room)
+#
+# Return Variable:  N/A
+#
+# Notes:            While the queues are full, the workers are checked every second and any that failed
+#                   is started again, so the watcher cannot wait forever on workers that are gone.
+#
+#####################################################################################################
+def putIndexWork(pool, filepathname, slot=None):
+#####################################################################################################
+# Start workers that failed
+# Put item on the first queue with room, trying the workers in turn
+# Check the workers again every second while the queues are full
+#####################################################################################################
+  queued = False
+  while not queued:
+    startIndexWorkers(pool)
+    slots = [slot] if slot is not None else [(pool['next'] + turn) % len(pool['queues'])
+                                             for turn in range(len(pool['queues']))]
+    for next_slot in slots:
+      try:
+        pool['queues'][next_slot].put(filepathname, block=False)
+        pool['next'] = (next_slot + 1) % len(pool['queues'])
+        queued = True
+        break
+      except queue.Full:
+        pass
+    if not queued:
+      time.sleep(1)
+############################## end of putIndexWork() function #######################################
+#####################################################################################################
+
+
+#####################################################################################################
+#
+# Function Name:    startIndexWorkers()
+#
+# Description:      Starts an index worker process with a new queue in every slot that has none
+#                   running, or whose worker failed.
+#
+# Arguments:        input - dict pool - index workers and their queues from mainIndexing()
+#
+# Return Variable:  N/A
+#
+# Notes:            A worker that failed is reported before it is replaced. Its queue is replaced too,
+#                   as a worker killed while reading it can leave it locked, so the files that were
+#                   waiting for it are not indexed until they change again. A worker stopped through
+#                   its queue exits with code 0 and is not replaced.
+#
+#####################################################################################################
+def startIndexWorkers(pool):
+#####################################################################################################
+# Report each worker that failed and start a new one with a new queue in its place
+#####################################################################################################
+  for slot, index_worker in enumerate(pool['workers']):
+    if index_worker is None or (not index_worker.is_alive() and index_worker.exitcode != 0):
+      if index_worker is not None:
+        index_worker.join()
+        pool['queues'][slot].cancel_join_thread()
+        printWorkerExitedMsg(index_worker.exitcode)
+      pool['queues'][slot] = multiprocessing.Queue(max(1, queue_size // len(pool['workers'])))
+      pool['workers'][slot] = multiprocessing.Process(target=indexWorker, args=(pool['queues'][slot],) + pool['args'])
+      pool['workers'][slot].start()
+############################## end of startIndexWorkers() function ##################################
+#####################################################################################################
+
+
+#####################################################################################################
+#
+# Function Name:    stopIndexWorkers()
+#
+# Description:      Stops the index workers once the files already on their queues are indexed.
+#
+# Arguments:        input - dict pool - index workers and their queues from mainIndexing()
+#
+# Return Variable:  N/A
+#
+# Notes:            None.
+#
+#####################################################################################################
+def stopIndexWorkers(pool):
+#####################################################################################################
+# Put None on the queue of every worker, then wait for them to exit
+#####################################################################################################
+  for slot in range(len(pool['workers'])):
+    putIndexWork(pool, None, slot)
+  for index_worker in pool['workers']:
+    index_worker.join()
+############################## end of stopIndexWorkers() function ###################################
+#####################################################################################################
+
+
+#####################################################################################################
+#
+# Function Name:    waitUntilStable()
+#
+# Description:      Waits until the size and modification time of a file stop changing, so a file that
+#                   is still being written or copied is not indexed.
+#
+# Arguments:        input - string filepathname - filepath and name of the file
+#
+# Return Variable:  output - bool stable - True once the file has not changed for stable_time seconds,
+#                            False if it was removed
+#
+# Notes:            None.
+#
+#####################################################################################################
+def waitUntilStable(filepathname):
+#####################################################################################################
+# Stat file every stable_time seconds until two stats are the same
+#####################################################################################################
+  stable = False
+  previous = statEntry(os.path.dirname(filepathname), os.path.basename(filepathname))
+  while previous is not None:
+    time.sleep(stable_time)
+    current = statEntry(os.path.dirname(filepathname), os.path.basename(filepathname))
+    if current == previous:
+      stable = True
+      break
+    previous = current
+#####################################################################################################
+# Return variable
+#####################################################################################################
+  return stable
+############################## end of waitUntilStable() function ####################################
+#####################################################################################################
+
+
+#####################################################################################################
+#
+# Function Name:    indexWorker()
+#
+# Description:      Index worker process. Takes claim files from the work queue, waits for each one to be
+#                   completely written, adds it to the claim index and extracts the claims of any
+#                   watchlist identifiers in it.
+#
+# Arguments:        input - Queue work_queue   - bounded queue of filepaths, None to stop
+#                   input - string index_path  - Claim index to add the files to
+#                   input - set identifiers    - Watchlist of identifiers to extract claims for, or None
+#                   input - string output_dir  - Directory to write INDENT.<identifier> files to
+#
+# Return Variable:  N/A
+#
+# Notes:            Ctrl-C is ignored by the workers. The watcher stops them through the queue once the
+#                   files already queued are done. A file that cannot be indexed or searched is reported
+#                   and skipped, the worker goes on to the next file.
+#
+#####################################################################################################
+def indexWorker(work_queue, index_path, identifiers, output_dir):
+#####################################################################################################
+# Ignore Ctrl-C and write outputs to output directory
+# Index each file from the queue once it is stable
+# Extract watchlist claims from it
+#####################################################################################################
+  signal.signal(signal.SIGINT, signal.SIG_IGN)
+  signal.signal(signal.SIGTERM, signal.SIG_DFL)
+  os.chdir(output_dir)
+  filepathname = work_queue.get()
+  while filepathname is not None:
+    if waitUntilStable(filepathname):
+      try:
+        if getIndentedClm.buildIndex([filepathname], index_path, claim_tag):
+          printIndexedMsg(filepathname)
+        if identifiers:
+          matches = getIndentedClm.extractIndexedClaims(identifiers, [filepathname], index_path, None, claim_tag,
+                                                        append=True)
+          if matches:
+            printWatchlistMsg(filepathname, matches)
+      except sqlite3.Error as error:
+        getIndentedClm.printIndexErrorMsg(index_path, error)
+      except Exception as error:
+        getIndentedClm.printParseErrorMsg(filepathname, type(error).__name__ + ': ' + str(error))
+      sys.stdout.flush()
+    filepathname = work_queue.get()
+############################## end of indexWorker() function ########################################
+#####################################################################################################
+
+
+#####################################################################################################
+#
+# Print Functions
+#
+#####################################################################################################
+def printResult(return_code):
+  if return_code == iSuccess:
+    print('Done!')
+  else:
+    print('Program failed!')
+
+def printIndexedMsg(filepathname):
+  indexedMsg = 'Indexed ' + filepathname
+  print(indexedMsg)
+
+def printWatchlistMsg(filepathname, matches):
+  watchlistMsg = ['Watchlist claims found in ', filepathname, ':']
+  watchlistMsg += ['\n  INDENT.' + identifier for identifier in sorted(matches)]
+  watchlistMsg = ''.join(watchlistMsg)
+  print(watchlistMsg)
+
+def printWorkerExitedMsg(exitcode):
+  workerExitedMsg = ['Error occured\n',
+                     'Index worker exited with code ', str(exitcode), '. Starting a new one.']
+  workerExitedMsg = ''.join(workerExitedMsg)
+  print(workerExitedMsg)
+  sys.stdout.flush()
+
+def reportChanges(monitor_dir, added, changed, removed):
+  changesMsg = ['Alert: ', monitor_dir, ' changed']
+  changesMsg += ['\nNew:     ' + name for name in added]
+  changesMsg += ['\nChanged: ' + name for name in changed]
+  changesMsg += ['\nRemoved: ' + name for name in removed]
+  changesMsg += ['\nWaiting for changes.']
+  changesMsg = ''.join(changesMsg)
+  print(changesMsg)
+  sys.stdout.flush()
+
+def printNoDirectoryMsg():
+  noDirectoryMsg = ['Error occured\n',
+                    'No directory included to watch.']
+  noDirectoryMsg = ''.join(noDirectoryMsg)
+  print(noDirectoryMsg)
+
+def printInvalidDirectoryMsg(monitor_dir):
+  invalidDirectoryMsg = ['Error occured\n',
+                         'Directory ', monitor_dir, ' to watch does not exist.\n',
+                         'Please verify directory path.']
+  invalidDirectoryMsg = ''.join(invalidDirectoryMsg)
+  print(invalidDirectoryMsg)
+
+def printDirectoryGoneMsg(monitor_dir):
+  directoryGoneMsg = ['Error occured\n',
+                      'Directory ', monitor_dir, ' was removed or moved. Stopped watching.']
+  directoryGoneMsg = ''.join(directoryGoneMsg)
+  print(directoryGoneMsg)
+############################## end of print messages ################################################
+#####################################################################################################
+
+
+#####################################################################################################
+# Execute only if program was called as a script, not if it was imported
+#####################################################################################################
+# Initialize program by getting directory, interval and snapshot file
+# Fetches options from init() function
+# Execute mainIndexing() if an index is provided by the user, otherwise execute main()
+#####################################################################################################
+if __name__ == '__main__':
+  options, args = init()
+  if options.interval:
+    interval = options.interval
+  if options.snapshot_path:
+    snapshot_path = options.snapshot_path
+  if options.extension:
+    extension = options.extension
+  if options.claim_tag:
+    claim_tag = options.claim_tag
+  if options.workers:
+    workers = options.workers
+  if options.queue_size:
+    queue_size = options.queue_size
+  index_fields_error = None
+  if options.index_fields:
+    try:
+      getIndentedClm.index_fields = getIndentedClm.parseIndexFields(options.index_fields)['text']
+    except ValueError as error:
+      index_fields_error = error
+  identifiers = None
+  if options.watchlist:
+    identifiers = getIndentedClm.readIdentifiersFile(options.watchlist)
+
+  if index_fields_error is not None:
+    getIndentedClm.printInvalidIndexFieldsMsg(index_fields_error)
+    printResult(iFailure)
+  elif args and identifiers != '':
+    monitor_dir = os.path.join(monitor_root, args[0])
+    if options.index_path:
+      ret = mainIndexing(monitor_dir, snapshot_path, interval, options.use_polling, options.index_path,
+                         identifiers, options.output_dir or '.')
+    else:
+      ret = main(monitor_dir, snapshot_path, interval, options.use_polling)
+    printResult(ret)
+  elif not args:
+    printNoDirectoryMsg()
+#####################################################################################################
+############################## end of watchdir.py program ###########################################
+#####################################################################################################